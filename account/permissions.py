@@ -0,0 +1,14 @@
+# This file defines the permissions of the admin user-management endpoints.
+# Staff users manage regular accounts; only superusers change superuser accounts, and only they grant
+# or revoke the staff / superuser flags (checked by AdminUserSerializer).
+from rest_framework.permissions import SAFE_METHODS, IsAdminUser
+
+
+class CanManageUsers(IsAdminUser):
+    """Staff access to the user-management endpoints; superuser accounts are changed by superusers only."""
+    message = "Only superusers can change or delete superuser accounts."
+
+    def has_object_permission(self, request, view, obj):
+        if request.method in SAFE_METHODS or request.user.is_superuser:
+            return True
+        return not obj.is_superuser
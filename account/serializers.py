@@ -2,6 +2,7 @@
 
 from django.contrib.auth.models import User
 from rest_framework import serializers
+from rest_framework.exceptions import PermissionDenied
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -38,3 +39,45 @@ class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
+
+
+class AdminUserSerializer(serializers.ModelSerializer):
+    """
+    Serializer for managing users from the admin dashboard.
+    Includes the staff / superuser flags; the password is write-only, required when
+    creating a user and changed on update only when given.
+    """
+    password = serializers.CharField(write_only=True, required=False, allow_blank=True)
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'is_staff', 'is_superuser',
+                  'date_joined', 'password']
+        read_only_fields = ['date_joined']
+
+    def validate(self, attrs):
+        request = self.context.get('request')
+        if request is not None and not request.user.is_superuser:
+            # Only superusers grant or revoke privileges (unchanged values may be sent back as they are)
+            for name in ('is_staff', 'is_superuser'):
+                if name in attrs and attrs[name] != getattr(self.instance, name, False):
+                    raise PermissionDenied(f"Only superusers can change {name}.")
+        if self.instance is None and not attrs.get('password'):
+            raise serializers.ValidationError({"password": ["This field is required."]})
+        return attrs
+
+    def create(self, validated_data):
+        """
+        Create and return a new user with encrypted password.
+        """
+        password = validated_data.pop('password')
+        return User.objects.create_user(password=password, **validated_data)
+
+    def update(self, instance, validated_data):
+        """
+        Update the user, setting a new password only if one was given.
+        """
+        password = validated_data.pop('password', None)
+        if password:
+            instance.set_password(password)
+        return super().update(instance, validated_data)
@@ -140,6 +140,66 @@ class AccountTests(APITestCase):
         response = self.client.get(self.user_list_url)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
+    def test_admin_can_manage_users(self):
+        """
+        Superusers should be able to filter, create, update and delete users through the API.
+        """
+        self.user.is_staff = self.user.is_superuser = True
+        self.user.save()
+        self.authenticate()
+        response = self.client.post(self.user_list_url, {
+            "username": "agronomist", "email": "agro@example.com", "password": "fieldpass123", "is_staff": True,
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn("password", response.data)
+        created = User.objects.get(username="agronomist")
+        self.assertTrue(created.check_password("fieldpass123"))
+
+        response = self.client.get(self.user_list_url, {"is_staff": "true", "search": "agro"})
+        self.assertEqual([u["username"] for u in response.data], ["agronomist"])
+
+        url = reverse('admin-user-detail', kwargs={'pk': created.id})
+        response = self.client.patch(url, {"is_staff": False, "password": "newfieldpass1"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        created.refresh_from_db()
+        self.assertFalse(created.is_staff)
+        self.assertTrue(created.check_password("newfieldpass1"))
+
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(User.objects.filter(username="agronomist").exists())
+
+    def test_staff_cannot_grant_privileges_or_change_superusers(self):
+        """
+        Staff users who are not superusers should get 403 when promoting anyone (themselves included)
+        or changing / deleting a superuser, and may still manage regular users.
+        """
+        self.user.is_staff = True
+        self.user.save()
+        self.authenticate()
+        url = reverse('admin-user-detail', kwargs={'pk': self.user.id})
+        self.assertEqual(self.client.patch(url, {"is_superuser": True}).status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.post(self.user_list_url, {
+            "username": "sidekick", "password": "sidekickpass1", "is_staff": True,
+        })
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_superuser)
+
+        root = User.objects.create_superuser(username='root', password='rootpass123')
+        root_url = reverse('admin-user-detail', kwargs={'pk': root.id})
+        self.assertEqual(self.client.patch(root_url, {"first_name": "x"}).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.delete(root_url).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertTrue(User.objects.filter(pk=root.pk).exists())
+
+        # The dashboard sends the unchanged flags back with other edits
+        response = self.client.post(self.user_list_url, {
+            "username": "grower2", "password": "growerpass12", "is_staff": False, "is_superuser": False,
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        grower_url = reverse('admin-user-detail', kwargs={'pk': response.data["id"]})
+        response = self.client.patch(grower_url, {"email": "g@example.com", "is_staff": False})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_admin_can_list_user_prediction_history(self):
         """
         Admin should list all prediction history of a user.
@@ -151,6 +211,25 @@ class AccountTests(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_admin_history_list_is_paginated_by_cursor(self):
+        """
+        Admin history listing should use the same cursor pagination, field selection and ETags as the user's.
+        """
+        self.user.is_staff = True
+        self.user.save()
+        self.authenticate()
+        for confidence in (0.2, 0.9, 0.5):
+            PredictionHistory.objects.create(user=self.user, image='img.jpg', disease='Tomato___Late_blight',
+                                             confidence=confidence, remedy='Fungicide')
+        url = reverse('admin-history-list', kwargs={'user_id': self.user.id})
+        response = self.client.get(url, {'ordering': '-confidence', 'page_size': 2, 'fields': 'id,confidence'})
+        self.assertEqual([entry['confidence'] for entry in response.data['results']], [0.9, 0.5])
+        next_page = self.client.get(response.data['next'])
+        self.assertEqual([entry['confidence'] for entry in next_page.data['results']], [0.2])
+        self.assertIsNone(next_page.data['next'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=self.client.get(url)['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
     def test_admin_can_retrieve_single_user_prediction_history(self):
         """
         Admin should fetch a specific prediction entry.
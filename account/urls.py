@@ -21,7 +21,8 @@ urlpatterns = [
     path('users/<int:user_id>/history/<int:id>/', AdminUserHistoryView.as_view(), name='admin-history-detail'),
     path('users/<int:user_id>/history/<int:id>/delete/', AdminUserHistoryView.as_view(), name='admin-history-delete'),
     path('users/<int:user_id>/history/clear/', AdminUserHistoryClearView.as_view(), name='admin-history-clear'),
-    path('admin/users/', UserListView.as_view(), name='user_list'),
+    path('admin/users/', AdminUserListView.as_view(), name='user_list'),  # List / create users (admin only)
+    path('admin/users/<int:pk>/', AdminUserDetailView.as_view(), name='admin-user-detail'),  # Edit / delete a user
 
 ]
 # This file defines the URL patterns for the account app, linking views to specific endpoints.
\ No newline at end of file
@@ -7,7 +7,9 @@ from django.contrib.auth.hashers import check_password
 
 from detection.models import PredictionHistory
 from detection.serializers import PredictionHistorySerializer
-from .serializers import RegisterSerializer, UserSerializer
+from detection.views import HistoryListMixin
+from .permissions import CanManageUsers
+from .serializers import AdminUserSerializer, RegisterSerializer, UserSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
 
 # account/views.py
@@ -130,7 +132,48 @@ class UserListView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+class AdminUserListView(generics.ListCreateAPIView):
+    """
+    API endpoint for admins to list users (with the staff / superuser flags) and create users.
+    Query parameters: `search` (username contains), `is_staff`, `is_superuser` (true/false),
+    `page` and `page_size`.
+    Permission: CanManageUsers (only superusers set the staff / superuser flags).
+    """
+    serializer_class = AdminUserSerializer
+    permission_classes = [CanManageUsers]
+
+    def get_queryset(self):
+        users = User.objects.order_by('id')
+        search = self.request.query_params.get('search')
+        if search:
+            users = users.filter(username__icontains=search)
+        for flag in ('is_staff', 'is_superuser'):
+            value = self.request.query_params.get(flag)
+            if value in ('true', 'false'):
+                users = users.filter(**{flag: value == 'true'})
+        return users
+
+    def list(self, request, *args, **kwargs):
+        # Same page / page_size pagination as UserListView
+        page = int(request.query_params.get('page', 1))
+        page_size = int(request.query_params.get('page_size', 20))
+        start = (page - 1) * page_size
+        users = self.get_queryset()[start:start + page_size]
+        return Response(self.get_serializer(users, many=True).data)
+
+
+class AdminUserDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """
+    API endpoint for admins to retrieve, update (PATCH) or delete a user.
+    Permission: CanManageUsers (only superusers change the flags or superuser accounts).
+    """
+    queryset = User.objects.all()
+    serializer_class = AdminUserSerializer
+    permission_classes = [CanManageUsers]
+
+
 class AdminUserHistoryView(
+    HistoryListMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     mixins.DestroyModelMixin,
@@ -141,8 +184,9 @@ class AdminUserHistoryView(
     lookup_field = 'id'
 
     def get_queryset(self):
+        # Ordered by the paginator when listing (see HistoryListMixin)
         user_id = self.kwargs['user_id']
-        return PredictionHistory.objects.filter(user_id=user_id).order_by('-timestamp')
+        return PredictionHistory.objects.filter(user_id=user_id)
 
     def get(self, request, user_id, id=None):
         if id is None:
@@ -0,0 +1,40 @@
+# This file implements the short-lived signed links of the CSV export. A browser following a download
+# link cannot send the dashboard's JWT, so an admin first asks for a token (PredictionExportLinkView)
+# and the export endpoint accepts it as the `token` query parameter until it expires.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+EXPORT_TOKEN_SALT = 'analytics.export'
+
+
+def export_link_max_age():
+    """Seconds an export token stays valid."""
+    return getattr(settings, 'ANALYTICS_EXPORT_LINK_MAX_AGE', 300)
+
+
+def export_token(user):
+    """Signed token authenticating `user` on the export endpoint for export_link_max_age() seconds."""
+    return signing.TimestampSigner(salt=EXPORT_TOKEN_SALT).sign_object({'user': user.pk})
+
+
+class ExportTokenAuthentication(BaseAuthentication):
+    """Authenticate a request by the `token` query parameter issued by export_token()."""
+
+    def authenticate(self, request):
+        token = request.query_params.get('token')
+        if not token:
+            return None
+        try:
+            payload = signing.TimestampSigner(salt=EXPORT_TOKEN_SALT).unsign_object(
+                token, max_age=export_link_max_age())
+        except signing.SignatureExpired:
+            raise AuthenticationFailed("Export link expired.")
+        except signing.BadSignature:
+            raise AuthenticationFailed("Invalid export link.")
+        user = get_user_model().objects.filter(pk=payload['user'], is_active=True).first()
+        if user is None:
+            raise AuthenticationFailed("Invalid export link.")
+        return user, None
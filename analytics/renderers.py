@@ -0,0 +1,36 @@
+# This file defines the Apache Arrow renderer of the analytics API. pyarrow is an optional dependency:
+# without it, the API only offers JSON (see arrow_available).
+import importlib.util
+
+from rest_framework.renderers import BaseRenderer
+
+
+def arrow_available():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+class ArrowRenderer(BaseRenderer):
+    """
+    Render a list of rows (or a paginated page's `results`) as an Arrow IPC stream, which the dashboard
+    reads straight into a DataFrame. The page's `count` and `next` link go in the schema metadata.
+    """
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        import pyarrow as pa
+
+        metadata = {}
+        if isinstance(data, dict) and 'results' in data:
+            metadata = {key: str(value) for key, value in data.items() if key != 'results' and value is not None}
+            rows = data['results']
+        else:
+            # A single object, e.g. the metrics or an error
+            rows = data if isinstance(data, list) else [data]
+        table = pa.Table.from_pylist(rows, metadata=metadata or None)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
@@ -0,0 +1,21 @@
+# serializers.py
+from rest_framework import serializers
+
+from detection.models import PredictionHistory
+from detection.serializers import SelectableFieldsMixin
+
+
+class AdminPredictionSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
+    """
+    Serializer for prediction records across all users, as listed in the admin dashboard.
+    """
+    username = serializers.CharField(source='user.username', read_only=True)
+    first_name = serializers.CharField(source='user.first_name', read_only=True)
+    last_name = serializers.CharField(source='user.last_name', read_only=True)
+    remedy = serializers.CharField(source='remedy_text', read_only=True)
+    preventive_measures = serializers.CharField(source='preventive_measures_text', read_only=True)
+
+    class Meta:
+        model = PredictionHistory
+        fields = ['id', 'username', 'first_name', 'last_name', 'disease', 'confidence', 'timestamp', 'remedy',
+                  'preventive_measures']
@@ -0,0 +1,141 @@
+import csv
+import gzip
+import json
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from analytics.renderers import arrow_available
+from detection.models import PredictionHistory
+
+User = get_user_model()
+
+
+class AnalyticsTests(APITestCase):
+    def setUp(self):
+        """
+        Create an admin and a regular user with a few predictions, and authenticate as the admin.
+        """
+        self.admin = User.objects.create_user(username='admin', password='adminpass123', is_staff=True)
+        self.user = User.objects.create_user(username='grower', password='growerpass123')
+        for disease, confidence in (('Tomato___Late_blight', 0.95), ('Tomato___Late_blight', 0.55),
+                                    ('Apple___healthy', 0.99)):
+            PredictionHistory.objects.create(user=self.user, disease=disease, confidence=confidence)
+        self.client.force_authenticate(self.admin)
+
+    def test_analytics_is_admin_only(self):
+        """
+        Regular users should get 403 on the analytics endpoints.
+        """
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('analytics-metrics'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_metrics_and_series_are_read_from_the_daily_rollup(self):
+        """
+        The metrics and series should count the predictions, per disease and per day.
+        """
+        response = self.client.get(reverse('analytics-metrics'))
+        self.assertEqual(response.data, {"total_users": 2, "total_predictions": 3,
+                                         "most_predicted": 'Tomato___Late_blight'})
+
+        response = self.client.get(reverse('analytics-predictions-by-disease'))
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([(r['disease'], r['count']) for r in response.data['results']],
+                         [('Tomato___Late_blight', 2), ('Apple___healthy', 1)])
+
+        response = self.client.get(reverse('analytics-predictions-per-day'), {'limit': 1})
+        self.assertEqual(response.data['results'], [{'date': timezone.localdate(), 'count': 3}])
+
+        response = self.client.get(reverse('analytics-confidence-histogram'), {'disease': 'Tomato___Late_blight'})
+        self.assertEqual([(r['confidence_bucket'], r['count']) for r in response.data['results']], [(5, 1), (9, 1)])
+
+        response = self.client.get(reverse('analytics-predictions-per-day'), {'start': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_responses_are_gzip_compressed(self):
+        """
+        Clients accepting gzip should get compressed JSON.
+        """
+        response = self.client.get(reverse('analytics-predictions'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        page = json.loads(gzip.decompress(response.content))
+        self.assertEqual(len(page['results']), 3)
+        self.assertEqual(page['results'][0]['username'], 'grower')
+
+    def test_prediction_list_filters(self):
+        """
+        The admin prediction list should filter by id, username, disease and date.
+        """
+        url = reverse('analytics-predictions')
+        record = PredictionHistory.objects.filter(disease='Apple___healthy').get()
+        self.assertEqual([r['id'] for r in self.client.get(url, {'search': record.id}).data['results']],
+                         [record.id])
+        self.assertEqual(len(self.client.get(url, {'disease': 'blight', 'user': 'grow'}).data['results']), 2)
+        self.assertEqual(len(self.client.get(url, {'date': '2000-01-01'}).data['results']), 0)
+        self.assertEqual(self.client.get(url, {'search': 'abc'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_prediction_list_pages_and_detail(self):
+        """
+        The list should page by cursor without the advice texts, which the detail endpoint returns.
+        """
+        response = self.client.get(reverse('analytics-predictions'), {'page_size': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertNotIn('remedy', response.data['results'][0])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+
+        record = PredictionHistory.objects.filter(disease='Apple___healthy').get()
+        response = self.client.get(reverse('analytics-prediction-detail', args=[record.id]))
+        self.assertEqual(response.data['username'], 'grower')
+        self.assertEqual(response.data['remedy'], record.remedy_text)
+
+    def test_prediction_export_is_streamed_csv(self):
+        """
+        The export should stream the filtered predictions as CSV, newest first.
+        """
+        response = self.client.get(reverse('analytics-predictions-export'), {'disease': 'blight'})
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], ['id', 'username', 'first_name', 'last_name', 'disease', 'confidence', 'timestamp'])
+        self.assertEqual([row[4] for row in rows[1:]], ['Tomato___Late_blight'] * 2)
+        self.assertGreater(int(rows[1][0]), int(rows[2][0]))
+
+    def test_prediction_export_link_token(self):
+        """
+        A browser should download the export with the token of an export link instead of the JWT, until it expires.
+        """
+        token = self.client.get(reverse('analytics-predictions-export-link')).data['token']
+        self.client.force_authenticate(None)
+        url = reverse('analytics-predictions-export')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get(url, {'token': token, 'disease': 'healthy'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 2)
+        self.assertEqual(self.client.get(url, {'token': token + 'x'}).status_code, status.HTTP_401_UNAUTHORIZED)
+        with override_settings(ANALYTICS_EXPORT_LINK_MAX_AGE=-1):
+            self.assertEqual(self.client.get(url, {'token': token}).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.force_authenticate(self.user)
+        token = self.client.get(reverse('analytics-predictions-export-link'))
+        self.assertEqual(token.status_code, status.HTTP_403_FORBIDDEN)
+
+    @unittest.skipUnless(arrow_available(), "pyarrow is not installed")
+    def test_series_as_arrow(self):
+        """
+        ?format=arrow should return an Arrow stream with the page's next link in the schema metadata.
+        """
+        import pyarrow.ipc
+
+        response = self.client.get(reverse('analytics-predictions-by-disease'), {'format': 'arrow', 'limit': 1})
+        self.assertEqual(response['Content-Type'], 'application/vnd.apache.arrow.stream')
+        table = pyarrow.ipc.open_stream(response.content).read_all()
+        self.assertEqual(table.to_pylist(), [{'disease': 'Tomato___Late_blight', 'count': 2}])
+        self.assertIn(b'offset=1', table.schema.metadata[b'next'])
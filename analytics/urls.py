@@ -0,0 +1,18 @@
+from django.urls import path
+from .views import *
+
+"""
+URL patterns for the admin-only analytics API read by the Streamlit dashboard.
+"""
+
+urlpatterns = [
+    path('metrics/', MetricsView.as_view(), name='analytics-metrics'),  # Totals and most predicted disease
+    path('user-growth/', UserGrowthView.as_view(), name='analytics-user-growth'),  # Users joined per day
+    path('predictions-per-day/', PredictionsPerDayView.as_view(), name='analytics-predictions-per-day'),
+    path('predictions-by-disease/', PredictionsByDiseaseView.as_view(), name='analytics-predictions-by-disease'),
+    path('confidence-histogram/', ConfidenceHistogramView.as_view(), name='analytics-confidence-histogram'),
+    path('predictions/', PredictionListView.as_view(), name='analytics-predictions'),  # All users' predictions
+    path('predictions/export/', PredictionExportView.as_view(), name='analytics-predictions-export'),  # Streamed CSV
+    path('predictions/export/link/', PredictionExportLinkView.as_view(), name='analytics-predictions-export-link'),
+    path('predictions/<int:id>/', PredictionDetailView.as_view(), name='analytics-prediction-detail'),
+]
@@ -0,0 +1,254 @@
+import csv
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from django.utils.decorators import method_decorator
+from django.views.decorators.gzip import gzip_page
+from rest_framework import generics
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from detection.models import DailyDiseaseStat, PredictionHistory
+from detection.pagination import KeysetPagination
+from detection.queries import filter_by_date, filter_by_disease
+from .authentication import ExportTokenAuthentication, export_link_max_age, export_token
+from .renderers import ArrowRenderer, arrow_available
+from .serializers import AdminPredictionSerializer
+
+User = get_user_model()
+
+# JSON, or Arrow with ?format=arrow (or Accept: application/vnd.apache.arrow.stream) when pyarrow is installed
+RENDERERS = [JSONRenderer] + ([ArrowRenderer] if arrow_available() else [])
+
+# Columns of the prediction list and CSV export (the advice texts are only in the detail endpoint)
+USER_COLUMNS = {
+    'username': F('user__username'),
+    'first_name': F('user__first_name'),
+    'last_name': F('user__last_name'),
+}
+PREDICTION_COLUMNS = ['id', *USER_COLUMNS, 'disease', 'confidence', 'timestamp']
+# Rows fetched from the database at a time while streaming the CSV export
+EXPORT_CHUNK_SIZE = 2000
+
+
+def date_param(request, name):
+    """Parse an optional YYYY-MM-DD query parameter."""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    day = parse_date(value) if len(value) == 10 else None
+    if day is None:
+        raise ValidationError({name: ["Expected a date in YYYY-MM-DD format."]})
+    return day
+
+
+class SeriesPagination(LimitOffsetPagination):
+    """Chart series are small: pages of up to 1000 rows by default."""
+    default_limit = 1000
+    max_limit = 10000
+
+
+@method_decorator(gzip_page, name='dispatch')
+class AnalyticsView(APIView):
+    """
+    Base of the admin-only analytics endpoints: gzip-compressed responses (for clients sending
+    Accept-Encoding: gzip), in JSON or Arrow.
+    """
+    permission_classes = [IsAdminUser]
+    renderer_classes = RENDERERS
+
+
+class MetricsView(AnalyticsView):
+    """
+    API endpoint returning the dashboard's headline numbers.
+    """
+
+    def get(self, request):
+        by_disease = DailyDiseaseStat.objects.values('disease').annotate(count=Sum('count')).order_by('-count')
+        most_predicted = by_disease.first()
+        return Response({
+            "total_users": User.objects.count(),
+            "total_predictions": DailyDiseaseStat.objects.aggregate(total=Sum('count'))['total'] or 0,
+            "most_predicted": most_predicted['disease'] if most_predicted else None,
+        })
+
+
+class SeriesView(AnalyticsView):
+    """
+    Base of the endpoints returning a pre-aggregated series (rows of a `values()` queryset),
+    paginated with `limit` / `offset`.
+    """
+    pagination_class = SeriesPagination
+
+    def get_rows(self, request):
+        raise NotImplementedError
+
+    def get(self, request):
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(self.get_rows(request), request, view=self)
+        return paginator.get_paginated_response(list(page))
+
+
+class StatsSeriesView(SeriesView):
+    """Series read from the DailyDiseaseStat rollup, optionally limited by `start` / `end` dates and `disease`."""
+
+    def stats(self, request):
+        stats = DailyDiseaseStat.objects.all()
+        start, end = date_param(request, 'start'), date_param(request, 'end')
+        if start:
+            stats = stats.filter(date__gte=start)
+        if end:
+            stats = stats.filter(date__lte=end)
+        if request.query_params.get('disease'):
+            stats = stats.filter(disease=request.query_params['disease'])
+        return stats
+
+
+class UserGrowthView(SeriesView):
+    """
+    API endpoint returning the number of users who joined each day.
+    """
+
+    def get_rows(self, request):
+        return (User.objects.annotate(date=TruncDate('date_joined')).values('date')
+                .annotate(count=Count('id')).order_by('date'))
+
+
+class PredictionsPerDayView(StatsSeriesView):
+    """
+    API endpoint returning the number of predictions made each day.
+    """
+
+    def get_rows(self, request):
+        return self.stats(request).values('date').annotate(count=Sum('count')).order_by('date')
+
+
+class PredictionsByDiseaseView(StatsSeriesView):
+    """
+    API endpoint returning the number of predictions of each disease, most predicted first.
+    """
+
+    def get_rows(self, request):
+        return self.stats(request).values('disease').annotate(count=Sum('count')).order_by('-count', 'disease')
+
+
+class ConfidenceHistogramView(StatsSeriesView):
+    """
+    API endpoint returning the number of predictions per confidence decile
+    (bucket 0 is [0, 0.1), bucket 9 is [0.9, 1]).
+    """
+
+    def get_rows(self, request):
+        return (self.stats(request).values('confidence_bucket').annotate(count=Sum('count'))
+                .order_by('confidence_bucket'))
+
+
+class PredictionFilterMixin:
+    """
+    Filters of the admin prediction endpoints: `search` (prediction id), `user` (username contains),
+    `disease` (contains) and `date` (YYYY-MM-DD).
+    """
+
+    def filter_predictions(self, predictions):
+        params = self.request.query_params
+        if params.get('search'):
+            if not params['search'].isdigit():
+                raise ValidationError({"search": ["Expected a prediction id."]})
+            predictions = predictions.filter(id=params['search'])
+        if params.get('user'):
+            predictions = predictions.filter(user__username__icontains=params['user'])
+        if params.get('disease'):
+            predictions = filter_by_disease(predictions, params['disease'])
+        day = date_param(self.request, 'date')
+        if day:
+            predictions = filter_by_date(predictions, day)
+        return predictions
+
+    def prediction_rows(self):
+        """The filtered predictions as dicts of PREDICTION_COLUMNS (one query, joined with the user table)."""
+        predictions = self.filter_predictions(PredictionHistory.objects.all())
+        return predictions.values('id', 'disease', 'confidence', 'timestamp', **USER_COLUMNS)
+
+
+@method_decorator(gzip_page, name='dispatch')
+class PredictionListView(PredictionFilterMixin, generics.ListAPIView):
+    """
+    API endpoint listing the predictions of all users (PREDICTION_COLUMNS), newest first, paginated by cursor.
+    """
+    serializer_class = AdminPredictionSerializer
+    permission_classes = [IsAdminUser]
+    renderer_classes = RENDERERS
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        return self.prediction_rows()
+
+    def list(self, request, *args, **kwargs):
+        # The rows are already plain dicts: no serializer, no model instances
+        page = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(page)
+
+
+class PredictionDetailView(generics.RetrieveAPIView):
+    """
+    API endpoint returning one prediction with its remedy and preventive measures.
+    """
+    serializer_class = AdminPredictionSerializer
+    permission_classes = [IsAdminUser]
+    lookup_field = 'id'
+    queryset = PredictionHistory.objects.select_related('user', 'disease_info')
+
+
+class Echo:
+    """File-like object whose write() returns the line, so csv.writer can format rows for streaming."""
+
+    def write(self, value):
+        return value
+
+
+@method_decorator(gzip_page, name='dispatch')
+class PredictionExportView(PredictionFilterMixin, APIView):
+    """
+    API endpoint exporting the filtered predictions as CSV, streamed in chunks: neither the server nor
+    the client holds the whole table in memory. Besides the JWT, it accepts the `token` of an export
+    link, so browsers can download it directly.
+    """
+    permission_classes = [IsAdminUser]
+    authentication_classes = [*api_settings.DEFAULT_AUTHENTICATION_CLASSES, ExportTokenAuthentication]
+
+    def get(self, request):
+        rows = self.prediction_rows().order_by('-timestamp', '-id').values_list(*PREDICTION_COLUMNS)
+
+        def lines():
+            writer = csv.writer(Echo())
+            yield writer.writerow(PREDICTION_COLUMNS)
+            chunk = []
+            for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+                chunk.append(writer.writerow(row))
+                if len(chunk) == EXPORT_CHUNK_SIZE:
+                    yield ''.join(chunk)
+                    chunk = []
+            if chunk:
+                yield ''.join(chunk)
+
+        response = StreamingHttpResponse(lines(), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="predictions.csv"'
+        return response
+
+
+class PredictionExportLinkView(AnalyticsView):
+    """
+    API endpoint issuing a short-lived token for a download link to the CSV export
+    (`predictions/export/?token=...` plus the filters).
+    """
+
+    def get(self, request):
+        return Response({"token": export_token(request.user), "expires_in": export_link_max_age()})
@@ -1,6 +1,32 @@
+import logging
+
 from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
 
 
 class DetectionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'detection'
+
+    def ready(self):
+        """
+        Optionally load (and warm up) the model at process start instead of on the first request.
+        When run before a pre-forking server forks, workers share the model weight pages copy-on-write.
+        """
+        # Release image references when history records are deleted, and keep the daily counts current
+        from . import blobs, stats  # noqa: F401
+
+        if not getattr(settings, 'DETECTION_PRELOAD_MODEL', False):
+            return
+        from . import model_loader
+        try:
+            if getattr(settings, 'DETECTION_PRELOAD_WARMUP', True):
+                model_loader.warm_up()
+            elif not model_loader.remote_inference():
+                # Load the weights only (with remote inference there is nothing to load in this process)
+                model_loader.load_weights()
+        except Exception:
+            # Keep the process up; the health endpoint reports it as not ready
+            logger.exception("Failed to preload the plant disease model")
@@ -0,0 +1,158 @@
+# This file contains native async versions of the prediction endpoints, for serving under ASGI
+# (e.g. `uvicorn plantguard.asgi:application`).
+# The ASGI handler reads the request body without holding a thread, decoding and hashing run in worker
+# threads, inference awaits the shared micro-batcher, and the history records are written with the async ORM.
+# A slow mobile upload therefore costs an open connection rather than a blocked worker thread.
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .batching import apredict_batched, apredict_many
+from .inference import decode_prediction, disease_details, history_fields
+from .model_loader import active_model_version, get_active_metadata
+from .models import PredictionHistory
+from .prediction_cache import get_prediction_cache, make_cache_key
+from .preprocessing import preprocess_image, preprocess_batch
+from .upload_handlers import RejectedUpload, install_upload_handlers
+from .image_store import persist_image
+from .views import _collect_uploads, build_batch_results, finish_batch_records
+
+
+class AsyncAPIView(View):
+    """
+    Base class of the async endpoints: JWT authentication (as configured for the DRF views)
+    and JSON error responses in the same format as DRF.
+    """
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # Token-authenticated like the DRF views, so CSRF does not apply
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            user_auth = await sync_to_async(JWTAuthentication().authenticate)(request)
+        except AuthenticationFailed as e:
+            detail = e.detail if isinstance(e.detail, dict) else {"detail": e.detail}
+            return JsonResponse(detail, status=status.HTTP_401_UNAUTHORIZED,
+                                headers={"WWW-Authenticate": 'Bearer realm="api"'})
+        if user_auth is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."},
+                                status=status.HTTP_401_UNAUTHORIZED,
+                                headers={"WWW-Authenticate": 'Bearer realm="api"'})
+        request.user = user_auth[0]
+        # The ASGI handler has already received the body, but rejected uploads are still never
+        # copied into memory or decoded
+        install_upload_handlers(request)
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def get_files(self, request):
+        """Parse the multipart body (already received by the ASGI handler) in a worker thread."""
+        return await asyncio.to_thread(lambda: request.FILES)
+
+
+def _cached_prediction(image_file):
+    """Return (cache, cache_key, cached prediction or None) for an upload."""
+    cache = get_prediction_cache()
+    if cache is None:
+        return None, None, None
+    cache_key = make_cache_key(image_file, active_model_version())
+    return cache, cache_key, cache.get(cache_key)
+
+
+class AsyncPlantDiseaseDetectView(AsyncAPIView):
+    """
+    Async version of PlantDiseaseDetectAPIView, with the same request and response format.
+    Only accessible to authenticated users.
+    """
+
+    async def post(self, request):
+        files = await self.get_files(request)
+        if 'image' not in files:
+            return JsonResponse(
+                {"error": "No leaf or disease found. Please provide a leaf image."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        image_file = files['image']
+        if isinstance(image_file, RejectedUpload):
+            return JsonResponse({"error": image_file.rejection}, status=image_file.status_code)
+
+        try:
+            cache, cache_key, cached = await asyncio.to_thread(_cached_prediction, image_file)
+
+            if cached is not None:
+                pred_label, confidence = cached
+            else:
+                metadata = await asyncio.to_thread(get_active_metadata)
+                img_array = await asyncio.to_thread(preprocess_image, image_file, metadata)
+
+                # Wait for the shared micro-batcher without blocking a thread
+                preds = await apredict_batched(img_array)
+                pred_label, confidence = decode_prediction(preds, metadata.labels)
+                if cache is not None:
+                    await asyncio.to_thread(cache.set, cache_key, (pred_label, confidence))
+
+            remedy, prevention = disease_details(pred_label)
+
+            record = await PredictionHistory.objects.acreate(
+                user=request.user,
+                confidence=confidence,
+                **await sync_to_async(history_fields)(pred_label),
+            )
+            # On the ORM's thread, so the write is tied to the connection that saved the record
+            await sync_to_async(persist_image)(record, image_file)
+
+            return JsonResponse({
+                "disease": pred_label,
+                "confidence": round(confidence, 4),
+                "remedy": remedy,
+                "preventive_measure": prevention,
+            })
+
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AsyncBatchPredictView(AsyncAPIView):
+    """
+    Async version of BatchPredictView, with the same request and response format.
+    Only accessible to authenticated users.
+    """
+
+    async def post(self, request):
+        await self.get_files(request)
+        try:
+            files = await asyncio.to_thread(_collect_uploads, request)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            metadata = await asyncio.to_thread(get_active_metadata)
+            batch, errors = await asyncio.to_thread(preprocess_batch, files, metadata)
+
+            valid = [i for i, error in enumerate(errors) if error is None]
+            predictions = dict(zip(valid, await apredict_many([batch[i] for i in valid])))
+
+            results, records = await sync_to_async(build_batch_results)(
+                request.user, files, errors, predictions, metadata.labels,
+            )
+            # Insert and count the records in one transaction, on one thread
+            await sync_to_async(finish_batch_records)(results, records, files)
+
+            return JsonResponse({
+                "count": len(results),
+                "succeeded": len(records),
+                "failed": len(results) - len(records),
+                "results": results,
+            })
+
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,348 @@
+# This file defines the inference backends the model registry serves models through.
+# Every backend exposes the same surface (load, warm_up, predict_batch, describe), so the views and the
+# micro-batcher never depend on a specific runtime. The backend is chosen from DETECTION_INFERENCE_BACKEND
+# or, by default, from the file extension of the active model (.h5/.keras, .tflite, .onnx).
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from .metadata import DEFAULT_INPUT_SIZE
+
+
+class BackendUnavailable(RuntimeError):
+    """Raised when the runtime a backend needs is not installed."""
+
+
+def get_input_size(model):
+    """Return the (height, width) the model expects, falling back to DEFAULT_INPUT_SIZE."""
+    height, width = model.input_shape[1:3]
+    if height is None or width is None:
+        return DEFAULT_INPUT_SIZE
+    return int(height), int(width)
+
+
+def compile_predict_fn(model):
+    """
+    Wrap a Keras model in a tf.function with a fixed [None, H, W, 3] float32 input signature.
+
+    Calling the traced function skips the tf.data pipeline and callback setup that
+    model.predict() builds on every call. The function is traced once here by running
+    a dummy batch, so the first real request does not pay the tracing cost.
+    """
+    import tensorflow as tf
+
+    height, width = model.input_shape[1:3]
+
+    @tf.function(input_signature=[tf.TensorSpec(shape=[None, height, width, 3], dtype=tf.float32)])
+    def serve(images):
+        return model(images, training=False)
+
+    warmup_height, warmup_width = get_input_size(model)
+    serve(tf.zeros([1, warmup_height, warmup_width, 3], dtype=tf.float32))
+    return serve
+
+
+def tflite_runtime():
+    """
+    Return the (Interpreter, OpResolverType) classes, preferring the standalone LiteRT / tflite_runtime
+    packages and falling back to the interpreter bundled with TensorFlow.
+    """
+    try:
+        from ai_edge_litert.interpreter import Interpreter, OpResolverType
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter, OpResolverType
+        except ImportError:
+            try:
+                import tensorflow as tf
+            except ImportError:
+                raise BackendUnavailable("Serving .tflite models requires ai-edge-litert, tflite-runtime or tensorflow.")
+            Interpreter, OpResolverType = tf.lite.Interpreter, tf.lite.experimental.OpResolverType
+    return Interpreter, OpResolverType
+
+
+def make_interpreter(path, num_threads=None, default_delegates=True):
+    """
+    Create a TFLite interpreter for a model file.
+
+    The model file is memory-mapped. With default_delegates=False the XNNPACK delegate is not applied,
+    so kernels read the weights in place from the read-only mapping instead of repacking them into
+    process-private memory, and every process serving the file shares one copy of the weights.
+    """
+    Interpreter, OpResolverType = tflite_runtime()
+    resolver = OpResolverType.AUTO if default_delegates else OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+    return Interpreter(model_path=path, num_threads=num_threads, experimental_op_resolver_type=resolver)
+
+
+class InferenceBackend:
+    """
+    Base class of the inference backends.
+
+    - load(): read the model file (called once by the registry).
+    - warm_up(): run a dummy batch so the first request does not pay one-off setup costs.
+    - predict_batch(batch): float32 (N, H, W, 3) in, float32 (N, num_classes) probabilities out.
+    - describe(): JSON-serializable details for the metrics endpoint.
+
+    input_shape / output_shape follow the Keras convention, (None, H, W, 3) and (None, num_classes),
+    so metadata validation works the same for every backend.
+    """
+
+    name = None
+    extensions = ()
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        raise NotImplementedError
+
+    @property
+    def input_shape(self):
+        raise NotImplementedError
+
+    @property
+    def output_shape(self):
+        raise NotImplementedError
+
+    def warm_up(self):
+        height, width = get_input_size(self)
+        self.predict_batch(np.zeros((1, height, width, 3), dtype=np.float32))
+
+    def predict_batch(self, batch):
+        raise NotImplementedError
+
+    def release(self):
+        """Drop references to the model so its memory can be reclaimed."""
+
+    def describe(self):
+        return {
+            "backend": self.name,
+            "file": os.path.basename(self.path),
+        }
+
+
+class KerasBackend(InferenceBackend):
+    """
+    Keras model served through a traced tf.function, or through model.predict() when
+    DETECTION_USE_KERAS_PREDICT is enabled (useful for debugging).
+
+    An already built model can be passed in, in which case load() does not read the file.
+    """
+
+    name = 'keras'
+    extensions = ('.h5', '.keras')
+
+    def __init__(self, path, model=None):
+        super().__init__(path)
+        self.model = model
+        self.predict_fn = None
+
+    def load(self):
+        if self.model is None:
+            import tensorflow as tf
+            self.model = tf.keras.models.load_model(self.path)
+        return self
+
+    @property
+    def input_shape(self):
+        return tuple(self.model.input_shape)
+
+    @property
+    def output_shape(self):
+        return tuple(self.model.output_shape)
+
+    def warm_up(self):
+        if getattr(settings, 'DETECTION_USE_KERAS_PREDICT', False):
+            super().warm_up()
+        elif self.predict_fn is None:
+            self.predict_fn = compile_predict_fn(self.model)
+
+    def predict_batch(self, batch):
+        if getattr(settings, 'DETECTION_USE_KERAS_PREDICT', False):
+            return self.model.predict(batch, verbose=0)
+        if self.predict_fn is None:
+            self.predict_fn = compile_predict_fn(self.model)
+        return self.predict_fn(np.asarray(batch, dtype=np.float32)).numpy()
+
+    def release(self):
+        self.model = None
+        self.predict_fn = None
+
+
+class TFLiteBackend(InferenceBackend):
+    """
+    A (typically quantized) TFLite model file, as written by the export_tflite management command.
+
+    The interpreter is not thread-safe, so calls are serialized with a lock; the input tensor is
+    resized only when the batch size changes. With shared_weights the weights are served from the
+    memory-mapped file (see make_interpreter) rather than copied into each process.
+    """
+
+    name = 'tflite'
+    extensions = ('.tflite',)
+
+    def __init__(self, path, num_threads=None, shared_weights=False):
+        super().__init__(path)
+        self.num_threads = num_threads
+        self.shared_weights = shared_weights
+        self.interpreter = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        self.interpreter = make_interpreter(self.path, num_threads=self.num_threads,
+                                            default_delegates=not self.shared_weights)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        return self
+
+    @property
+    def input_shape(self):
+        return (None,) + tuple(int(dim) for dim in self._input['shape'][1:])
+
+    @property
+    def output_shape(self):
+        return (None,) + tuple(int(dim) for dim in self._output['shape'][1:])
+
+    def _quantize(self, batch):
+        scale, zero_point = self._input['quantization']
+        if self._input['dtype'] == np.float32 or not scale:
+            return batch.astype(self._input['dtype'], copy=False)
+        info = np.iinfo(self._input['dtype'])
+        return np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(self._input['dtype'])
+
+    def _dequantize(self, output):
+        scale, zero_point = self._output['quantization']
+        if self._output['dtype'] == np.float32 or not scale:
+            return output.astype(np.float32, copy=False)
+        return (output.astype(np.float32) - zero_point) * scale
+
+    def predict_batch(self, batch):
+        batch = np.asarray(batch)
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input['index'], list(batch.shape))
+                self.interpreter.allocate_tensors()
+                self._input = self.interpreter.get_input_details()[0]
+                self._output = self.interpreter.get_output_details()[0]
+                self._batch_size = batch.shape[0]
+            self.interpreter.set_tensor(self._input['index'], self._quantize(batch))
+            self.interpreter.invoke()
+            return self._dequantize(self.interpreter.get_tensor(self._output['index']).copy())
+
+    def release(self):
+        self.interpreter = None
+
+    def describe(self):
+        return dict(super().describe(), input_dtype=np.dtype(self._input['dtype']).name,
+                    shared_weights=self.shared_weights)
+
+
+class ONNXBackend(InferenceBackend):
+    """
+    An ONNX model served by ONNX Runtime on the CPU execution provider (see the export_onnx command).
+    onnxruntime is an optional dependency and is only imported when an .onnx model is loaded.
+    """
+
+    name = 'onnx'
+    extensions = ('.onnx',)
+
+    def __init__(self, path, num_threads=None):
+        super().__init__(path)
+        self.num_threads = num_threads
+        self.session = None
+
+    def load(self):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise BackendUnavailable("Serving .onnx models requires the onnxruntime package.")
+        options = onnxruntime.SessionOptions()
+        if self.num_threads:
+            options.intra_op_num_threads = self.num_threads
+        self.session = onnxruntime.InferenceSession(self.path, options, providers=['CPUExecutionProvider'])
+        self._input = self.session.get_inputs()[0]
+        self._output = self.session.get_outputs()[0]
+        return self
+
+    @staticmethod
+    def _shape(dims):
+        # Symbolic dimensions (e.g. the batch axis) are reported as strings or None
+        return (None,) + tuple(dim if isinstance(dim, int) else None for dim in dims[1:])
+
+    @property
+    def input_shape(self):
+        return self._shape(self._input.shape)
+
+    @property
+    def output_shape(self):
+        return self._shape(self._output.shape)
+
+    def predict_batch(self, batch):
+        # InferenceSession.run is thread-safe
+        return self.session.run([self._output.name], {self._input.name: np.asarray(batch, dtype=np.float32)})[0]
+
+    def release(self):
+        self.session = None
+
+
+BACKENDS = {backend.name: backend for backend in (KerasBackend, TFLiteBackend, ONNXBackend)}
+
+
+def backend_for_path(path):
+    """Return the backend class serving a model file, based on its extension (Keras by default)."""
+    extension = os.path.splitext(path)[1].lower()
+    for backend in BACKENDS.values():
+        if extension in backend.extensions:
+            return backend
+    return KerasBackend
+
+
+def tflite_variant_path(path, variant):
+    """Return the path export_tflite writes the given variant of a Keras model to."""
+    return f"{os.path.splitext(path)[0]}_{variant}.tflite"
+
+
+def onnx_variant_path(path):
+    """Return the path export_onnx writes a Keras model to."""
+    return f"{os.path.splitext(path)[0]}.onnx"
+
+
+def tflite_variant():
+    """
+    The TFLite variant to serve: DETECTION_TFLITE_VARIANT, or by default 'float32' with shared weights
+    (the quantized variants are not memory-mapped as is) and 'dynamic' otherwise.
+    """
+    variant = getattr(settings, 'DETECTION_TFLITE_VARIANT', None)
+    if variant is None:
+        variant = 'float32' if getattr(settings, 'DETECTION_SHARED_WEIGHTS', False) else 'dynamic'
+    return variant
+
+
+def backend_variant_path(path, backend_name):
+    """
+    Return the file the given backend should serve for a Keras model file, or path itself.
+    TFLite serves the exported <model>_<variant>.tflite, ONNX the exported <model>.onnx.
+    """
+    if backend_name == 'tflite':
+        return tflite_variant_path(path, tflite_variant())
+    if backend_name == 'onnx':
+        return onnx_variant_path(path)
+    return path
+
+
+def load_backend(path):
+    """Create and load the backend for a model file."""
+    backend_class = backend_for_path(path)
+    threads = getattr(settings, 'DETECTION_INFERENCE_THREADS', None)
+    if backend_class is KerasBackend:
+        backend = backend_class(path)
+    elif backend_class is TFLiteBackend:
+        backend = backend_class(path, num_threads=threads,
+                                shared_weights=getattr(settings, 'DETECTION_SHARED_WEIGHTS', False))
+    else:
+        backend = backend_class(path, num_threads=threads)
+    return backend.load()
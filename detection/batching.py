@@ -0,0 +1,222 @@
+# This file implements dynamic micro-batching for model inference.
+# Concurrent prediction requests are queued, grouped into a single batch for up to a short
+# time window (or until the batch is full), run through the model in one forward pass,
+# and the per-image results are handed back to the waiting requests.
+import asyncio
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+from django.conf import settings
+
+
+class BatchMetrics:
+    """
+    Thread-safe counters describing how the batcher is behaving.
+
+    Tracks batch sizes and how long each request waited in the queue before its batch
+    was dispatched, so the batching window can be tuned for throughput vs. tail latency.
+    """
+
+    def __init__(self, sample_size=2048):
+        self._lock = threading.Lock()
+        self._batch_sizes = deque(maxlen=sample_size)
+        self._queue_waits = deque(maxlen=sample_size)
+        self.total_batches = 0
+        self.total_requests = 0
+        self.max_batch_size = 0
+
+    def record(self, batch_size, queue_waits):
+        """Record one dispatched batch and the queue wait (seconds) of each of its requests."""
+        with self._lock:
+            self.total_batches += 1
+            self.total_requests += batch_size
+            self.max_batch_size = max(self.max_batch_size, batch_size)
+            self._batch_sizes.append(batch_size)
+            self._queue_waits.extend(queue_waits)
+
+    def snapshot(self):
+        """Return a JSON-serializable summary of the recorded metrics."""
+        with self._lock:
+            sizes = np.array(self._batch_sizes, dtype=np.float64)
+            waits_ms = np.array(self._queue_waits, dtype=np.float64) * 1000.0
+            return {
+                "total_batches": self.total_batches,
+                "total_requests": self.total_requests,
+                "max_batch_size": self.max_batch_size,
+                "mean_batch_size": round(float(sizes.mean()), 3) if sizes.size else 0.0,
+                "queue_wait_ms": {
+                    "mean": round(float(waits_ms.mean()), 3) if waits_ms.size else 0.0,
+                    "p50": round(float(np.percentile(waits_ms, 50)), 3) if waits_ms.size else 0.0,
+                    "p99": round(float(np.percentile(waits_ms, 99)), 3) if waits_ms.size else 0.0,
+                    "max": round(float(waits_ms.max()), 3) if waits_ms.size else 0.0,
+                },
+            }
+
+
+class MicroBatcher:
+    """
+    Collect concurrent inference requests and run them through the model as one batch.
+
+    - predict_fn: callable taking a float32 array of shape (N, H, W, C) and returning
+      an array of shape (N, num_classes).
+    - max_batch_size: dispatch as soon as this many requests are waiting.
+    - window_ms: maximum time the first request of a batch waits for others to join.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, window_ms=10.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.window = max(0.0, float(window_ms)) / 1000.0
+        self.metrics = BatchMetrics()
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, image_array):
+        """
+        Queue a single preprocessed image of shape (H, W, C) or (1, H, W, C).
+        Returns a Future resolving to the model output row for that image.
+        """
+        if image_array.ndim == 4:
+            image_array = image_array[0]
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((image_array, future, time.perf_counter()))
+        return future
+
+    def predict(self, image_array, timeout=None):
+        """Submit an image and block until its prediction row is available."""
+        return self.submit(image_array).result(timeout=timeout)
+
+    def _ensure_worker(self):
+        # Start the dispatcher thread lazily so it is never created before a fork.
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="detection-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        """Block for the first request, then gather more until the window closes or the batch is full."""
+        items = [self._queue.get()]
+        deadline = items[0][2] + self.window
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    items.append(self._queue.get_nowait())
+                else:
+                    items.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            dispatched_at = time.perf_counter()
+            futures = [future for _, future, _ in items]
+            self.metrics.record(len(items), [dispatched_at - enqueued for _, _, enqueued in items])
+            try:
+                batch = np.stack([array for array, _, _ in items]).astype(np.float32, copy=False)
+                preds = np.asarray(self.predict_fn(batch))
+                for i, future in enumerate(futures):
+                    future.set_result(preds[i])
+            except Exception as exc:
+                # Fan the failure out so no request is left waiting forever
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(exc)
+
+
+_batcher = None
+_batcher_pid = None
+_batcher_lock = threading.Lock()
+
+
+def _model_predict(batch):
+    """Default batch predict function backed by the shared model."""
+    from .model_loader import predict_batch
+    return predict_batch(batch)
+
+
+def get_batcher():
+    """
+    Return the process-wide MicroBatcher, creating it on first use.
+    A new batcher is created after a fork so each worker process owns its dispatcher thread.
+    """
+    global _batcher, _batcher_pid
+    if _batcher is None or _batcher_pid != os.getpid():
+        with _batcher_lock:
+            if _batcher is None or _batcher_pid != os.getpid():
+                _batcher = MicroBatcher(
+                    _model_predict,
+                    max_batch_size=getattr(settings, 'DETECTION_BATCH_MAX_SIZE', 32),
+                    window_ms=getattr(settings, 'DETECTION_BATCH_WINDOW_MS', 10),
+                )
+                _batcher_pid = os.getpid()
+    return _batcher
+
+
+def predict_batched(image_array):
+    """
+    Run a single preprocessed image through the model, going through the micro-batcher
+    unless batching is disabled in settings. Returns the class probability row.
+    """
+    if not getattr(settings, 'DETECTION_BATCHING_ENABLED', True):
+        return np.asarray(_model_predict(image_array.reshape((-1,) + image_array.shape[-3:])))[0]
+    return get_batcher().predict(image_array)
+
+
+def predict_many(image_arrays):
+    """
+    Run several preprocessed (H, W, C) images through the model and return their probability rows.
+    With batching enabled the images are queued together, so the batcher packs them into full
+    batches (shared with any concurrent single-image requests); otherwise they are run in
+    chunks of DETECTION_BATCH_MAX_SIZE.
+    """
+    if not image_arrays:
+        return []
+    if getattr(settings, 'DETECTION_BATCHING_ENABLED', True):
+        batcher = get_batcher()
+        futures = [batcher.submit(array) for array in image_arrays]
+        return [future.result() for future in futures]
+    chunk_size = max(1, getattr(settings, 'DETECTION_BATCH_MAX_SIZE', 32))
+    rows = []
+    for start in range(0, len(image_arrays), chunk_size):
+        chunk = np.stack(image_arrays[start:start + chunk_size]).astype(np.float32, copy=False)
+        rows.extend(np.asarray(_model_predict(chunk)))
+    return rows
+
+
+async def apredict_batched(image_array):
+    """
+    Async counterpart of predict_batched for async views: awaits the batcher's future,
+    so no thread is blocked while the request waits for its batch.
+    """
+    if not getattr(settings, 'DETECTION_BATCHING_ENABLED', True):
+        return await asyncio.to_thread(predict_batched, image_array)
+    return await asyncio.wrap_future(get_batcher().submit(image_array))
+
+
+async def apredict_many(image_arrays):
+    """Async counterpart of predict_many."""
+    if not image_arrays:
+        return []
+    if not getattr(settings, 'DETECTION_BATCHING_ENABLED', True):
+        return await asyncio.to_thread(predict_many, image_arrays)
+    batcher = get_batcher()
+    return list(await asyncio.gather(*(asyncio.wrap_future(batcher.submit(array)) for array in image_arrays)))
+
+
+def batching_metrics():
+    """Return the current batcher metrics, or empty metrics if nothing has been batched yet."""
+    if _batcher is None or _batcher_pid != os.getpid():
+        return BatchMetrics().snapshot()
+    return _batcher.metrics.snapshot()
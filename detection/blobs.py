@@ -0,0 +1,100 @@
+# This file keeps the reference counts of the content-addressed prediction images (MediaBlob rows).
+# A reference is taken when a PredictionHistory record is pointed at a file, and released when the record
+# is deleted (one history entry, a whole user's history, or the user itself); files whose last reference
+# is gone are deleted once the deleting transaction commits. Job uploads are not shared: they are deleted
+# once processed (jobs.py) or with their job item.
+from collections import Counter
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .derivatives import delete_derivatives
+from .models import MediaBlob, PredictionHistory, PredictionJobItem
+from .storage import image_storage
+
+
+def register_blob(name, size, source=''):
+    """
+    Record a file about to be stored, with one reference, and return its MediaBlob. Call it in the
+    transaction that writes the file: the row is locked, so garbage collection cannot delete the file
+    between the reference and the write.
+    """
+    blob, created = MediaBlob.objects.select_for_update().get_or_create(
+        name=name, defaults={'size': size, 'source': source, 'refcount': 1})
+    if not created:
+        MediaBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') + 1)
+    return blob
+
+
+def acquire_blob(source):
+    """
+    Add a reference to the file stored for an upload (see image_store.source_key) and return its name,
+    or None if there is none, e.g. because it was just garbage collected: it must then be stored again.
+    """
+    with transaction.atomic():
+        # Locked, so a concurrent collect_garbage either waits for the reference or has deleted the row
+        blob = MediaBlob.objects.select_for_update().filter(source=source).first()
+        if blob is None or not MediaBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') + 1):
+            return None
+    return blob.name
+
+
+def release_blobs(names):
+    """Drop one reference per name, and delete the files left unreferenced after commit."""
+    names = [name for name in names if name]
+    if not names:
+        return
+    for name, count in Counter(names).items():
+        MediaBlob.objects.filter(name=name).update(refcount=F('refcount') - count)
+    transaction.on_commit(lambda: collect_garbage(names))
+
+
+def collect_garbage(names=None):
+    """
+    Delete the MediaBlob rows of unreferenced files (among `names`, or all of them), and the files and
+    their derivatives once that commits. Returns the number of files deleted.
+    """
+    blobs = MediaBlob.objects.filter(refcount__lte=0)
+    if names is not None:
+        blobs = blobs.filter(name__in=set(names))
+    deleted = 0
+    for blob in blobs:
+        with transaction.atomic():
+            # Only delete if no reference was taken in the meantime; a reference taken afterwards finds
+            # no row and stores the file again
+            if not MediaBlob.objects.filter(pk=blob.pk, refcount__lte=0).delete()[0]:
+                continue
+            transaction.on_commit(lambda name=blob.name: _delete_blob_files(name))
+        deleted += 1
+    return deleted
+
+
+def _delete_blob_files(name):
+    """Delete a collected file and its derivatives, unless it was stored again since."""
+    if MediaBlob.objects.filter(name=name).exists():
+        return
+    image_storage().delete(name)
+    delete_derivatives(name)
+
+
+@receiver(post_delete, sender=PredictionHistory)
+def release_history_image(sender, instance, **kwargs):
+    release_blobs([instance.image.name])
+
+
+def delete_job_uploads(names):
+    """Delete the uploaded files of job items."""
+    for name in names:
+        if name:
+            default_storage.delete(name)
+
+
+@receiver(post_delete, sender=PredictionJobItem)
+def delete_job_item_upload(sender, instance, **kwargs):
+    # Items of a deleted job (or user) that were never processed
+    name = instance.image.name
+    if name:
+        transaction.on_commit(lambda: delete_job_uploads([name]))
@@ -0,0 +1,130 @@
+# This file generates the small versions of prediction images shown in history lists.
+# Each stored image gets WebP derivatives of DETECTION_IMAGE_DERIVATIVES sizes (e.g. 'thumbnail', 'medium'),
+# named after the source file (derivatives/<size>/<source name>.webp). They are generated once by the
+# background image writer when a record's image is stored; for older images, the first history response
+# that needs them schedules their generation on a background thread and serves the original until then.
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .storage import image_storage
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_DIR = 'derivatives'
+# Number of source images remembered as having all their derivatives, to skip the storage checks
+READY_CACHE_SIZE = 10000
+
+_ready = OrderedDict()
+_pending = set()
+_lock = threading.Lock()
+_derivative_pool = None
+
+
+def _get_derivative_pool():
+    global _derivative_pool
+    if _derivative_pool is None:
+        _derivative_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="detection-derivatives")
+    return _derivative_pool
+
+
+def derivative_sizes():
+    """Map of derivative name to its maximum width/height in pixels."""
+    return getattr(settings, 'DETECTION_IMAGE_DERIVATIVES', {'thumbnail': 256, 'medium': 800})
+
+
+def derivative_name(name, size_name):
+    return f"{DERIVATIVE_DIR}/{size_name}/{os.path.splitext(name)[0]}.webp"
+
+
+def _mark_ready(name):
+    with _lock:
+        _ready[name] = True
+        _ready.move_to_end(name)
+        if len(_ready) > READY_CACHE_SIZE:
+            _ready.popitem(last=False)
+
+
+def generate_derivatives(name):
+    """
+    Create the missing derivatives of a stored image (decoding it once for all sizes).
+    Returns the number of derivatives created.
+    """
+    sizes = derivative_sizes()
+    missing = [(size_name, max_size) for size_name, max_size in sizes.items()
+               if not default_storage.exists(derivative_name(name, size_name))]
+    if missing:
+        with image_storage().open(name, 'rb') as f:
+            img = Image.open(f)
+            largest = max(max_size for _, max_size in missing)
+            img.draft('RGB', (largest, largest))
+            img = ImageOps.exif_transpose(img)
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            img.load()
+        # Shrink from the largest size down, each step resizing the previous result
+        for size_name, max_size in sorted(missing, key=lambda item: -item[1]):
+            img.thumbnail((max_size, max_size))
+            out = BytesIO()
+            img.save(out, 'WEBP', quality=getattr(settings, 'DETECTION_IMAGE_QUALITY', 80))
+            target = derivative_name(name, size_name)
+            saved = default_storage.save(target, ContentFile(out.getvalue()))
+            if saved != target:
+                # Generated concurrently by another thread or process
+                default_storage.delete(saved)
+    _mark_ready(name)
+    return len(missing)
+
+
+def _generate_in_background(name):
+    try:
+        generate_derivatives(name)
+    except FileNotFoundError:
+        logger.warning("Image %s not found; no derivatives generated", name)
+    except Exception:
+        logger.exception("Could not generate derivatives of %s", name)
+    finally:
+        with _lock:
+            _pending.discard(name)
+
+
+def schedule_derivatives(name):
+    """Generate the derivatives of an image on the background thread (once, however often requested)."""
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    _get_derivative_pool().submit(_generate_in_background, name)
+
+
+def derivative_url(name, size_name):
+    """
+    URL of a derivative of a stored image, or None if it does not exist yet
+    (its generation is then scheduled).
+    """
+    if not name:
+        return None
+    with _lock:
+        ready = name in _ready
+    if not ready:
+        if not all(default_storage.exists(derivative_name(name, size)) for size in derivative_sizes()):
+            schedule_derivatives(name)
+            return None
+        _mark_ready(name)
+    return default_storage.url(derivative_name(name, size_name))
+
+
+def delete_derivatives(name):
+    """Delete the derivatives of an image that is being deleted."""
+    with _lock:
+        _ready.pop(name, None)
+    for size_name in derivative_sizes():
+        default_storage.delete(derivative_name(name, size_name))
@@ -0,0 +1,156 @@
+# This file stores the images of prediction records off the request path.
+# Views save the record without an image and hand a copy of the upload to a background writer thread,
+# which keeps the original, re-encodes it to a bounded resolution or drops it (DETECTION_IMAGE_STORAGE),
+# and then fills in the record's image field. Files go to the content-addressed image storage
+# (storage.py), and the upload each file was produced from is remembered, so a photo uploaded many times
+# is encoded and stored once. The thumbnail/medium derivatives of new images are generated by the same thread.
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .blobs import acquire_blob, register_blob, release_blobs
+from .derivatives import generate_derivatives
+from .models import PredictionHistory
+from .storage import content_addressed_name, image_storage
+from .upload_handlers import MAX_SNIFF_BYTES, sniff_image
+
+logger = logging.getLogger(__name__)
+
+POLICY_ORIGINAL = 'original'
+POLICY_THUMBNAIL = 'thumbnail'
+POLICY_NONE = 'none'
+POLICIES = (POLICY_ORIGINAL, POLICY_THUMBNAIL, POLICY_NONE)
+
+IMAGE_DIR = 'predicted_images'
+
+_writer_pool = None
+
+
+def _get_writer_pool():
+    global _writer_pool
+    if _writer_pool is None:
+        _writer_pool = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'DETECTION_IMAGE_WRITER_WORKERS', 1),
+            thread_name_prefix="detection-image-writer",
+        )
+    return _writer_pool
+
+
+def storage_policy():
+    policy = getattr(settings, 'DETECTION_IMAGE_STORAGE', POLICY_THUMBNAIL)
+    if policy not in POLICIES:
+        raise ImproperlyConfigured(f"DETECTION_IMAGE_STORAGE must be one of {', '.join(POLICIES)}, not {policy!r}.")
+    return policy
+
+
+def read_upload(image_file):
+    """Return the bytes of an upload, leaving the file rewound."""
+    image_file.seek(0)
+    data = image_file.read()
+    image_file.seek(0)
+    return data
+
+
+def encode_thumbnail(data):
+    """Re-encode image bytes to at most DETECTION_IMAGE_MAX_DIMENSION pixels per side."""
+    max_dimension = getattr(settings, 'DETECTION_IMAGE_MAX_DIMENSION', 1024)
+    image_format = getattr(settings, 'DETECTION_IMAGE_FORMAT', 'WEBP')
+    img = Image.open(BytesIO(data))
+    # Decode large JPEGs at reduced scale, as for prediction
+    img.draft('RGB', (max_dimension, max_dimension))
+    img = ImageOps.exif_transpose(img)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img.thumbnail((max_dimension, max_dimension))
+    out = BytesIO()
+    img.save(out, image_format, quality=getattr(settings, 'DETECTION_IMAGE_QUALITY', 80))
+    return out.getvalue()
+
+
+def _extension(fmt):
+    return 'jpg' if fmt.lower() == 'jpeg' else fmt.lower()
+
+
+def source_key(data, policy):
+    """Key of the file kept for an upload under a policy: the upload's SHA-256 plus the encoding settings."""
+    digest = hashlib.sha256(data).hexdigest()
+    if policy == POLICY_ORIGINAL:
+        return f"{digest}:{policy}"
+    max_dimension = getattr(settings, 'DETECTION_IMAGE_MAX_DIMENSION', 1024)
+    image_format = getattr(settings, 'DETECTION_IMAGE_FORMAT', 'WEBP')
+    return f"{digest}:{policy}:{max_dimension}:{image_format.lower()}"
+
+
+def write_image(data, policy=None):
+    """
+    Store the file kept for an upload, take a reference to it and return its storage name ('' when the
+    policy keeps none). An upload that was stored before is not decoded or written again.
+    """
+    policy = policy or storage_policy()
+    if policy == POLICY_NONE:
+        return ''
+    source = source_key(data, policy)
+    name = acquire_blob(source)
+    if name is not None:
+        return name
+    if policy == POLICY_ORIGINAL:
+        content, extension = data, _extension(sniff_image(data[:MAX_SNIFF_BYTES])[0] or 'bin')
+    else:
+        content = encode_thumbnail(data)
+        extension = _extension(getattr(settings, 'DETECTION_IMAGE_FORMAT', 'WEBP'))
+    upload_name = f"{IMAGE_DIR}/leaf.{extension}"
+    name = content_addressed_name(upload_name, hashlib.sha256(content).hexdigest())
+    with transaction.atomic():
+        # Referenced before the file is written, so garbage collection leaves it alone
+        register_blob(name, len(content), source)
+        image_storage().save(upload_name, ContentFile(content))
+    return name
+
+
+def _write_record_image(record_id, data, policy):
+    try:
+        name = write_image(data, policy)
+    except Exception:
+        logger.exception("Could not store the image of prediction %s", record_id)
+        return
+    if not name:
+        return
+    if not PredictionHistory.objects.filter(pk=record_id).update(image=name):
+        # The record was deleted before its image was written
+        release_blobs([name])
+        return
+    try:
+        generate_derivatives(name)
+    except Exception:
+        logger.exception("Could not generate derivatives of %s", name)
+
+
+def _write_in_thread(record_id, data, policy):
+    close_old_connections()
+    try:
+        _write_record_image(record_id, data, policy)
+    finally:
+        close_old_connections()
+
+
+def persist_image(record, image_file):
+    """
+    Schedule storing the image of a saved prediction record.
+    The upload is copied now (its buffer is released with the request) and written by the background
+    writer once the record is committed. DETECTION_IMAGE_WRITER_EAGER writes it inline instead.
+    """
+    policy = storage_policy()
+    if policy == POLICY_NONE:
+        return
+    data = read_upload(image_file)
+    if getattr(settings, 'DETECTION_IMAGE_WRITER_EAGER', False):
+        _write_record_image(record.pk, data, policy)
+        return
+    transaction.on_commit(lambda: _get_writer_pool().submit(_write_in_thread, record.pk, data, policy))
@@ -0,0 +1,44 @@
+# This file contains the helpers shared by the prediction endpoints:
+# decoding model output into a label and looking up disease information.
+import numpy as np
+
+from .disease_info import label_list, remedies, default_remedy, preventive_measures
+from .models import Disease
+
+NO_PREVENTION = "No specific prevention measures available."
+
+# Disease row id per label, looked up once per process (the table only changes with migrations)
+_disease_ids = {}
+
+
+def decode_prediction(probs, labels=label_list):
+    """Return (label, confidence) for a model output row, using the model's label order."""
+    pred_class = int(np.argmax(probs))
+    return labels[pred_class], float(probs[pred_class])
+
+
+def disease_details(label):
+    """Return (remedy, preventive measures) text for a predicted disease label."""
+    return remedies.get(label, default_remedy), preventive_measures.get(label, NO_PREVENTION)
+
+
+def disease_id(label):
+    """Return the id of the Disease row for a label, or None if the label has none."""
+    if label not in _disease_ids:
+        pk = Disease.objects.filter(label=label).values_list('pk', flat=True).first()
+        if pk is None:
+            return None
+        _disease_ids[label] = pk
+    return _disease_ids[label]
+
+
+def history_fields(label):
+    """
+    Return the disease fields of a PredictionHistory record for a predicted label: a reference to the
+    label's Disease row, or copies of the advice texts for a label without one.
+    """
+    pk = disease_id(label)
+    if pk is not None:
+        return {'disease': label, 'disease_info_id': pk}
+    remedy, prevention = disease_details(label)
+    return {'disease': label, 'remedy': remedy, 'preventive_measures': prevention}
@@ -0,0 +1,313 @@
+# This file implements the out-of-process inference service.
+# `manage.py run_inference_server` starts a pool of inference processes that share one Unix socket;
+# each loads the model once and serves any number of web workers. With DETECTION_INFERENCE_MODE = 'remote'
+# the web workers never import TensorFlow: model_loader sends preprocessed batches to the service instead.
+#
+# Image tensors do not go through pickle: each client thread owns a shared memory segment, writes the
+# float32 batch into it and only sends the segment name and shape over the socket. The service runs the
+# batch and writes the class probabilities back into the same segment.
+import logging
+import os
+import signal
+import threading
+import time
+import uuid
+import weakref
+from multiprocessing import connection, get_context, resource_tracker, shared_memory
+
+import numpy as np
+from django.conf import settings
+
+from .batching import MicroBatcher
+from .metadata import ModelMetadata
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = 'plantguard_'
+# Output rows are written after the input batch, at the next 64-byte boundary
+_ALIGNMENT = 64
+
+
+class InferenceServiceError(RuntimeError):
+    """Raised when the inference service is unreachable or fails to run a batch."""
+
+
+def get_socket_path():
+    return str(getattr(settings, 'DETECTION_INFERENCE_SOCKET', '/tmp/plantguard-inference.sock'))
+
+
+def get_authkey():
+    # Connections are authenticated with an HMAC challenge keyed on the Django secret
+    return settings.SECRET_KEY.encode()
+
+
+def _output_offset(input_bytes):
+    return -(-input_bytes // _ALIGNMENT) * _ALIGNMENT
+
+
+def _attach(name):
+    """Attach to a segment created by a client process."""
+    segment = shared_memory.SharedMemory(name=name)
+    # Attaching registers the segment with this process's resource tracker, which would unlink it
+    # when the service exits; the client that created the segment owns it
+    if not name.startswith(f"{SEGMENT_PREFIX}{os.getpid()}_"):
+        resource_tracker.unregister(segment._name, 'shared_memory')
+    return segment
+
+
+def _unlink(segment, owner_pid):
+    # Only the creating process may unlink, not a forked child that inherited the object
+    if os.getpid() == owner_pid:
+        segment.close()
+        segment.unlink()
+
+
+class InferenceClient:
+    """
+    Connection from a web worker thread to the inference service.
+
+    Connections and segments are not thread-safe, so get_client() hands out one client per thread.
+    Calls are retried once on a fresh connection, so an inference process that crashed or was
+    restarted costs one failed round trip rather than a failed request.
+    """
+
+    def __init__(self, address=None, authkey=None, timeout=None):
+        self.address = address or get_socket_path()
+        self.authkey = authkey or get_authkey()
+        self.timeout = timeout or getattr(settings, 'DETECTION_INFERENCE_TIMEOUT_SECONDS', 30)
+        self.pid = os.getpid()
+        self._conn = None
+        self._segment = None
+        self._info = None
+        self._info_checked = 0.0
+
+    def _connect(self):
+        if self._conn is None:
+            try:
+                self._conn = connection.Client(self.address, family='AF_UNIX', authkey=self.authkey)
+            except (OSError, EOFError) as e:
+                raise InferenceServiceError(f"Inference service at {self.address} is unavailable: {e}")
+        return self._conn
+
+    def _disconnect(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except OSError:
+                pass
+            self._conn = None
+
+    def _call(self, message):
+        for attempt in (1, 2):
+            conn = self._connect()
+            try:
+                conn.send(message)
+                if not conn.poll(self.timeout):
+                    # The late reply would be read as the answer to the next call
+                    self._disconnect()
+                    raise InferenceServiceError(f"Inference service did not reply within {self.timeout}s.")
+                reply = conn.recv()
+                break
+            except (OSError, EOFError) as e:
+                self._disconnect()
+                if attempt == 2:
+                    raise InferenceServiceError(f"Lost connection to the inference service: {e}")
+        if reply[0] == 'error':
+            raise InferenceServiceError(reply[1])
+        return reply[1:]
+
+    def _buffer(self, size):
+        """Return this client's shared memory segment, growing it to at least size bytes."""
+        if self._segment is None or self._segment.size < size:
+            if self._segment is not None:
+                self._release_segment()
+            name = f"{SEGMENT_PREFIX}{os.getpid()}_{uuid.uuid4().hex[:12]}"
+            self._segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self._finalizer = weakref.finalize(self, _unlink, self._segment, os.getpid())
+        return self._segment
+
+    def _release_segment(self):
+        self._finalizer()
+        self._segment = None
+
+    def info(self):
+        """Return the active model's description ({version, metadata, ...}), cached for the model check interval."""
+        interval = getattr(settings, 'DETECTION_ACTIVE_MODEL_CHECK_SECONDS', 2)
+        now = time.monotonic()
+        if self._info is None or now - self._info_checked >= interval:
+            self._info = self._call(('info',))[0]
+            self._info['metadata'] = ModelMetadata.from_dict(self._info['metadata'])
+            self._info_checked = now
+        return self._info
+
+    def predict(self, batch):
+        """Run a float32 (N, H, W, 3) batch in the service and return the (N, num_classes) probabilities."""
+        batch = np.asarray(batch, dtype=np.float32)
+        offset = _output_offset(batch.nbytes)
+        segment = self._buffer(offset + batch.shape[0] * len(self.info()['metadata'].labels) * 4)
+        np.ndarray(batch.shape, dtype=np.float32, buffer=segment.buf)[:] = batch
+        version, output, output_offset = self._call(('predict', segment.name, batch.shape, offset))
+        if version != self._info['version']:
+            self._info = None
+        if output_offset is None:
+            # The service sent the rows inline (the model's number of classes changed)
+            return output
+        return np.ndarray(output, dtype=np.float32, buffer=segment.buf, offset=output_offset).copy()
+
+    def close(self):
+        self._disconnect()
+        if self._segment is not None:
+            self._release_segment()
+
+
+_local = threading.local()
+
+
+def get_client():
+    """Return this thread's InferenceClient (a new one after a fork)."""
+    client = getattr(_local, 'client', None)
+    if client is None or client.pid != os.getpid() or client.address != get_socket_path():
+        client = _local.client = InferenceClient()
+    return client
+
+
+def _predict_local(batch):
+    from .model_loader import get_registry
+    with get_registry().lease() as entry:
+        return entry.predict(batch)
+
+
+def _active_version():
+    from .model_loader import get_registry
+    return get_registry().active().version
+
+
+def _model_info():
+    from .model_loader import get_registry
+    entry = get_registry().active()
+    return {"version": entry.version, "metadata": entry.metadata.to_dict(), "pid": os.getpid(),
+            "models": get_registry().describe()}
+
+
+def handle_connection(conn, batcher):
+    """Serve one client connection until it is closed."""
+    segments = {}
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            try:
+                if message[0] == 'info':
+                    reply = ('ok', _model_info())
+                elif message[0] == 'predict':
+                    _, name, shape, offset = message
+                    if name not in segments:
+                        # A client uses one segment at a time; it only changes when the client grows it
+                        for previous in segments.values():
+                            previous.close()
+                        segments = {name: _attach(name)}
+                    segment = segments[name]
+                    # Copy the batch out once, so no view of the segment outlives the connection
+                    batch = np.array(np.ndarray(shape, dtype=np.float32, buffer=segment.buf))
+                    # Rows go through the process-wide batcher, so batches from several web workers are merged
+                    futures = [batcher.submit(row) for row in batch]
+                    output = np.stack([future.result() for future in futures]).astype(np.float32, copy=False)
+                    version = _active_version()
+                    if offset + output.nbytes <= segment.size:
+                        np.ndarray(output.shape, dtype=np.float32, buffer=segment.buf, offset=offset)[:] = output
+                        reply = ('ok', version, output.shape, offset)
+                    else:
+                        reply = ('ok', version, output, None)
+                else:
+                    reply = ('error', f"Unknown request {message[0]!r}")
+            except Exception as e:
+                logger.exception("Inference request failed")
+                reply = ('error', str(e))
+            conn.send(reply)
+    finally:
+        for segment in segments.values():
+            segment.close()
+        conn.close()
+
+
+def make_batcher():
+    return MicroBatcher(
+        _predict_local,
+        max_batch_size=getattr(settings, 'DETECTION_BATCH_MAX_SIZE', 32),
+        window_ms=getattr(settings, 'DETECTION_BATCH_WINDOW_MS', 10),
+    )
+
+
+def serve(listener, batcher):
+    """Accept connections on the shared listener until it is closed, one thread per connection."""
+    while True:
+        try:
+            conn = listener.accept()
+        except connection.AuthenticationError:
+            logger.warning("Rejected an inference connection with a bad authkey")
+            continue
+        except OSError:
+            break
+        threading.Thread(target=handle_connection, args=(conn, batcher), daemon=True).start()
+
+
+def _worker_main(listener):
+    from . import model_loader
+    # Restore default signal handling inherited from the supervising process
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    model_loader.get_registry().active()
+    logger.info("Inference process %s ready", os.getpid())
+    serve(listener, make_batcher())
+
+
+class InferenceServer:
+    """
+    Supervisor of the inference processes.
+
+    The Unix socket is opened once and inherited by every process, which accept connections from it
+    in turn. A process that dies (e.g. a TensorFlow crash) is replaced; web workers reconnect on
+    their next call.
+    """
+
+    def __init__(self, address=None, workers=None, authkey=None):
+        self.address = address or get_socket_path()
+        self.workers = workers or getattr(settings, 'DETECTION_INFERENCE_WORKERS', 2)
+        self.authkey = authkey or get_authkey()
+        self._processes = []
+        self._stopping = False
+
+    def _spawn(self, listener):
+        # fork before TensorFlow is imported here, so each process initializes its own runtime
+        process = get_context('fork').Process(target=_worker_main, args=(listener,), daemon=True)
+        process.start()
+        return process
+
+    def stop(self, *args):
+        self._stopping = True
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        listener = connection.Listener(self.address, family='AF_UNIX', authkey=self.authkey)
+        os.chmod(self.address, 0o660)
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        try:
+            self._processes = [self._spawn(listener) for _ in range(self.workers)]
+            while not self._stopping:
+                for i, process in enumerate(self._processes):
+                    if not process.is_alive():
+                        logger.error("Inference process %s exited with %s; restarting", process.pid, process.exitcode)
+                        self._processes[i] = self._spawn(listener)
+                time.sleep(0.5)
+        finally:
+            for process in self._processes:
+                process.terminate()
+            for process in self._processes:
+                process.join(5)
+            listener.close()
+            if os.path.exists(self.address):
+                os.unlink(self.address)
@@ -0,0 +1,167 @@
+# This file runs asynchronous prediction jobs.
+# Job state lives in the database (PredictionJob / PredictionJobItem), and jobs are executed by a
+# local thread pool in the web process, so no external broker is needed. Only pending items are
+# processed, so a job interrupted by a restart can be resumed with the process_prediction_jobs command.
+# A runner claims a job with a conditional update and renews its lease (heartbeat_at) with every chunk,
+# so several web processes and workers never run the same job; a job whose lease expired is taken over.
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .batching import predict_many
+from .blobs import delete_job_uploads
+from .image_store import persist_image
+from .inference import decode_prediction, history_fields
+from .preprocessing import preprocess_image
+from .model_loader import get_active_metadata
+from .models import PredictionHistory, PredictionJob, PredictionJobItem
+from .stats import count_predictions
+
+logger = logging.getLogger(__name__)
+
+_job_pool = None
+
+
+class JobClaimLost(Exception):
+    """Raised when another runner took over a job whose lease expired."""
+
+
+def _get_job_pool():
+    global _job_pool
+    if _job_pool is None:
+        _job_pool = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'DETECTION_JOB_WORKERS', 2),
+            thread_name_prefix="detection-job",
+        )
+    return _job_pool
+
+
+def enqueue_job(job_id):
+    """
+    Schedule a job to run once the transaction that created it commits.
+    With DETECTION_JOBS_EAGER enabled the job runs immediately in the calling thread.
+    """
+    if getattr(settings, 'DETECTION_JOBS_EAGER', False):
+        run_job(job_id)
+        return
+    transaction.on_commit(lambda: _get_job_pool().submit(_run_job_in_thread, job_id))
+
+
+def _run_job_in_thread(job_id):
+    close_old_connections()
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def _lease_cutoff():
+    """Jobs whose lease was last renewed before this time may be taken over by another runner."""
+    return timezone.now() - timedelta(seconds=getattr(settings, 'DETECTION_JOB_LEASE_SECONDS', 300))
+
+
+def _claimable_jobs():
+    """Pending jobs, and running jobs whose runner stopped renewing its lease."""
+    expired = Q(heartbeat_at__isnull=True) | Q(heartbeat_at__lt=_lease_cutoff())
+    return PredictionJob.objects.filter(
+        Q(status=PredictionJob.STATUS_PENDING) | (Q(status=PredictionJob.STATUS_RUNNING) & expired))
+
+
+def _claim_job(job_id):
+    """Claim a job for this runner. Returns the runner token, or None if another runner holds it."""
+    runner = uuid.uuid4()
+    claimed = _claimable_jobs().filter(pk=job_id).update(
+        status=PredictionJob.STATUS_RUNNING, runner=runner, heartbeat_at=timezone.now())
+    return runner if claimed else None
+
+
+def _process_chunk(job, items, runner):
+    """Classify a chunk of pending items and record their PredictionHistory rows."""
+    metadata = get_active_metadata()
+    uploads, arrays = {}, {}
+    for item in items:
+        try:
+            with item.image.open('rb') as image_file:
+                uploads[item.pk] = image_file.read()
+            arrays[item.pk] = preprocess_image(BytesIO(uploads[item.pk]), metadata)
+        except Exception as e:
+            item.status = PredictionJobItem.STATUS_FAILED
+            item.error = f"Could not read image: {e}"
+
+    valid = [item for item in items if item.pk in arrays]
+    rows = predict_many([arrays[item.pk] for item in valid])
+    records = []
+    for item, probs in zip(valid, rows):
+        pred_label, confidence = decode_prediction(probs, metadata.labels)
+        records.append(PredictionHistory(user_id=job.user_id, confidence=confidence, **history_fields(pred_label)))
+
+    with transaction.atomic():
+        # Renewing the lease locks the job row, so the chunks of two runners cannot overlap: a runner
+        # whose job was taken over while it classified finds another token and discards the chunk
+        renewed = PredictionJob.objects.filter(
+            pk=job.pk, runner=runner, status=PredictionJob.STATUS_RUNNING
+        ).update(heartbeat_at=timezone.now())
+        if not renewed:
+            raise JobClaimLost(job.pk)
+        created = PredictionHistory.objects.bulk_create(records)
+        # bulk_create sends no post_save signal
+        count_predictions(created)
+        for item, record in zip(valid, created):
+            item.status = PredictionJobItem.STATUS_DONE
+            item.prediction = record
+            # Stored like the images of the prediction endpoints (DETECTION_IMAGE_STORAGE)
+            persist_image(record, BytesIO(uploads[item.pk]))
+        # The uploads are not needed once processed: delete them when the results are committed
+        processed = [item.image.name for item in items]
+        for item in items:
+            item.image = ''
+        PredictionJobItem.objects.bulk_update(items, ['status', 'error', 'prediction', 'image'])
+        transaction.on_commit(lambda: delete_job_uploads(processed))
+        failed = len(items) - len(valid)
+        PredictionJob.objects.filter(pk=job.pk).update(
+            processed_images=F('processed_images') + len(items),
+            failed_images=F('failed_images') + failed,
+        )
+
+
+def run_job(job_id):
+    """
+    Process every pending image of a job in batches, updating progress as it goes.
+    Returns False without doing anything if the job is finished or claimed by another runner.
+    """
+    runner = _claim_job(job_id)
+    if runner is None:
+        return False
+    job = PredictionJob.objects.get(pk=job_id)
+    owned = PredictionJob.objects.filter(pk=job.pk, runner=runner)
+    chunk_size = max(1, getattr(settings, 'DETECTION_BATCH_MAX_SIZE', 32))
+    try:
+        while True:
+            items = list(job.items.filter(status=PredictionJobItem.STATUS_PENDING)[:chunk_size])
+            if not items:
+                break
+            _process_chunk(job, items, runner)
+        owned.update(status=PredictionJob.STATUS_COMPLETED, finished_at=timezone.now())
+    except JobClaimLost:
+        logger.warning("Prediction job %s was taken over by another runner", job_id)
+    except Exception as e:
+        logger.exception("Prediction job %s failed", job_id)
+        owned.update(status=PredictionJob.STATUS_FAILED, error=str(e), finished_at=timezone.now())
+    return True
+
+
+def resume_pending_jobs():
+    """
+    Run every pending job, and every running job whose lease expired (e.g. after a restart).
+    Returns the number of jobs run.
+    """
+    job_ids = list(_claimable_jobs().order_by('created_at').values_list('pk', flat=True))
+    return sum(run_job(job_id) for job_id in job_ids)
+
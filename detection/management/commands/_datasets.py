@@ -0,0 +1,28 @@
+# Helpers shared by the model export and evaluation commands (not a command itself).
+import os
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def list_images(data_dir):
+    """Return every image file below data_dir, sorted for reproducible runs."""
+    found = []
+    for root, _, files in os.walk(data_dir):
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                found.append(os.path.join(root, name))
+    return sorted(found)
+
+
+def list_labeled_images(data_dir, labels):
+    """
+    Return (path, label index) pairs for a held-out folder laid out as <data_dir>/<label>/<image>,
+    the layout of the PlantVillage train/valid folders used by the training notebook.
+    Folders whose name is not a known label are skipped.
+    """
+    pairs = []
+    for label_index, label in enumerate(labels):
+        label_dir = os.path.join(data_dir, label)
+        if os.path.isdir(label_dir):
+            pairs.extend((path, label_index) for path in list_images(label_dir))
+    return pairs
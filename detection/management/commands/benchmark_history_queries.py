@@ -0,0 +1,168 @@
+# Management command benchmarking the PredictionHistory access patterns on a scratch SQLite database
+# filled with synthetic rows: query plans and timings with the previous schema and filters (user_id index,
+# timestamp__date, disease__icontains) vs. the composite indexes and the filters of detection/queries.py.
+import datetime
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Count, Q
+from django.test.utils import CaptureQueriesContext
+
+from detection.disease_info import default_remedy, label_list
+from detection.inference import NO_PREVENTION
+from detection.models import Disease, PredictionHistory
+from detection.queries import filter_by_date, filter_by_disease
+
+ALIAS = 'history_benchmark'
+# The single index the table had before the composite ones
+LEGACY_INDEXES = [('bench_user_id_idx', ['user_id'])]
+PAGE_SIZE = 50
+INSERT_CHUNK = 200_000
+
+
+def history_queries(user_id, day, disease, cursor):
+    """(name, previous queryset, current queryset) of each benchmarked access pattern."""
+    history = PredictionHistory.objects.using(ALIAS).only('id', 'disease', 'confidence', 'timestamp')
+    timestamp, pk = cursor
+    page = history.filter(user_id=user_id).order_by('-timestamp', '-id')
+    return [
+        ("history page", page[:PAGE_SIZE], page[:PAGE_SIZE]),
+        ("history next page",
+         page.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))[:PAGE_SIZE],
+         page.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))[:PAGE_SIZE]),
+        ("dashboard date filter",
+         history.filter(timestamp__date=day).order_by('-timestamp')[:PAGE_SIZE],
+         filter_by_date(history, day).order_by('-timestamp')[:PAGE_SIZE]),
+        ("dashboard disease filter",
+         history.filter(disease__icontains=disease).order_by('-timestamp')[:PAGE_SIZE],
+         filter_by_disease(history, disease).order_by('-timestamp')[:PAGE_SIZE]),
+        ("diseases on a day",
+         history.filter(timestamp__date=day).values('disease').annotate(count=Count('id')),
+         filter_by_date(history, day).values('disease').annotate(count=Count('id'))),
+    ]
+
+
+class Command(BaseCommand):
+    help = ("Compare query plans and timings of the prediction history queries on synthetic rows, "
+            "before and after the composite indexes and index-friendly filters.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000_000)
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--days', type=int, default=365, help="Timestamps are spread over this many days.")
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per query (the median is reported).")
+        parser.add_argument('--database', help="SQLite file to use (default: a temporary file, deleted afterwards).")
+
+    def handle(self, *args, **options):
+        path = options['database'] or os.path.join(tempfile.mkdtemp(), 'history_benchmark.sqlite3')
+        connections.settings[ALIAS] = {
+            **connections.settings['default'],
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': path, 'OPTIONS': {},
+        }
+        connection = connections[ALIAS]
+        try:
+            end = datetime.datetime(2025, 1, 1)
+            self.create_tables(connection)
+            started = time.perf_counter()
+            self.fill(connection, options['rows'], options['users'], end, options['days'])
+            self.stdout.write(f"Inserted {options['rows']} row(s) in {time.perf_counter() - started:.1f}s")
+
+            # A busy user, a day in the middle of the range and a search matching several labels
+            user_id = 1
+            day = (end - datetime.timedelta(days=options['days'] // 2)).date()
+            first_page = list(PredictionHistory.objects.using(ALIAS).filter(user_id=user_id)
+                              .order_by('-timestamp', '-id').values_list('timestamp', 'id')[:PAGE_SIZE])
+            cursor = first_page[-1] if first_page else (end, 0)
+            queries = history_queries(user_id, day, 'blight', cursor)
+
+            self.stdout.write("Measuring with the user_id index and the previous filters...")
+            self.set_indexes(connection, LEGACY_INDEXES)
+            before = [self.measure(connection, old, options['repeat']) for _, old, _ in queries]
+            self.stdout.write("Measuring with the composite indexes and detection.queries filters...")
+            self.set_indexes(connection, [(index.name, index.fields) for index in PredictionHistory._meta.indexes])
+            after = [self.measure(connection, new, options['repeat']) for _, _, new in queries]
+        finally:
+            connection.close()
+            del connections[ALIAS]
+            if not options['database']:
+                os.remove(path)
+
+        for (name, _, _), (old_ms, old_plan), (new_ms, new_plan) in zip(queries, before, after):
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n{name}"))
+            self.stdout.write(f"  before: {old_ms:9.2f} ms  {old_plan}")
+            self.stdout.write(f"  after:  {new_ms:9.2f} ms  {new_plan}")
+            self.stdout.write(f"  {old_ms / max(new_ms, 1e-3):.1f}x faster")
+
+    def create_tables(self, connection):
+        with connection.schema_editor() as editor:
+            editor.create_model(Disease)
+            editor.create_model(PredictionHistory)
+        with connection.cursor() as cursor:
+            # Only the history table is created: rows reference users that do not exist
+            cursor.execute("PRAGMA foreign_keys = OFF")
+            cursor.execute("PRAGMA journal_mode = OFF")
+            cursor.execute("PRAGMA synchronous = OFF")
+            for index in PredictionHistory._meta.indexes:
+                cursor.execute(f'DROP INDEX "{index.name}"')
+        Disease.objects.using(ALIAS).bulk_create(
+            Disease(label=label, remedy=default_remedy, preventive_measures=NO_PREVENTION)
+            for label in label_list
+        )
+
+    def fill(self, connection, rows, users, end, days):
+        rng = np.random.default_rng(0)
+        table = PredictionHistory._meta.db_table
+        sql = (f'INSERT INTO "{table}" (user_id, image, disease, confidence, timestamp) '
+               f'VALUES (%s, \'\', %s, %s, %s)')
+        labels = np.array(label_list)
+        start = np.datetime64(end - datetime.timedelta(days=days), 'us')
+        span = days * 86_400 * 1_000_000
+        with connection.cursor() as cursor:
+            for offset in range(0, rows, INSERT_CHUNK):
+                n = min(INSERT_CHUNK, rows - offset)
+                # Zipf-like user activity: a few users make most predictions
+                user_ids = np.minimum(rng.zipf(1.3, n), users)
+                timestamps = np.datetime_as_string(start + rng.integers(0, span, n).astype('timedelta64[us]'))
+                cursor.executemany(sql, zip(
+                    user_ids.tolist(),
+                    labels[rng.integers(0, len(labels), n)].tolist(),
+                    rng.random(n).tolist(),
+                    np.char.replace(timestamps, 'T', ' ').tolist(),
+                ))
+
+    def set_indexes(self, connection, indexes):
+        """Replace the history table's indexes and refresh the planner statistics."""
+        table = PredictionHistory._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s "
+                           "AND name NOT LIKE 'sqlite_autoindex%%'", [table])
+            for (name,) in cursor.fetchall():
+                cursor.execute(f'DROP INDEX "{name}"')
+            for name, fields in indexes:
+                columns = ', '.join(
+                    f'"{PredictionHistory._meta.get_field(field.lstrip("-")).column}"'
+                    f'{" DESC" if field.startswith("-") else ""}'
+                    for field in fields
+                )
+                cursor.execute(f'CREATE INDEX "{name}" ON "{table}" ({columns})')
+            cursor.execute("ANALYZE")
+
+    def measure(self, connection, queryset, repeat):
+        """Median time of evaluating a queryset (ms) and its query plan."""
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                # A fresh clone each time, so the result cache does not skip the query
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+        sql = captured.captured_queries[-1]['sql']
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            plan = '; '.join(row[-1] for row in cursor.fetchall())
+        return statistics.median(timings), plan
@@ -0,0 +1,52 @@
+# Management command measuring per-request latency of the active inference backend
+# (and, for Keras models, of model.predict() vs. the compiled tf.function path).
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from detection.backends import KerasBackend, compile_predict_fn, get_input_size
+from detection.model_loader import get_backend
+
+
+class Command(BaseCommand):
+    help = ("Benchmark per-request CPU inference latency of the active backend "
+            "(Keras: model.predict() vs. the compiled tf.function).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help="Timed calls per path.")
+        parser.add_argument('--warmup', type=int, default=5, help="Untimed calls per path before measuring.")
+        parser.add_argument('--batch-size', type=int, default=1, help="Images per call (1 = a single request).")
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        height, width = get_input_size(backend)
+        batch = np.random.rand(options['batch_size'], height, width, 3).astype(np.float32)
+
+        if isinstance(backend, KerasBackend):
+            import tensorflow as tf
+
+            model = backend.model
+            started = time.perf_counter()
+            serve = compile_predict_fn(model)
+            self.stdout.write(f"tf.function trace + warm-up: {(time.perf_counter() - started) * 1000:.1f} ms")
+            paths = {
+                "model.predict": lambda: model.predict(batch, verbose=0),
+                "tf.function": lambda: serve(tf.convert_to_tensor(batch)).numpy(),
+            }
+        else:
+            paths = {backend.name: lambda: backend.predict_batch(batch)}
+        self.stdout.write(f"Input batch: {batch.shape}, iterations: {options['iterations']}")
+        for name, call in paths.items():
+            for _ in range(options['warmup']):
+                call()
+            timings = []
+            for _ in range(options['iterations']):
+                started = time.perf_counter()
+                call()
+                timings.append((time.perf_counter() - started) * 1000)
+            timings = np.array(timings)
+            self.stdout.write(
+                f"{name:>14}: mean {timings.mean():8.2f} ms | p50 {np.percentile(timings, 50):8.2f} ms | "
+                f"p99 {np.percentile(timings, 99):8.2f} ms"
+            )
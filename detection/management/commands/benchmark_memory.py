@@ -0,0 +1,87 @@
+# Management command measuring per-worker memory of the model for several worker counts:
+# every worker loading its own Keras copy vs. workers sharing the memory-mapped TFLite weights.
+import multiprocessing
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from detection.backends import KerasBackend, TFLiteBackend, tflite_runtime, tflite_variant_path
+from detection.model_loader import get_registry
+
+
+def read_memory():
+    """Return (RSS, PSS) of this process in MB from /proc/self/smaps_rollup (Linux only)."""
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                values[key] = int(rest.split()[0]) / 1024
+    return values['Rss'], values['Pss']
+
+
+def import_keras_runtime():
+    import tensorflow  # noqa: F401
+
+
+def _worker(import_runtime, make_backend, barrier, conn):
+    # The runtime's own footprint is the same in both modes; only the model is measured
+    import_runtime()
+    before = read_memory()
+    backend = make_backend().load()
+    backend.warm_up()
+    # Measure only once every worker has loaded the model, so PSS reflects the sharing between them
+    barrier.wait()
+    conn.send((before, read_memory()))
+    barrier.wait()
+    conn.close()
+
+
+def measure(import_runtime, make_backend, workers):
+    """Fork `workers` processes that each load a backend; return [(before, after)] memory per worker."""
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(workers)
+    pipes = [context.Pipe() for _ in range(workers)]
+    processes = [context.Process(target=_worker, args=(import_runtime, make_backend, barrier, child))
+                 for _, child in pipes]
+    for process in processes:
+        process.start()
+    results = [parent.recv() for parent, _ in pipes]
+    for process in processes:
+        process.join()
+    return results
+
+
+class Command(BaseCommand):
+    help = ("Report RSS and PSS per worker for 1, 4 and 8 workers, each loading its own Keras model "
+            "vs. sharing the memory-mapped TFLite weights (DETECTION_SHARED_WEIGHTS).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', help="Keras model file (default: the active model).")
+        parser.add_argument('--tflite', help="TFLite file for the shared mode (default: <model>_float32.tflite).")
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+
+    def handle(self, *args, **options):
+        if not os.path.exists('/proc/self/smaps_rollup'):
+            raise CommandError("PSS is read from /proc/self/smaps_rollup, which requires Linux 4.14+.")
+        model_file = options['model'] or get_registry().resolve_active()[1]
+        tflite_file = options['tflite'] or tflite_variant_path(model_file, 'float32')
+
+        modes = [("keras (per-worker copy)", import_keras_runtime, lambda: KerasBackend(model_file))]
+        if os.path.exists(tflite_file):
+            modes.append(("tflite shared mmap", tflite_runtime, lambda: TFLiteBackend(tflite_file, shared_weights=True)))
+        else:
+            self.stderr.write(f"{tflite_file} not found; run `manage.py export_tflite --mode float32` "
+                              f"to include the shared-weights mode.")
+
+        self.stdout.write(f"Model: {model_file} ({os.path.getsize(model_file) / 1e6:.1f} MB)")
+        self.stdout.write("Memory growth per worker from loading the model (after importing the runtime), in MB")
+        self.stdout.write(f"{'mode':<26}{'workers':>8}{'RSS/worker':>12}{'PSS/worker':>12}{'total PSS':>11}")
+        for name, import_runtime, make_backend in modes:
+            for workers in options['workers']:
+                results = measure(import_runtime, make_backend, workers)
+                rss = [after[0] - before[0] for before, after in results]
+                pss = [after[1] - before[1] for before, after in results]
+                self.stdout.write(
+                    f"{name:<26}{workers:>8}{sum(rss) / workers:>12.1f}{sum(pss) / workers:>12.1f}{sum(pss):>11.1f}"
+                )
@@ -0,0 +1,101 @@
+# Management command comparing the legacy image preprocessing with detection.preprocessing
+# on large phone photos: time per image and peak memory.
+import multiprocessing
+import resource
+import time
+import tracemalloc
+from io import BytesIO
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from detection.metadata import DEFAULT_INPUT_SIZE
+from detection.preprocessing import preprocess_image, preprocess_batch
+
+
+def legacy_preprocess(image_file):
+    """The preprocessing previously done inline in PlantDiseaseDetectAPIView.post."""
+    img = Image.open(image_file).convert('RGB')
+    img = img.resize(DEFAULT_INPUT_SIZE[::-1])
+    img_array = np.array(img) / 255.0
+    return np.expand_dims(img_array, axis=0)
+
+
+def optimized_preprocess(image_file):
+    return preprocess_image(image_file)[np.newaxis]
+
+
+def make_photo(width, height, quality=90):
+    """Create a synthetic JPEG 'phone photo' with enough detail to be expensive to decode."""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.stack([
+        (x * 255 // width),
+        (y * 255 // height),
+        rng.integers(0, 256, size=(height, width)),
+    ], axis=-1).astype(np.uint8)
+    buffer = BytesIO()
+    Image.fromarray(pixels).save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def _measure(fn, photo, iterations, conn):
+    # Runs in a child process so each variant's peak RSS is measured independently
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn(BytesIO(photo))
+        timings.append((time.perf_counter() - started) * 1000)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    conn.send((timings, traced_peak, max(0, peak_rss - baseline_rss)))
+    conn.close()
+
+
+def run_isolated(fn, photo, iterations):
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.get_context('fork').Process(target=_measure, args=(fn, photo, iterations, child))
+    process.start()
+    result = parent.recv()
+    process.join()
+    return result
+
+
+class Command(BaseCommand):
+    help = "Benchmark per-image preprocessing time and peak memory for large JPEG photos (legacy vs. optimized)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--width', type=int, default=4000, help="Photo width (default 12MP: 4000x3000).")
+        parser.add_argument('--height', type=int, default=3000)
+        parser.add_argument('--iterations', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=16, help="Images for the parallel batch comparison.")
+
+    def handle(self, *args, **options):
+        photo = make_photo(options['width'], options['height'])
+        self.stdout.write(
+            f"Photo: {options['width']}x{options['height']} JPEG, {len(photo) / 1e6:.1f} MB; "
+            f"target {DEFAULT_INPUT_SIZE[0]}x{DEFAULT_INPUT_SIZE[1]}"
+        )
+
+        for name, fn in (("legacy", legacy_preprocess), ("optimized", optimized_preprocess)):
+            timings, traced_peak, rss_growth = run_isolated(fn, photo, options['iterations'])
+            self.stdout.write(
+                f"{name:>10}: {np.mean(timings):8.1f} ms/image (p50 {np.percentile(timings, 50):.1f}) | "
+                f"peak Python/numpy alloc {traced_peak / 1e6:7.2f} MB | peak RSS growth {rss_growth / 1024:7.1f} MB"
+            )
+
+        files = [BytesIO(photo) for _ in range(options['batch_size'])]
+        for parallel in (False, True):
+            for f in files:
+                f.seek(0)
+            started = time.perf_counter()
+            preprocess_batch(files, parallel=parallel)
+            elapsed = (time.perf_counter() - started) * 1000
+            label = "thread pool" if parallel else "sequential"
+            self.stdout.write(
+                f"batch of {len(files)} ({label}): {elapsed:8.1f} ms total, {elapsed / len(files):.1f} ms/image"
+            )
@@ -0,0 +1,80 @@
+# Management command comparing accuracy and latency of model variants (Keras, quantized TFLite, ONNX)
+# over a held-out image folder, to decide which variant to deploy.
+import json
+import os
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from detection.backends import load_backend, onnx_variant_path, tflite_variant_path
+from detection.metadata import load_metadata
+from detection.model_loader import get_registry
+from detection.preprocessing import preprocess_image
+
+from ._datasets import list_labeled_images
+
+
+class Command(BaseCommand):
+    help = ("Report top-1 accuracy, agreement with the first model and per-image CPU latency for each model "
+            "variant over a held-out folder laid out as <data-dir>/<label>/<image>.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*',
+                            help="Model files to compare (default: the active model and its exported .tflite / .onnx variants).")
+        parser.add_argument('--data-dir', required=True, help="Held-out image folder, one subfolder per label.")
+        parser.add_argument('--limit', type=int, default=0, help="Evaluate at most this many images (0 = all).")
+        parser.add_argument('--json', dest='json_path', help="Also write the report as JSON to this path.")
+
+    def handle(self, *args, **options):
+        models = options['models']
+        if not models:
+            active = get_registry().resolve_active()[1]
+            variants = [tflite_variant_path(active, mode) for mode in ('dynamic', 'float16', 'int8', 'float32')]
+            variants.append(onnx_variant_path(active))
+            models = [active] + [path for path in variants if os.path.exists(path)]
+
+        report = []
+        reference = None
+        for model_file in models:
+            # Time every variant through the backend that serves it in production
+            backend = load_backend(model_file)
+            metadata = load_metadata(model_file, backend)
+            backend.warm_up()
+            samples = list_labeled_images(options['data_dir'], metadata.labels)
+            if options['limit']:
+                samples = samples[:options['limit']]
+            if not samples:
+                raise CommandError(f"No labeled images found in {options['data_dir']}.")
+
+            predictions, timings = [], []
+            for path, _ in samples:
+                batch = preprocess_image(path, metadata)[np.newaxis]
+                started = time.perf_counter()
+                probs = backend.predict_batch(batch)
+                timings.append((time.perf_counter() - started) * 1000)
+                predictions.append(int(np.argmax(probs[0])))
+
+            predictions = np.array(predictions)
+            truth = np.array([label for _, label in samples])
+            if reference is None:
+                reference = predictions
+            report.append({
+                "model": os.path.basename(model_file),
+                "size_mb": round(os.path.getsize(model_file) / 1e6, 2),
+                "images": len(samples),
+                "accuracy": round(float((predictions == truth).mean()), 4),
+                "agreement_with_first": round(float((predictions == reference).mean()), 4),
+                "latency_ms_mean": round(float(np.mean(timings)), 2),
+                "latency_ms_p99": round(float(np.percentile(timings, 99)), 2),
+            })
+
+        self.stdout.write(f"{'model':<45}{'size MB':>9}{'acc':>8}{'agree':>8}{'mean ms':>9}{'p99 ms':>9}")
+        for row in report:
+            self.stdout.write(
+                f"{row['model']:<45}{row['size_mb']:>9}{row['accuracy']:>8}{row['agreement_with_first']:>8}"
+                f"{row['latency_ms_mean']:>9}{row['latency_ms_p99']:>9}"
+            )
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(report, f, indent=2)
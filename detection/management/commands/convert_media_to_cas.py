@@ -0,0 +1,87 @@
+# Management command moving existing prediction images into the content-addressed layout
+# (see detection/storage.py): files are renamed in place, duplicates are merged, and the
+# MediaBlob reference counts are rebuilt from the history records. Uploads of processed job items,
+# which history records used to share, are handed over to those records or deleted.
+import os
+import posixpath
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from detection.blobs import collect_garbage, delete_job_uploads
+from detection.image_store import IMAGE_DIR
+from detection.models import MediaBlob, PredictionHistory, PredictionJobItem
+from detection.storage import content_addressed_name, content_digest, image_storage, is_content_addressed
+
+
+class Command(BaseCommand):
+    help = ("Rename existing prediction images to their content-addressed names (merging duplicates), "
+            "rebuild the reference counts and delete unreferenced blobs.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report what would change without changing it.")
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        storage = image_storage()
+        # Pending job items still need their uploads; processed ones no longer do
+        pending = PredictionJobItem.objects.filter(status=PredictionJobItem.STATUS_PENDING).exclude(image='')
+        job_uploads = set(pending.values_list('image', flat=True))
+        processed = PredictionJobItem.objects.exclude(status=PredictionJobItem.STATUS_PENDING).exclude(image='')
+        names = (PredictionHistory.objects.exclude(image='')
+                 .values_list('image', flat=True).distinct().order_by('image'))
+
+        unused = set(processed.values_list('image', flat=True)) - set(names)
+        self.stdout.write(f"{len(unused)} upload(s) of processed job items used by no record")
+        if not dry_run:
+            # Records using an upload take the file over below; the others are deleted
+            processed.update(image='')
+            delete_job_uploads(unused)
+
+        moved = merged = missing = 0
+        for name in names:
+            if is_content_addressed(name) or name in job_uploads:
+                continue
+            if not storage.exists(name):
+                self.stderr.write(f"Missing file: {name}")
+                missing += 1
+                continue
+            with storage.open(name, 'rb') as f:
+                # Into the prediction images' directory (also for uploads taken over from job items)
+                target = content_addressed_name(posixpath.join(IMAGE_DIR, posixpath.basename(name)),
+                                                content_digest(File(f)))
+            duplicate = storage.exists(target)
+            self.stdout.write(f"{name} -> {target}{' (duplicate)' if duplicate else ''}")
+            if dry_run:
+                continue
+            with transaction.atomic():
+                PredictionHistory.objects.filter(image=name).update(image=target)
+                if duplicate:
+                    storage.delete(name)
+                    merged += 1
+                else:
+                    # A rename within MEDIA_ROOT: no data is copied
+                    os.makedirs(os.path.dirname(storage.path(target)), exist_ok=True)
+                    os.replace(storage.path(name), storage.path(target))
+                    moved += 1
+
+        if dry_run:
+            self.stdout.write("Dry run: nothing changed.")
+            return
+
+        # Rebuild the reference counts from the records
+        counts = dict(PredictionHistory.objects.exclude(image='').values('image')
+                      .annotate(refs=Count('id')).values_list('image', 'refs'))
+        for name, refs in counts.items():
+            if not is_content_addressed(name) or not storage.exists(name):
+                continue
+            MediaBlob.objects.update_or_create(name=name, defaults={'refcount': refs, 'size': storage.size(name)})
+        MediaBlob.objects.exclude(name__in=counts).update(refcount=0)
+        deleted = collect_garbage()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {moved} file(s), merged {merged} duplicate(s), {missing} missing; "
+            f"{MediaBlob.objects.count()} blob(s), {deleted} unreferenced blob(s) deleted."
+        ))
@@ -0,0 +1,45 @@
+# Management command that converts the Keras model into an ONNX artifact served by ONNX Runtime.
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from detection.backends import onnx_variant_path
+from detection.metadata import load_metadata, write_metadata
+from detection.model_loader import get_registry
+
+
+class Command(BaseCommand):
+    help = "Convert the active Keras model (or --model) to ONNX for the ONNX Runtime backend (requires tf2onnx)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', help="Keras model file (default: the active model).")
+        parser.add_argument('--opset', type=int, default=13, help="ONNX opset version.")
+        parser.add_argument('--output', help="Output .onnx path (default: <model>.onnx).")
+
+    def handle(self, *args, **options):
+        try:
+            import tf2onnx
+        except ImportError:
+            raise CommandError("Exporting to ONNX requires the tf2onnx package.")
+        import tensorflow as tf
+
+        model_file = options['model'] or get_registry().resolve_active()[1]
+        if not model_file.endswith(('.h5', '.keras')):
+            raise CommandError("Pass the Keras model (.h5 / .keras) with --model.")
+        model = tf.keras.models.load_model(model_file)
+        metadata = load_metadata(model_file, model)
+
+        # Convert the same pinned [None, H, W, 3] float32 signature the Keras backend serves
+        signature = (tf.TensorSpec([None] + list(metadata.input_shape), tf.float32, name='images'),)
+        serve = tf.function(lambda images: model(images, training=False), input_signature=signature)
+        model_proto, _ = tf2onnx.convert.from_function(serve, input_signature=signature, opset=options['opset'])
+
+        output = options['output'] or onnx_variant_path(model_file)
+        with open(output, 'wb') as f:
+            f.write(model_proto.SerializeToString())
+        write_metadata(output, metadata)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {output} ({os.path.getsize(output) / 1e6:.1f} MB, Keras model "
+            f"{os.path.getsize(model_file) / 1e6:.1f} MB)"
+        ))
@@ -0,0 +1,67 @@
+# Management command that converts the Keras model into a quantized TFLite artifact.
+import os
+import random
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from detection.backends import tflite_variant_path
+from detection.metadata import load_metadata, write_metadata
+from detection.model_loader import get_registry
+from detection.preprocessing import preprocess_image
+
+from ._datasets import list_images
+
+
+class Command(BaseCommand):
+    help = ("Convert the active Keras model (or --model) to TFLite: 'dynamic' range quantization, "
+            "'float16' weights, full 'int8' calibrated on a representative image folder, or unquantized "
+            "'float32' (for DETECTION_SHARED_WEIGHTS).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', help="Keras model file (default: the active model).")
+        parser.add_argument('--mode', choices=['dynamic', 'float16', 'int8', 'float32'], default='dynamic')
+        parser.add_argument('--representative-dir', help="Image folder used to calibrate int8 quantization.")
+        parser.add_argument('--samples', type=int, default=200, help="Representative images to use for int8.")
+        parser.add_argument('--output', help="Output .tflite path (default: <model>_<mode>.tflite).")
+
+    def handle(self, *args, **options):
+        import tensorflow as tf
+
+        model_file = options['model'] or get_registry().resolve_active()[1]
+        if model_file.endswith('.tflite'):
+            raise CommandError("The model is already a TFLite file; pass the Keras model with --model.")
+        model = tf.keras.models.load_model(model_file)
+        metadata = load_metadata(model_file, model)
+
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        if options['mode'] != 'float32':
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if options['mode'] == 'float16':
+            converter.target_spec.supported_types = [tf.float16]
+        elif options['mode'] == 'int8':
+            if not options['representative_dir']:
+                raise CommandError("--representative-dir is required for int8 quantization.")
+            images = list_images(options['representative_dir'])
+            if not images:
+                raise CommandError(f"No images found in {options['representative_dir']}.")
+            random.Random(0).shuffle(images)
+            images = images[:options['samples']]
+
+            def representative_dataset():
+                for path in images:
+                    yield [preprocess_image(path, metadata)[np.newaxis]]
+
+            converter.representative_dataset = representative_dataset
+            # Quantize every op to int8; the float32 model input/output are kept so callers do not change
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+        output = options['output'] or tflite_variant_path(model_file, options['mode'])
+        with open(output, 'wb') as f:
+            f.write(converter.convert())
+        write_metadata(output, metadata)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {output} ({os.path.getsize(output) / 1e6:.1f} MB, Keras model "
+            f"{os.path.getsize(model_file) / 1e6:.1f} MB)"
+        ))
@@ -0,0 +1,43 @@
+# Management command backfilling the thumbnail/medium derivatives (see detection/derivatives.py)
+# of the images of existing prediction records, decoding the images in parallel threads.
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from detection.derivatives import generate_derivatives
+from detection.models import PredictionHistory
+
+
+class Command(BaseCommand):
+    help = "Generate the missing thumbnail/medium derivatives of the images of existing prediction records."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 4,
+                            help="Parallel threads (PIL releases the GIL while decoding, resizing and encoding).")
+
+    def handle(self, *args, **options):
+        names = list(PredictionHistory.objects.exclude(image='')
+                     .values_list('image', flat=True).distinct().order_by('image'))
+
+        def generate(name):
+            try:
+                return generate_derivatives(name), None
+            except Exception as e:
+                return 0, f"{name}: {e}"
+
+        started = time.perf_counter()
+        created = 0
+        failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for count, error in pool.map(generate, names):
+                created += count
+                if error:
+                    failed += 1
+                    self.stderr.write(error)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(names)} image(s): {created} derivative(s) created, {failed} failed "
+            f"in {time.perf_counter() - started:.1f}s with {options['workers']} worker(s)."
+        ))
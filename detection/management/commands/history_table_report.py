@@ -0,0 +1,59 @@
+# Management command reporting how much space the prediction history takes: rows, rows linked to a
+# Disease row, advice text still copied onto rows, and the on-disk size of the table (SQLite with the
+# dbstat table, or PostgreSQL). It also runs on the schema from before the Disease table, so it can be
+# run before and after `migrate` to compare.
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, Length
+
+from detection.models import Disease, PredictionHistory
+
+
+def table_size(table):
+    """On-disk bytes of a table and its indexes, or None if the database cannot tell."""
+    with connection.cursor() as cursor:
+        try:
+            if connection.vendor == 'sqlite':
+                cursor.execute(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name = %s "
+                    "OR name IN (SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s)",
+                    [table, table],
+                )
+            elif connection.vendor == 'postgresql':
+                cursor.execute("SELECT pg_total_relation_size(%s)", [table])
+            else:
+                return None
+        except DatabaseError:
+            # SQLite built without SQLITE_ENABLE_DBSTAT_VTAB
+            return None
+        return cursor.fetchone()[0]
+
+
+class Command(BaseCommand):
+    help = "Report the size of the prediction history table and the advice text copied onto its rows."
+
+    def handle(self, *args, **options):
+        # Not migrated yet: only the columns of the old schema can be queried
+        migrated = Disease._meta.db_table in connection.introspection.table_names()
+        text_bytes = Coalesce(Length('remedy'), 0) + Coalesce(Length('preventive_measures'), 0)
+        aggregates = {
+            'rows': Count('id'),
+            'inline_rows': Count('id', filter=Q(remedy__isnull=False) | Q(preventive_measures__isnull=False)),
+            'inline_bytes': Coalesce(Sum(text_bytes), 0),
+        }
+        if migrated:
+            aggregates['linked'] = Count('id', filter=Q(disease_info__isnull=False))
+        stats = PredictionHistory.objects.only('id').aggregate(**aggregates)
+
+        self.stdout.write(
+            f"Prediction records: {stats['rows']} ({stats.get('linked', 0)} linked to a Disease row)"
+        )
+        self.stdout.write(f"Disease rows: {Disease.objects.count() if migrated else 'n/a (not migrated)'}")
+        self.stdout.write(
+            f"Advice text stored on records: {stats['inline_bytes']} character(s) in {stats['inline_rows']} row(s)"
+        )
+        tables = [PredictionHistory._meta.db_table] + ([Disease._meta.db_table] if migrated else [])
+        for table in tables:
+            size = table_size(table)
+            self.stdout.write(f"Table {table}: {'n/a' if size is None else f'{size} bytes'}")
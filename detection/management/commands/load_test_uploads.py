@@ -0,0 +1,119 @@
+# Management command load-testing the prediction endpoints with many concurrent slow uploads,
+# to compare the connection capacity of a WSGI server (predict/) and an ASGI server (async/predict/).
+import asyncio
+import time
+import uuid
+from urllib.parse import urlsplit
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .benchmark_preprocessing import make_photo
+
+
+def multipart_body(field, filename, content):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return f"multipart/form-data; boundary={boundary}", body
+
+
+async def slow_upload(url, token, content_type, body, upload_seconds, chunks, timeout):
+    """
+    POST body to url over a fresh connection, trickled in `chunks` pieces over `upload_seconds`
+    like a phone on a slow network. Returns (HTTP status or error name, seconds until the response).
+    """
+    parts = urlsplit(url)
+    started = time.perf_counter()
+    connection = []
+
+    async def exchange():
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+        connection.append(writer)
+        writer.write((
+            f"POST {parts.path or '/'} HTTP/1.1\r\n"
+            f"Host: {parts.netloc}\r\n"
+            f"Authorization: Bearer {token}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n"
+        ).encode())
+        step = -(-len(body) // chunks)
+        for offset in range(0, len(body), step):
+            writer.write(body[offset:offset + step])
+            await writer.drain()
+            await asyncio.sleep(upload_seconds / chunks)
+        status_line = await reader.readline()
+        await reader.read()
+        return int(status_line.split()[1])
+
+    try:
+        return await asyncio.wait_for(exchange(), timeout), time.perf_counter() - started
+    except asyncio.TimeoutError:
+        return "timeout", time.perf_counter() - started
+    except (OSError, IndexError, ValueError) as e:
+        return type(e).__name__, time.perf_counter() - started
+    finally:
+        for writer in connection:
+            writer.close()
+
+
+async def run_level(url, token, content_type, body, connections, options):
+    return await asyncio.gather(*(
+        slow_upload(url, token, content_type, body, options['upload_seconds'], options['chunks'], options['timeout'])
+        for _ in range(connections)
+    ))
+
+
+class Command(BaseCommand):
+    help = ("Open many concurrent slow image uploads against running servers and report how many complete, "
+            "e.g. --target wsgi=http://127.0.0.1:8000/api/detection/predict/ "
+            "--target asgi=http://127.0.0.1:8001/api/detection/async/predict/")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', required=True, metavar='NAME=URL',
+                            help="Endpoint to test (repeat to compare several servers).")
+        parser.add_argument('--username', required=True, help="User the uploads are made as (a JWT is issued).")
+        parser.add_argument('--connections', type=int, nargs='+', default=[50, 200, 1000],
+                            help="Concurrent connection counts to test.")
+        parser.add_argument('--upload-seconds', type=float, default=5.0, help="Time taken to send each upload.")
+        parser.add_argument('--chunks', type=int, default=20, help="Pieces each upload is sent in.")
+        parser.add_argument('--timeout', type=float, default=60.0, help="Per-request timeout in seconds.")
+        parser.add_argument('--image-size', type=int, nargs=2, default=[4000, 3000], metavar=('WIDTH', 'HEIGHT'),
+                            help="Synthetic JPEG size (default: a 12MP phone photo).")
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['username'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['username']!r} does not exist.")
+        token = str(AccessToken.for_user(user))
+        content_type, body = multipart_body('image', 'leaf.jpg', make_photo(*options['image_size']))
+        targets = [target.split('=', 1) for target in options['target']]
+        if any(len(target) != 2 for target in targets):
+            raise CommandError("Targets must be given as NAME=URL.")
+
+        self.stdout.write(f"Upload: {len(body) / 1e6:.2f} MB sent over {options['upload_seconds']}s per connection")
+        self.stdout.write(
+            f"{'target':<10}{'conns':>7}{'ok':>7}{'failed':>8}{'p50 s':>8}{'p99 s':>8}{'wall s':>8}  errors"
+        )
+        for name, url in targets:
+            for connections in options['connections']:
+                started = time.perf_counter()
+                results = asyncio.run(run_level(url, token, content_type, body, connections, options))
+                wall = time.perf_counter() - started
+                ok = [elapsed for outcome, elapsed in results if outcome == 200]
+                errors = {}
+                for outcome, _ in results:
+                    if outcome != 200:
+                        errors[outcome] = errors.get(outcome, 0) + 1
+                p50, p99 = (np.percentile(ok, 50), np.percentile(ok, 99)) if ok else (0.0, 0.0)
+                self.stdout.write(
+                    f"{name:<10}{connections:>7}{len(ok):>7}{connections - len(ok):>8}{p50:>8.2f}{p99:>8.2f}"
+                    f"{wall:>8.1f}  {errors or ''}"
+                )
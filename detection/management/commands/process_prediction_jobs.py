@@ -0,0 +1,23 @@
+# Management command that runs unfinished asynchronous prediction jobs from the database.
+import time
+
+from django.core.management.base import BaseCommand
+
+from detection.jobs import resume_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Run pending (or interrupted) prediction jobs. Use --loop to keep polling as a standalone worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep polling for new jobs.")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            count = resume_pending_jobs()
+            if count:
+                self.stdout.write(f"Processed {count} job(s).")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
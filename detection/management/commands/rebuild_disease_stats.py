@@ -0,0 +1,29 @@
+# Management command recomputing the DailyDiseaseStat rollup (see detection/stats.py) from the
+# prediction history, for all days or the recent ones; run periodically to correct any drift, e.g.
+# from records changed with queryset.update() which the incremental counts do not see.
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from detection.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily prediction counts per disease and confidence bucket used by the dashboard."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help="Only recompute the last N days (default: the whole history).")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['days'] is not None:
+            since = timezone.localdate() - datetime.timedelta(days=max(options['days'] - 1, 0))
+        started = time.perf_counter()
+        rows = rebuild_stats(since)
+        scope = f"since {since}" if since else "for the whole history"
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {rows} daily statistic row(s) {scope} in {time.perf_counter() - started:.1f}s."
+        ))
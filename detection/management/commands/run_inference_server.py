@@ -0,0 +1,25 @@
+# Management command that runs the out-of-process inference service used with DETECTION_INFERENCE_MODE = 'remote'.
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from detection.inference_service import InferenceServer, get_socket_path
+
+
+class Command(BaseCommand):
+    help = ("Serve model predictions to the web workers from a pool of inference processes "
+            "listening on a Unix socket (set DETECTION_INFERENCE_MODE = 'remote' in the web workers).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', help="Unix socket path (default: DETECTION_INFERENCE_SOCKET).")
+        parser.add_argument('--workers', type=int,
+                            help="Inference processes, each holding one copy of the model "
+                                 "(default: DETECTION_INFERENCE_WORKERS).")
+
+    def handle(self, *args, **options):
+        server = InferenceServer(
+            address=options['socket'] or get_socket_path(),
+            workers=options['workers'] or getattr(settings, 'DETECTION_INFERENCE_WORKERS', 2),
+        )
+        self.stdout.write(f"Serving inference on {server.address} with {server.workers} process(es)")
+        server.serve_forever()
+        self.stdout.write("Inference server stopped.")
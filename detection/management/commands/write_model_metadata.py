@@ -0,0 +1,44 @@
+# Management command that writes the metadata sidecar (.json) for a model file.
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from detection.disease_info import label_list
+from detection.metadata import ModelMetadata, ModelMetadataError, write_metadata
+
+
+class Command(BaseCommand):
+    help = ("Write the metadata sidecar (input shape, normalization, label order) next to a model file. "
+            "The input shape defaults to the one declared by the model.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('model_file', help="Path to the .h5 model.")
+        parser.add_argument('--input-size', type=int, nargs=2, metavar=('HEIGHT', 'WIDTH'),
+                            help="Input height and width (required if the model does not declare them).")
+        parser.add_argument('--scale', type=float, default=1.0 / 255.0,
+                            help="Pixel scale: value = pixel * scale + offset (default 1/255).")
+        parser.add_argument('--offset', type=float, default=0.0)
+        parser.add_argument('--labels-file', help="JSON list of labels in output order (default: disease_info.label_list).")
+
+    def handle(self, *args, **options):
+        import tensorflow as tf
+
+        model = tf.keras.models.load_model(options['model_file'])
+        if options['input_size']:
+            height, width = options['input_size']
+        else:
+            height, width = model.input_shape[1:3]
+            if height is None or width is None:
+                raise CommandError("The model does not declare its input size; pass --input-size.")
+        labels = label_list
+        if options['labels_file']:
+            with open(options['labels_file'], 'r') as f:
+                labels = json.load(f)
+
+        metadata = ModelMetadata((height, width, 3), labels, scale=options['scale'], offset=options['offset'])
+        try:
+            metadata.validate(model)
+        except ModelMetadataError as e:
+            raise CommandError(str(e))
+        path = write_metadata(options['model_file'], metadata)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {path}"))
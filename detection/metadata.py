@@ -0,0 +1,122 @@
+# This file defines the model metadata sidecar: a JSON file stored next to the model file
+# (e.g. plant_disease_prediction_model.json next to plant_disease_prediction_model.h5) that describes
+# the input shape, dtype, pixel normalization and label order the model was trained with.
+# Preprocessing and label decoding are driven from it, and it is validated against the model at load time.
+import json
+import os
+
+from .disease_info import label_list
+
+DEFAULT_INPUT_SIZE = (224, 224)
+SUPPORTED_DTYPES = ('float32',)
+
+
+class ModelMetadataError(ValueError):
+    """Raised when a metadata sidecar is malformed or does not match its model."""
+
+
+class ModelMetadata:
+    """
+    Input and output description of a model.
+
+    - input_shape: (height, width, channels) of a single image.
+    - dtype: input tensor dtype.
+    - scale / offset: pixel values in [0, 255] are mapped to value * scale + offset.
+    - labels: class labels in the order of the model's output units.
+    """
+
+    def __init__(self, input_shape, labels, scale=1.0 / 255.0, offset=0.0, dtype='float32'):
+        self.input_shape = tuple(int(dim) for dim in input_shape)
+        self.labels = list(labels)
+        self.scale = float(scale)
+        self.offset = float(offset)
+        self.dtype = dtype
+
+    @property
+    def input_size(self):
+        """(height, width) to resize images to."""
+        return self.input_shape[0], self.input_shape[1]
+
+    @classmethod
+    def default(cls):
+        """Metadata matching the historical hard-coded preprocessing (224x224, /255, disease_info labels)."""
+        return cls(DEFAULT_INPUT_SIZE + (3,), label_list)
+
+    @classmethod
+    def for_model(cls, model):
+        """Derive metadata from the model itself when no sidecar exists."""
+        height, width = model.input_shape[1:3]
+        if height is None or width is None:
+            height, width = DEFAULT_INPUT_SIZE
+        return cls((height, width, 3), label_list)
+
+    @classmethod
+    def from_dict(cls, data):
+        try:
+            normalization = data.get('normalization', {})
+            return cls(
+                input_shape=data['input_shape'],
+                labels=data.get('labels', label_list),
+                scale=normalization.get('scale', 1.0 / 255.0),
+                offset=normalization.get('offset', 0.0),
+                dtype=data.get('dtype', 'float32'),
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise ModelMetadataError(f"Invalid model metadata: {e}")
+
+    def to_dict(self):
+        return {
+            "input_shape": list(self.input_shape),
+            "dtype": self.dtype,
+            "normalization": {"scale": self.scale, "offset": self.offset},
+            "labels": self.labels,
+        }
+
+    def validate(self, model):
+        """Check the metadata against the model's declared input and output shapes."""
+        if len(self.input_shape) != 3 or self.input_shape[2] != 3:
+            raise ModelMetadataError(f"Expected an (H, W, 3) input shape, got {self.input_shape}.")
+        if self.dtype not in SUPPORTED_DTYPES:
+            raise ModelMetadataError(f"Unsupported input dtype {self.dtype!r}.")
+        model_input = tuple(model.input_shape[1:])
+        for declared, expected in zip(model_input, self.input_shape):
+            if declared is not None and declared != expected:
+                raise ModelMetadataError(
+                    f"Metadata input shape {self.input_shape} does not match the model input {model_input}."
+                )
+        outputs = model.output_shape[-1]
+        if outputs is not None and outputs != len(self.labels):
+            raise ModelMetadataError(
+                f"Metadata lists {len(self.labels)} labels but the model has {outputs} outputs."
+            )
+
+
+def metadata_path(model_file):
+    """Return the sidecar path for a model file."""
+    return os.path.splitext(model_file)[0] + '.json'
+
+
+def load_metadata(model_file, model):
+    """
+    Load and validate the sidecar for model_file, deriving metadata from the model if there is none.
+    Raises ModelMetadataError if the sidecar is invalid or does not match the model.
+    """
+    path = metadata_path(model_file)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            try:
+                metadata = ModelMetadata.from_dict(json.load(f))
+            except json.JSONDecodeError as e:
+                raise ModelMetadataError(f"Invalid model metadata file {path}: {e}")
+    else:
+        metadata = ModelMetadata.for_model(model)
+    metadata.validate(model)
+    return metadata
+
+
+def write_metadata(model_file, metadata):
+    """Write the sidecar for model_file and return its path."""
+    path = metadata_path(model_file)
+    with open(path, 'w') as f:
+        json.dump(metadata.to_dict(), f, indent=2)
+    return path
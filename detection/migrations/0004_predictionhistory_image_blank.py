@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 20:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0003_predictionjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='predictionhistory',
+            name='image',
+            field=models.ImageField(blank=True, upload_to='predicted_images/'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-17 20:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0005_mediablob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Disease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(max_length=100, unique=True)),
+                ('remedy', models.TextField()),
+                ('preventive_measures', models.TextField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='predictionhistory',
+            name='remedy',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='disease_info',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='predictions', to='detection.disease'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Data migration seeding the Disease table from detection/disease_info.py and pointing existing prediction
+# records at it. Rows are converted in primary-key batches, each in its own transaction, and only rows not
+# linked yet are visited, so an interrupted run resumes where it stopped. A row is only linked when its
+# copied texts match its disease's current texts; others keep their own copies and serialize unchanged.
+from django.db import migrations, transaction
+
+BATCH_SIZE = 2000
+# Same fallback as detection.inference.NO_PREVENTION
+NO_PREVENTION = "No specific prevention measures available."
+
+
+def seed_diseases(Disease):
+    from detection.disease_info import default_remedy, label_list, preventive_measures, remedies
+
+    for label in label_list:
+        Disease.objects.update_or_create(label=label, defaults={
+            'remedy': remedies.get(label, default_remedy),
+            'preventive_measures': preventive_measures.get(label, NO_PREVENTION),
+        })
+
+
+def link_history(PredictionHistory, Disease, batch_size=BATCH_SIZE):
+    """Link unlinked records to their Disease rows and drop their text copies. Returns the number linked."""
+    diseases = {d.label: d for d in Disease.objects.all()}
+    unlinked = PredictionHistory.objects.filter(disease_info__isnull=True).order_by('pk')
+    linked = 0
+    last_pk = 0
+    while True:
+        pks = list(unlinked.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return linked
+        last_pk = pks[-1]
+        batch = PredictionHistory.objects.filter(pk__in=pks)
+        with transaction.atomic():
+            for label in batch.values_list('disease', flat=True).distinct():
+                disease = diseases.get(label)
+                if disease is None:
+                    continue
+                linked += batch.filter(
+                    disease=label, remedy=disease.remedy, preventive_measures=disease.preventive_measures,
+                ).update(disease_info=disease, remedy=None, preventive_measures=None)
+
+
+def forwards(apps, schema_editor):
+    Disease = apps.get_model('detection', 'Disease')
+    seed_diseases(Disease)
+    link_history(apps.get_model('detection', 'PredictionHistory'), Disease)
+
+
+def backwards(apps, schema_editor):
+    # Copy the texts back onto the records before the Disease table goes away
+    PredictionHistory = apps.get_model('detection', 'PredictionHistory')
+    Disease = apps.get_model('detection', 'Disease')
+    for disease in Disease.objects.all():
+        PredictionHistory.objects.filter(disease_info=disease).update(
+            remedy=disease.remedy, preventive_measures=disease.preventive_measures, disease_info=None,
+        )
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own
+    atomic = False
+
+    dependencies = [
+        ('detection', '0006_disease'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
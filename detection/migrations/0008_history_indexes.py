@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-17 20:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0007_link_history_diseases'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='predictionhistory',
+            index=models.Index(fields=['user', '-timestamp', '-id'], name='history_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='predictionhistory',
+            index=models.Index(fields=['disease', 'timestamp'], name='history_disease_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='predictionhistory',
+            index=models.Index(fields=['timestamp'], name='history_time_idx'),
+        ),
+        # The composite index covers user lookups, so the single-column one goes once it exists
+        migrations.AlterField(
+            model_name='predictionhistory',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
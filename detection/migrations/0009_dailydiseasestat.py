@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-17 20:44
+
+from django.db import migrations, models
+from django.db.models import Count, F, Value
+from django.db.models.functions import Floor, Least, TruncDate
+
+# DailyDiseaseStat.CONFIDENCE_BUCKETS when this migration was written
+BUCKETS = 10
+
+
+def fill_stats(apps, schema_editor):
+    DailyDiseaseStat = apps.get_model('detection', 'DailyDiseaseStat')
+    PredictionHistory = apps.get_model('detection', 'PredictionHistory')
+    rows = (PredictionHistory.objects
+            .annotate(day=TruncDate('timestamp'),
+                      bucket=Least(Floor(F('confidence') * Value(float(BUCKETS))), Value(float(BUCKETS - 1))))
+            .values('day', 'disease', 'bucket')
+            .annotate(n=Count('id'))
+            .order_by())
+    DailyDiseaseStat.objects.bulk_create(
+        (DailyDiseaseStat(date=row['day'], disease=row['disease'], confidence_bucket=int(row['bucket']),
+                          count=row['n']) for row in rows),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0008_history_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyDiseaseStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('disease', models.CharField(max_length=100)),
+                ('confidence_bucket', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'disease', 'confidence_bucket'), name='daily_disease_stat_key')],
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 21:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0009_dailydiseasestat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='predictionjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='predictionjob',
+            name='runner',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1,17 +1,320 @@
+# This file loads the trained plant disease models and serves them to the views.
+# Models are held in a lock-protected registry: each model version is loaded exactly once through its
+# inference backend (see backends.py), warmed up, and hot-swapped when the active model changes.
+import gc
+import logging
 import os
-import tensorflow as tf
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+
+from .backends import KerasBackend, backend_for_path, backend_variant_path, load_backend
+from .metadata import load_metadata
+
+logger = logging.getLogger(__name__)
 
 # Define model path
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 model_path = os.path.join(BASE_DIR, 'cnn_model', 'plant_disease_prediction_model.h5')
 
-# Global variable to cache the model
-_model = None
+# Uploaded models and the active model marker written by streamlit_dashboard/utils.set_active_model
+MODELS_DIR = os.path.join(BASE_DIR, 'streamlit_dashboard', 'models')
+ACTIVE_MODEL_FILE = os.path.join(MODELS_DIR, 'active_model.txt')
+
+# Set once the model is loaded and a warm-up forward pass has completed in this process
+_ready = False
+
+
+class LoadedModel:
+    """
+    A model version held in memory by its inference backend.
+
+    - name: file name of the model (as written to active_model.txt).
+    - version: registry key, the name plus the file's modification time, so re-uploading
+      a file under the same name loads the new weights.
+    - backend: the InferenceBackend serving the model file.
+    - metadata: ModelMetadata (input shape, normalization, labels) from the model's sidecar.
+    - in_flight: number of predictions currently using this model.
+    """
+
+    def __init__(self, name, path, version, backend, metadata):
+        self.name = name
+        self.path = path
+        self.version = version
+        self.backend = backend
+        self.metadata = metadata
+        self.in_flight = 0
+        self.retired = False
+
+    def predict(self, batch):
+        """Run a float32 batch of shape (N, H, W, 3) through this model and return class probabilities."""
+        return self.backend.predict_batch(batch)
+
+    def release(self):
+        self.backend.release()
+        self.backend = None
+
+    def describe(self):
+        return dict(self.backend.describe() if self.backend else {},
+                    name=self.name,
+                    version=self.version,
+                    in_flight=self.in_flight,
+                    input_shape=list(self.metadata.input_shape))
+
+
+class ModelRegistry:
+    """
+    Thread-safe registry of loaded models with atomic hot-swap of the active model.
+
+    The active model is read from active_model.txt (checked at most every check_interval
+    seconds). Each version is loaded exactly once under a lock; concurrent callers wait for
+    that single load instead of each loading their own copy. When the active model changes,
+    requests already holding a lease on the old model finish on it, and the old model is
+    released as soon as its last in-flight request completes.
+    """
+
+    def __init__(self, active_file=ACTIVE_MODEL_FILE, models_dir=MODELS_DIR, default_path=None,
+                 check_interval=2.0, loader=None, backend=None):
+        self.active_file = active_file
+        self.models_dir = models_dir
+        self.default_path = default_path or model_path
+        self.check_interval = check_interval
+        self.loader = loader or load_backend
+        self.backend = backend
+        self._lock = threading.Lock()  # guards _models, _active and in-flight counts
+        self._load_lock = threading.Lock()  # serializes (slow) model loading
+        self._models = {}
+        self._active = None
+        self._active_marker = None
+        self._last_check = 0.0
+
+    def _read_marker(self):
+        """Return (mtime, contents) of the active model file, or None if it does not exist."""
+        try:
+            mtime = os.path.getmtime(self.active_file)
+            with open(self.active_file, 'r') as f:
+                return mtime, f.read().strip()
+        except OSError:
+            return None
+
+    def resolve_active(self):
+        """
+        Return (name, path) of the model that should be active.
+        Falls back to the default bundled model when no uploaded model is marked active or the file is missing.
+        """
+        marker = self._read_marker()
+        path = self.default_path
+        if marker and marker[1]:
+            uploaded = os.path.join(self.models_dir, os.path.basename(marker[1]))
+            if os.path.isfile(uploaded):
+                path = uploaded
+        # With an explicit backend, serve the artifact exported for it next to a Keras model if there is one
+        backend = self.backend or getattr(settings, 'DETECTION_INFERENCE_BACKEND', None)
+        if backend is None and getattr(settings, 'DETECTION_SHARED_WEIGHTS', False):
+            # Keras copies the weights into every process; shared weights are served from the TFLite file
+            backend = 'tflite'
+        if backend and backend_for_path(path) is KerasBackend:
+            variant = backend_variant_path(path, backend)
+            if os.path.isfile(variant):
+                path = variant
+            elif variant != path:
+                logger.warning("%s backend selected but %s does not exist; serving %s", backend, variant, path)
+        return os.path.basename(path), path
+
+    def load(self, name, path, warm_up=True):
+        """
+        Load (once) and return the LoadedModel for the given file.
+        With warm_up=False the backend is not run; it warms up lazily on its first prediction.
+        """
+        version = f"{name}@{int(os.path.getmtime(path)) if os.path.exists(path) else 0}"
+        with self._lock:
+            entry = self._models.get(version)
+        if entry is not None:
+            return entry
+        with self._load_lock:
+            # Another thread may have finished loading while we waited
+            with self._lock:
+                entry = self._models.get(version)
+            if entry is not None:
+                return entry
+            logger.info("Loading model %s from %s", version, path)
+            backend = self.loader(path)
+            # Refuse models whose sidecar does not match them, so they are never activated
+            entry = LoadedModel(name, path, version, backend, load_metadata(path, backend))
+            if warm_up:
+                backend.warm_up()
+            with self._lock:
+                self._models[version] = entry
+            return entry
+
+    def activate(self, name, path, warm_up=True):
+        """Load the given model and atomically make it the active one, retiring the previous model."""
+        while True:
+            entry = self.load(name, path, warm_up=warm_up)
+            with self._lock:
+                if self._models.get(entry.version) is not entry:
+                    # Retired and released by its last lease since load() returned it: load it again
+                    continue
+                # Swapping back to a model still finishing in-flight requests keeps it loaded
+                entry.retired = False
+                previous, self._active = self._active, entry
+                if previous is not None and previous is not entry:
+                    self._retire(previous)
+            return entry
+
+    def refresh(self, force=False):
+        """Swap models if active_model.txt changed since the last check."""
+        now = time.monotonic()
+        if not force and self._active is not None and now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        marker = self._read_marker()
+        if not force and self._active is not None and marker == self._active_marker:
+            return
+        name, path = self.resolve_active()
+        try:
+            self.activate(name, path)
+        except Exception:
+            if self._active is None:
+                raise
+            # Keep serving the current model if the new one cannot be loaded
+            logger.exception("Failed to activate model %s; keeping %s", name, self._active.version)
+        self._active_marker = marker
+
+    def active(self):
+        """Return the currently active LoadedModel, loading it on first use."""
+        self.refresh()
+        return self._active
+
+    @contextmanager
+    def lease(self):
+        """
+        Context manager yielding the active model for the duration of a prediction.
+        The model cannot be released while the lease is held, even if it is swapped out.
+        """
+        self.refresh()
+        with self._lock:
+            entry = self._active
+            entry.in_flight += 1
+        try:
+            yield entry
+        finally:
+            with self._lock:
+                entry.in_flight -= 1
+                if entry.retired and entry.in_flight == 0:
+                    self._release(entry)
+
+    def _retire(self, entry):
+        # Called with self._lock held
+        entry.retired = True
+        if entry.in_flight == 0:
+            self._release(entry)
+
+    def _release(self, entry):
+        # Called with self._lock held
+        self._models.pop(entry.version, None)
+        entry.release()
+        logger.info("Released model %s", entry.version)
+        gc.collect()
+
+    def describe(self):
+        """Return a JSON-serializable description of the loaded models."""
+        with self._lock:
+            return {
+                "active": self._active.version if self._active else None,
+                "loaded": [entry.describe() for entry in self._models.values()],
+            }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Return the process-wide ModelRegistry, created from settings on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry(
+                    active_file=getattr(settings, 'DETECTION_ACTIVE_MODEL_FILE', ACTIVE_MODEL_FILE),
+                    models_dir=getattr(settings, 'DETECTION_MODELS_DIR', MODELS_DIR),
+                    default_path=getattr(settings, 'DETECTION_MODEL_PATH', model_path),
+                    check_interval=getattr(settings, 'DETECTION_ACTIVE_MODEL_CHECK_SECONDS', 2.0),
+                )
+    return _registry
+
+
+def remote_inference():
+    """True when predictions are served by the out-of-process inference service (see inference_service.py)."""
+    return getattr(settings, 'DETECTION_INFERENCE_MODE', 'local') == 'remote'
+
+
+def _client():
+    from .inference_service import get_client
+    return get_client()
+
+
+def get_backend():
+    """Return the InferenceBackend serving the active model (loaded only once)."""
+    return get_registry().active().backend
+
+
+def load_weights():
+    """
+    Load the active model without running it, e.g. in a server's master process before it forks.
+    TensorFlow's executor threads do not survive a fork, so graphs are traced and run only in the workers.
+    """
+    registry = get_registry()
+    registry.activate(*registry.resolve_active(), warm_up=False)
+
+
+def get_active_metadata():
+    """Return the ModelMetadata of the active model (drives preprocessing and label decoding)."""
+    if remote_inference():
+        return _client().info()['metadata']
+    return get_registry().active().metadata
+
+
+def active_model_version():
+    """Return the version key of the active model (used to scope cached predictions)."""
+    if remote_inference():
+        return _client().info()['version']
+    return get_registry().active().version
+
+
+def predict_batch(batch):
+    """
+    Run a float32 batch of shape (N, H, W, 3) through the active model's backend and return class probabilities.
+    In remote mode the batch is sent to the inference service through shared memory.
+    """
+    if remote_inference():
+        return _client().predict(batch)
+    with get_registry().lease() as entry:
+        return entry.predict(batch)
+
+
+def warm_up():
+    """
+    Load the model, warm up its backend and run a dummy forward pass through the registry,
+    so the first real request is served by a hot worker. Marks the process as ready.
+    """
+    global _ready
+    height, width = get_active_metadata().input_size
+    predict_batch(np.zeros((1, height, width, 3), dtype=np.float32))
+    _ready = True
+
+
+def describe_models():
+    """Return the loaded models of this process, or of the inference service in remote mode."""
+    if remote_inference():
+        return _client().info()['models']
+    return get_registry().describe()
 
 
-def get_model():
-    """Load and return the trained model (only once)."""
-    global _model
-    if _model is None:
-        _model = tf.keras.models.load_model(model_path)
-    return _model
+def is_ready():
+    """Return True once warm_up() has completed in this process."""
+    return _ready
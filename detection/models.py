@@ -1,8 +1,31 @@
 # models.py
 
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 
+from .storage import image_storage
+
+
+class Disease(models.Model):
+    """
+    Reference table of the diseases the model can predict, with their advice texts
+    (seeded from detection/disease_info.py), shared by all prediction records.
+
+    Fields:
+    - label: Model label, e.g. 'Tomato___Late_blight'.
+    - remedy: Suggested remedy for the disease.
+    - preventive_measures: Prevention advice for the disease.
+    """
+    label = models.CharField(max_length=100, unique=True)
+    remedy = models.TextField()
+    preventive_measures = models.TextField()
+
+    def __str__(self):
+        """String representation showing the label."""
+        return self.label
+
 
 class PredictionHistory(models.Model):
     """
@@ -10,21 +33,185 @@ class PredictionHistory(models.Model):
 
     Fields:
     - user: ForeignKey to the User who made the prediction.
-    - image: Uploaded image of the plant leaf used for prediction.
+    - image: Stored image of the plant leaf used for prediction (the original or a re-encoded copy,
+      see DETECTION_IMAGE_STORAGE). Empty until the background writer has stored it, or if images are not kept.
+      Files are content-addressed and shared between records with identical images (see MediaBlob).
     - disease: Name of the predicted disease.
+    - disease_info: The Disease row of the label, holding the remedy and prevention texts.
     - confidence: Model's confidence score for the prediction.
-    - remedy: Suggested remedy for the detected disease.
+    - remedy: Remedy text stored on the record itself, only when it differs from (or there is no)
+      disease_info; use remedy_text to read it.
     - timestamp: Date and time when the prediction was made.
-    - preventive_measures: Optional text with prevention advice.
+    - preventive_measures: Prevention text stored on the record itself, as for remedy;
+      use preventive_measures_text to read it.
     """
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    image = models.ImageField(upload_to='predicted_images/')
+    # Indexed by the (user, timestamp, id) index below, whose leading column serves plain user lookups too
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    image = models.ImageField(upload_to='predicted_images/', storage=image_storage, blank=True)
     disease = models.CharField(max_length=100)
+    disease_info = models.ForeignKey(Disease, on_delete=models.PROTECT, blank=True, null=True,
+                                     related_name='predictions')
     confidence = models.FloatField()
-    remedy = models.TextField()
+    remedy = models.TextField(blank=True, null=True)
     timestamp = models.DateTimeField(auto_now_add=True)
     preventive_measures = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # History lists: one user's records, newest first, paged by (timestamp, id)
+            models.Index(fields=['user', '-timestamp', '-id'], name='history_user_time_idx'),
+            # Dashboard filters and per-disease counts
+            models.Index(fields=['disease', 'timestamp'], name='history_disease_time_idx'),
+            # Date range filters and per-day counts across all users
+            models.Index(fields=['timestamp'], name='history_time_idx'),
+        ]
+
+    @property
+    def remedy_text(self):
+        if self.remedy is None and self.disease_info_id is not None:
+            return self.disease_info.remedy
+        return self.remedy
+
+    @property
+    def preventive_measures_text(self):
+        if self.preventive_measures is None and self.disease_info_id is not None:
+            return self.disease_info.preventive_measures
+        return self.preventive_measures
+
     def __str__(self):
         """String representation showing user, disease, confidence and timestamp."""
         return f"{self.user.username} - {self.disease} - {self.confidence:.2f} - {self.timestamp}"
+
+
+class MediaBlob(models.Model):
+    """
+    Model counting the references to a content-addressed image file.
+
+    Fields:
+    - name: Storage name of the file (<upload_to>/ab/cd/<sha256>.<ext>).
+    - size: File size in bytes.
+    - refcount: Number of PredictionHistory records using the file; the file is deleted when it drops to zero.
+    - source: Key of the upload and storage policy the file was produced from, so a repeated upload
+      is not re-encoded (see image_store.py).
+    - created_at: When the file was first stored.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField(default=0)
+    refcount = models.IntegerField(default=0)
+    source = models.CharField(max_length=100, blank=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        """String representation showing the file name and reference count."""
+        return f"{self.name} ({self.refcount} refs)"
+
+
+class DailyDiseaseStat(models.Model):
+    """
+    Model holding pre-aggregated prediction counts for the admin dashboard, kept up to date as
+    PredictionHistory records are created and deleted (see stats.py).
+
+    Fields:
+    - date: Day of the predictions (in the TIME_ZONE time zone).
+    - disease: Predicted disease label.
+    - confidence_bucket: Confidence decile, 0 for [0, 0.1) up to 9 for [0.9, 1].
+    - count: Number of predictions of the disease that day in the confidence bucket.
+    """
+    CONFIDENCE_BUCKETS = 10
+
+    date = models.DateField()
+    disease = models.CharField(max_length=100)
+    confidence_bucket = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'disease', 'confidence_bucket'], name='daily_disease_stat_key'),
+        ]
+
+    def __str__(self):
+        """String representation showing the day, disease, bucket and count."""
+        return f"{self.date} - {self.disease} - bucket {self.confidence_bucket}: {self.count}"
+
+
+class PredictionJob(models.Model):
+    """
+    Model to track an asynchronous prediction job over many uploaded images.
+
+    Fields:
+    - id: Public job identifier returned to the client.
+    - user: ForeignKey to the User who submitted the job.
+    - status: pending, running, completed or failed.
+    - total_images / processed_images / failed_images: Progress counters.
+    - error: Error message if the whole job failed.
+    - created_at / finished_at: When the job was submitted and when it finished.
+    - runner / heartbeat_at: The runner that claimed the job and when it last renewed its lease.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    total_images = models.PositiveIntegerField(default=0)
+    processed_images = models.PositiveIntegerField(default=0)
+    failed_images = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    runner = models.UUIDField(blank=True, null=True, editable=False)
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_COMPLETED, self.STATUS_FAILED)
+
+    def __str__(self):
+        """String representation showing user, status and progress."""
+        return f"{self.user.username} - {self.status} - {self.processed_images}/{self.total_images}"
+
+
+class PredictionJobItem(models.Model):
+    """
+    Model for a single image of a PredictionJob.
+
+    Fields:
+    - job: The job this image belongs to.
+    - index: Position of the image in the submitted upload.
+    - image: The uploaded image, kept until it is classified.
+    - filename: Original file name of the upload.
+    - status: pending, done or failed.
+    - error: Why the image could not be classified.
+    - prediction: The PredictionHistory record created for this image.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    job = models.ForeignKey(PredictionJob, on_delete=models.CASCADE, related_name='items')
+    index = models.PositiveIntegerField()
+    image = models.ImageField(upload_to='job_uploads/')
+    filename = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    error = models.TextField(blank=True)
+    prediction = models.OneToOneField(PredictionHistory, on_delete=models.SET_NULL, blank=True, null=True)
+
+    class Meta:
+        ordering = ['index']
+
+    def __str__(self):
+        """String representation showing job, position and status."""
+        return f"{self.job_id} - #{self.index} - {self.status}"
@@ -0,0 +1,121 @@
+# This file implements keyset (cursor) pagination for prediction history lists.
+# A page continues after the last row of the previous one, `WHERE (timestamp, id) < (last timestamp, last id)`,
+# instead of using OFFSET: deep pages cost the same as the first one, and predictions added while a client
+# scrolls never shift rows between pages.
+import base64
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only cursor pagination ordered by (ordering field, id).
+
+    Query parameters: `cursor` (opaque, from the previous page's `next` link), `page_size`,
+    and `ordering` (one of ordering_fields, '-' prefixed for descending).
+    """
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering_param = 'ordering'
+    ordering_fields = ('timestamp', 'confidence')
+    default_ordering = '-timestamp'
+    invalid_cursor_message = 'Invalid cursor.'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_ordering(self, request):
+        ordering = request.query_params.get(self.ordering_param) or self.default_ordering
+        if ordering.lstrip('-') not in self.ordering_fields:
+            allowed = ', '.join(f"{field}, -{field}" for field in self.ordering_fields)
+            raise ValidationError({self.ordering_param: [f"Must be one of: {allowed}."]})
+        return ordering
+
+    def encode_cursor(self, value, pk):
+        value = value.isoformat() if hasattr(value, 'isoformat') else value
+        payload = json.dumps([self.ordering, value, pk]).encode()
+        return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+    def decode_cursor(self, request, model):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            ordering, value, pk = json.loads(payload)
+            if ordering != self.ordering:
+                raise ValueError("cursor was issued for another ordering")
+            value = model._meta.get_field(self.ordering.lstrip('-')).to_python(value)
+            return value, int(pk)
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(request)
+        page_size = self.get_page_size(request)
+        field = self.ordering.lstrip('-')
+        descending = self.ordering.startswith('-')
+        queryset = queryset.order_by(self.ordering, '-id' if descending else 'id')
+
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            value, pk = position
+            op = 'lt' if descending else 'gt'
+            queryset = queryset.filter(Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'id__{op}': pk}))
+
+        # One extra row tells whether there is a next page
+        rows = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            # Model instances, or dicts from a values() queryset (which must include the field and id)
+            if isinstance(last, dict):
+                self.next_position = (last[field], last['id'])
+            else:
+                self.next_position = (getattr(last, field), last.pk)
+        return rows
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(*self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {'name': self.cursor_query_param, 'required': False, 'in': 'query',
+             'description': 'Cursor from the `next` link of the previous page.', 'schema': {'type': 'string'}},
+            {'name': self.page_size_query_param, 'required': False, 'in': 'query',
+             'description': f'Results per page (at most {self.max_page_size}).', 'schema': {'type': 'integer'}},
+            {'name': self.ordering_param, 'required': False, 'in': 'query',
+             'description': 'Sort order.',
+             'schema': {'type': 'string', 'enum': [prefix + field for field in self.ordering_fields
+                                                   for prefix in ('-', '')]}},
+        ]
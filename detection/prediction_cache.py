@@ -0,0 +1,145 @@
+# This file implements the prediction cache for repeated leaf image uploads.
+# Predictions are keyed by a hash of the uploaded bytes plus the active model version, so a
+# re-uploaded photo skips decoding and inference, and a model swap never serves stale results.
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def make_cache_key(image_file, model_version):
+    """
+    Return the cache key for an uploaded file: SHA-256 of its bytes plus the model version.
+    The file is read in chunks and rewound afterwards so it can still be decoded and saved.
+    """
+    digest = hashlib.sha256()
+    image_file.seek(0)
+    for chunk in image_file.chunks():
+        digest.update(chunk)
+    image_file.seek(0)
+    return f"prediction:{model_version}:{digest.hexdigest()}"
+
+
+class PredictionCache:
+    """
+    Base class for prediction caches. Subclasses implement _get and _set;
+    this class keeps the hit/miss counters.
+    """
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached (label, confidence) for key, or None on a miss."""
+        value = self._get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """Store a (label, confidence) prediction under key."""
+        self._set(key, value)
+
+    def stats(self):
+        """Return hit/miss counters as a JSON-serializable dict."""
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.backend_name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value):
+        raise NotImplementedError
+
+
+class MemoryPredictionCache(PredictionCache):
+    """In-process LRU cache bounded to max_entries predictions."""
+    backend_name = 'memory'
+
+    def __init__(self, max_entries=1024):
+        super().__init__()
+        self.max_entries = max(1, int(max_entries))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DjangoPredictionCache(PredictionCache):
+    """
+    Cache backed by one of Django's configured caches (shared between workers with e.g. Redis).
+    Size bounds and eviction are those of the underlying cache backend.
+    """
+    backend_name = 'django'
+
+    def __init__(self, alias='default', timeout=3600):
+        super().__init__()
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    def _get(self, key):
+        value = self.cache.get(key)
+        return tuple(value) if value is not None else None
+
+    def _set(self, key, value):
+        self.cache.set(key, value, self.timeout)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_prediction_cache():
+    """
+    Return the process-wide prediction cache configured by DETECTION_PREDICTION_CACHE,
+    or None when caching is disabled.
+    """
+    global _cache
+    config = getattr(settings, 'DETECTION_PREDICTION_CACHE', {})
+    backend = config.get('BACKEND', 'memory')
+    if not backend:
+        return None
+    if _cache is None or _cache.backend_name != backend:
+        with _cache_lock:
+            if _cache is None or _cache.backend_name != backend:
+                if backend == 'django':
+                    _cache = DjangoPredictionCache(config.get('ALIAS', 'default'), config.get('TIMEOUT', 3600))
+                elif backend == 'memory':
+                    _cache = MemoryPredictionCache(config.get('MAX_ENTRIES', 1024))
+                else:
+                    raise ValueError(f"Unknown prediction cache backend: {backend}")
+    return _cache
+
+
+def cache_stats():
+    """Return the prediction cache counters, or None when caching is disabled."""
+    cache = get_prediction_cache()
+    return cache.stats() if cache is not None else None
@@ -0,0 +1,75 @@
+# This file turns uploaded leaf images into model input tensors.
+# Large JPEGs are decoded at reduced scale with PIL's draft mode, and pixels are written straight into
+# a preallocated float32 buffer, avoiding the float64 intermediate and the extra batch-dimension copy.
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from .metadata import ModelMetadata
+
+# Thread pool used to decode batch uploads in parallel (PIL releases the GIL while decoding and resizing)
+_decode_pool = None
+
+
+def get_decode_pool():
+    global _decode_pool
+    if _decode_pool is None:
+        _decode_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="detection-decode")
+    return _decode_pool
+
+
+def preprocess_image(image_file, metadata=None, out=None):
+    """
+    Decode an uploaded image into a float32 array of shape (H, W, 3), normalized for the model.
+
+    - metadata: ModelMetadata giving the input size and normalization (defaults to 224x224, /255).
+    - out: optional preallocated float32 buffer of shape (H, W, 3), e.g. one row of a batch.
+    """
+    metadata = metadata or ModelMetadata.default()
+    height, width = metadata.input_size
+    img = Image.open(image_file)
+    # For JPEGs, let the decoder downscale by 1/2, 1/4 or 1/8 while staying >= the target size,
+    # so a 12MP photo is never fully decoded just to be shrunk to the model input size
+    img.draft('RGB', (width, height))
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    if img.size != (width, height):
+        img = img.resize((width, height))
+    if out is None:
+        out = np.empty((height, width, 3), dtype=np.float32)
+    np.multiply(np.asarray(img), np.float32(metadata.scale), out=out)
+    if metadata.offset:
+        out += np.float32(metadata.offset)
+    return out
+
+
+def preprocess_batch(image_files, metadata=None, parallel=True):
+    """
+    Decode several images into one preallocated (N, H, W, 3) float32 batch.
+
+    Returns (batch, errors) where errors[i] is None for images that decoded successfully,
+    or an error message (the corresponding batch row is then left unspecified).
+    """
+    metadata = metadata or ModelMetadata.default()
+    height, width = metadata.input_size
+    batch = np.empty((len(image_files), height, width, 3), dtype=np.float32)
+
+    def decode(index):
+        # Uploads rejected while streaming (upload_handlers.RejectedUpload) carry their error
+        rejection = getattr(image_files[index], 'rejection', None)
+        if rejection:
+            return rejection
+        try:
+            preprocess_image(image_files[index], metadata, out=batch[index])
+            return None
+        except Exception as e:
+            return f"Could not read image: {e}"
+
+    indices = range(len(image_files))
+    if parallel and len(image_files) > 1:
+        errors = list(get_decode_pool().map(decode, indices))
+    else:
+        errors = [decode(index) for index in indices]
+    return batch, errors
@@ -0,0 +1,45 @@
+# This file contains the prediction history filters shared by the dashboard and the query benchmark,
+# written so that the database can answer them from the PredictionHistory indexes: a date becomes a
+# timestamp range instead of a date() of every row, and a disease search becomes an exact match on the
+# known labels containing the text instead of a LIKE '%text%' scan (only records not linked to a
+# Disease row, usually few, are still searched as substrings).
+import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Disease
+
+
+def day_range(day):
+    """Return the aware [start, end) datetimes of a date in the current time zone."""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min), tz)
+    end = timezone.make_aware(datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time.min), tz)
+    return start, end
+
+
+def filter_by_date(queryset, day):
+    """Records made on a date (same rows as timestamp__date=day)."""
+    start, end = day_range(day)
+    return queryset.filter(timestamp__gte=start, timestamp__lt=end)
+
+
+def matching_labels(text, using=None):
+    """Known disease labels containing the text, case-insensitively."""
+    text = text.lower()
+    labels = Disease.objects.db_manager(using).values_list('label', flat=True)
+    return [label for label in labels if text in label.lower()]
+
+
+def filter_by_disease(queryset, text):
+    """
+    Records whose disease contains the text, case-insensitively (as disease__icontains).
+    Known labels are matched exactly. Records without a Disease row (labels of a custom label
+    list or another model version) are searched as substrings, so they are never dropped.
+    """
+    labels = matching_labels(text, using=queryset.db)
+    unlinked = Q(disease_info__isnull=True, disease__icontains=text)
+    if labels:
+        return queryset.filter(Q(disease__in=labels) | unlinked)
+    return queryset.filter(disease__icontains=text)
@@ -1,10 +1,74 @@
 # serializers.py
 from rest_framework import serializers
-from .models import PredictionHistory
+from .derivatives import derivative_url
+from .models import PredictionHistory, PredictionJob, PredictionJobItem
 
 
-class PredictionHistorySerializer(serializers.ModelSerializer):
+def requested_fields(request):
+    """Field names listed in the request's `fields` query parameter (comma-separated), or None."""
+    if request is None or not request.query_params.get('fields'):
+        return None
+    return {name.strip() for name in request.query_params['fields'].split(',') if name.strip()}
+
+
+class SelectableFieldsMixin:
+    """
+    Serializer mixin returning only the fields named by the request's `fields` query parameter,
+    e.g. ?fields=id,disease,confidence leaves out the long text fields.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = requested_fields(self.context.get('request'))
+        if requested is None:
+            return
+        unknown = requested - set(self.fields)
+        if unknown:
+            raise serializers.ValidationError({"fields": [f"Unknown field(s): {', '.join(sorted(unknown))}."]})
+        for name in set(self.fields) - requested:
+            self.fields.pop(name)
+
+
+class PredictionHistorySerializer(SelectableFieldsMixin, serializers.ModelSerializer):
+    # Small versions of the image for lists; the original's URL until they are generated
+    thumbnail_url = serializers.SerializerMethodField()
+    medium_url = serializers.SerializerMethodField()
+    # The advice texts usually live in the shared Disease row rather than on the record
+    remedy = serializers.CharField(source='remedy_text', read_only=True)
+    preventive_measures = serializers.CharField(source='preventive_measures_text', read_only=True)
+
     class Meta:
         model = PredictionHistory
-        fields = ['id', 'image', 'disease', 'confidence', 'remedy', 'timestamp', 'preventive_measures']
+        fields = ['id', 'image', 'thumbnail_url', 'medium_url', 'disease', 'confidence', 'remedy', 'timestamp',
+                  'preventive_measures']
         read_only_fields = ['timestamp']
+
+    def _derivative_url(self, obj, size_name):
+        if not obj.image:
+            return None
+        url = derivative_url(obj.image.name, size_name) or obj.image.url
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def get_thumbnail_url(self, obj):
+        return self._derivative_url(obj, 'thumbnail')
+
+    def get_medium_url(self, obj):
+        return self._derivative_url(obj, 'medium')
+
+
+class PredictionJobItemSerializer(serializers.ModelSerializer):
+    prediction = PredictionHistorySerializer(read_only=True)
+
+    class Meta:
+        model = PredictionJobItem
+        fields = ['index', 'filename', 'status', 'error', 'prediction']
+
+
+class PredictionJobSerializer(serializers.ModelSerializer):
+    results = PredictionJobItemSerializer(source='items', many=True, read_only=True)
+
+    class Meta:
+        model = PredictionJob
+        fields = ['id', 'status', 'total_images', 'processed_images', 'failed_images', 'error',
+                  'created_at', 'finished_at', 'results']
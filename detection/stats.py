@@ -0,0 +1,88 @@
+# This file maintains the DailyDiseaseStat rollup read by the admin dashboard: prediction counts per
+# day, disease and confidence decile. Records saved one by one are counted by signal handlers; records
+# inserted with bulk_create (batch predictions, jobs) do not send signals and are counted explicitly
+# with count_predictions. rebuild_stats recomputes the rollup from the history (the
+# rebuild_disease_stats command), e.g. after rows were changed with queryset.update().
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Value
+from django.db.models.functions import Floor, Least, TruncDate
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import DailyDiseaseStat, PredictionHistory
+from .queries import day_range
+
+BUCKETS = DailyDiseaseStat.CONFIDENCE_BUCKETS
+
+
+def confidence_bucket(confidence):
+    return min(max(int(confidence * BUCKETS), 0), BUCKETS - 1)
+
+
+def _stat_key(record):
+    return timezone.localdate(record.timestamp), record.disease, confidence_bucket(record.confidence)
+
+
+def _add(key, delta):
+    date, disease, bucket = key
+    stats = DailyDiseaseStat.objects.filter(date=date, disease=disease, confidence_bucket=bucket)
+    if stats.update(count=F('count') + delta) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            DailyDiseaseStat.objects.create(date=date, disease=disease, confidence_bucket=bucket, count=delta)
+    except IntegrityError:
+        # Created concurrently by another request
+        stats.update(count=F('count') + delta)
+
+
+def count_predictions(records, sign=1):
+    """Add (or with sign=-1, remove) saved history records to the daily counts."""
+    with transaction.atomic():
+        for key, count in sorted(Counter(_stat_key(record) for record in records).items()):
+            _add(key, sign * count)
+
+
+def daily_counts(history):
+    """Rows of (day, disease, bucket, n) counting a PredictionHistory queryset like the rollup does."""
+    return (history
+            .annotate(day=TruncDate('timestamp'),
+                      bucket=Least(Floor(F('confidence') * Value(float(BUCKETS))), Value(float(BUCKETS - 1))))
+            .values('day', 'disease', 'bucket')
+            .annotate(n=Count('id'))
+            .order_by())
+
+
+def rebuild_stats(since=None):
+    """
+    Recompute the daily counts from the history records, for every day or from the `since` date on.
+    Returns the number of DailyDiseaseStat rows written.
+    """
+    history = PredictionHistory.objects.all()
+    stats = DailyDiseaseStat.objects.all()
+    if since is not None:
+        history = history.filter(timestamp__gte=day_range(since)[0])
+        stats = stats.filter(date__gte=since)
+    rows = daily_counts(history)
+    with transaction.atomic():
+        stats.delete()
+        created = DailyDiseaseStat.objects.bulk_create(
+            (DailyDiseaseStat(date=row['day'], disease=row['disease'], confidence_bucket=int(row['bucket']),
+                              count=row['n']) for row in rows),
+            batch_size=1000,
+        )
+    return len(created)
+
+
+@receiver(post_save, sender=PredictionHistory)
+def count_saved_prediction(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        count_predictions([instance])
+
+
+@receiver(post_delete, sender=PredictionHistory)
+def uncount_deleted_prediction(sender, instance, **kwargs):
+    count_predictions([instance], sign=-1)
@@ -0,0 +1,60 @@
+# This file implements the content-addressed storage used for prediction images.
+# A file is stored under the SHA-256 of its content in a sharded layout (<upload_to>/ab/cd/<sha256>.<ext>),
+# so byte-identical images share one file. The MediaBlob rows counting the references to each file are
+# maintained by detection/blobs.py.
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files.storage import FileSystemStorage
+
+CONTENT_ADDRESSED_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+def content_digest(content):
+    """SHA-256 hex digest of a Django File, read in chunks and rewound afterwards."""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def content_addressed_name(name, digest):
+    """Storage name of content with the given digest, in the directory and with the extension of `name`."""
+    extension = os.path.splitext(name)[1].lower()
+    return posixpath.join(posixpath.dirname(name), digest[:2], digest[2:4], digest + extension)
+
+
+def is_content_addressed(name):
+    return bool(CONTENT_ADDRESSED_NAME.search(name))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names files by the SHA-256 of their content.
+    Saving content that is already stored writes nothing and returns the existing name.
+    """
+
+    def _save(self, name, content):
+        target = content_addressed_name(name, content_digest(content))
+        if self.exists(target):
+            return target
+        saved = super()._save(target, content)
+        if saved != target:
+            # The same content was stored concurrently under the target name; keep that copy
+            self.delete(saved)
+        return target
+
+
+_image_storage = None
+
+
+def image_storage():
+    """Storage of PredictionHistory.image (a callable, so the field does not freeze MEDIA_ROOT in migrations)."""
+    global _image_storage
+    if _image_storage is None:
+        _image_storage = ContentAddressedStorage()
+    return _image_storage
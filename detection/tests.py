@@ -1,19 +1,84 @@
+import datetime
+import importlib
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from multiprocessing import connection
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
-from detection.models import PredictionHistory
-from io import BytesIO
+from detection.batching import MicroBatcher
+from detection import inference_service, model_loader
+from detection.backends import BackendUnavailable, KerasBackend, backend_for_path, compile_predict_fn, load_backend
+from detection.model_loader import ModelRegistry
+from detection.prediction_cache import MemoryPredictionCache
+from detection.preprocessing import preprocess_image, preprocess_batch
+from detection.metadata import ModelMetadata, ModelMetadataError, load_metadata, write_metadata
+from detection.inference import decode_prediction
+from detection.upload_handlers import BufferFile, BufferPool, sniff_image, upload_metrics
+from detection.disease_info import label_list
+from detection.models import DailyDiseaseStat, Disease, MediaBlob, PredictionHistory, PredictionJob, PredictionJobItem
+from detection.queries import filter_by_date, filter_by_disease
+from detection.storage import is_content_addressed
+from detection import derivatives
+from detection.blobs import collect_garbage, release_blobs
+from detection.image_store import write_image
+from detection.jobs import resume_pending_jobs, run_job
+from io import BytesIO, StringIO
 from PIL import Image
+import numpy as np
 
 User = get_user_model()
 
+# Uploaded images written during tests go to a throwaway media root
+TEST_MEDIA_ROOT = tempfile.mkdtemp()
 
+
+def tearDownModule():
+    shutil.rmtree(TEST_MEDIA_ROOT, ignore_errors=True)
+
+
+def make_test_model(input_size=(16, 16), outputs=len(label_list)):
+    """
+    Build a small untrained Keras model with the same input/output layout as the real one.
+    """
+    import tensorflow as tf
+    return tf.keras.Sequential([
+        tf.keras.Input(shape=input_size + (3,)),
+        tf.keras.layers.Conv2D(4, 3),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(outputs, activation='softmax'),
+    ])
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
 class DetectionTests(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_model = make_test_model()
+
     def setUp(self):
         """
         Set up a user and authenticate them for protected endpoints.
         """
+        # Serve predictions from a small in-memory model instead of the trained .h5 file
+        registry = ModelRegistry(active_file=os.path.join(TEST_MEDIA_ROOT, 'active_model.txt'),
+                                 default_path='test_model.h5',
+                                 loader=lambda path: KerasBackend(path, model=self.test_model))
+        patcher = mock.patch.object(model_loader, '_registry', registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
         self.user = User.objects.create_user(
             username='leafuser',
             email='leaf@example.com',
@@ -68,7 +133,40 @@ class DetectionTests(APITestCase):
         )
         response = self.client.get(self.history_list_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertGreaterEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['disease'], 'Tomato___Late_blight')
+
+    def test_history_list_pages_by_cursor_with_selected_fields(self):
+        """
+        The history list should page with cursors on (timestamp, id) without skipping or repeating rows,
+        return only the requested fields, and answer an unchanged page with 304.
+        """
+        records = PredictionHistory.objects.bulk_create([
+            PredictionHistory(user=self.user, disease=f'd{i}', confidence=0.5, remedy='r' * 1000) for i in range(7)
+        ])
+        # Equal timestamps for some rows, so the id decides their order
+        PredictionHistory.objects.filter(pk__in=[r.pk for r in records[2:5]]).update(timestamp=records[2].timestamp)
+
+        seen = []
+        url = self.history_list_url + '?page_size=3&fields=id,disease'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            for entry in response.data['results']:
+                self.assertEqual(set(entry), {'id', 'disease'})
+            seen += [entry['id'] for entry in response.data['results']]
+            url = response.data['next']
+        expected = PredictionHistory.objects.order_by('-timestamp', '-id').values_list('id', flat=True)
+        self.assertEqual(seen, list(expected))
+
+        response = self.client.get(self.history_list_url, {'fields': 'id'})
+        self.assertEqual(self.client.get(self.history_list_url, {'fields': 'id'},
+                                         HTTP_IF_NONE_MATCH=response['ETag']).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.client.get(self.history_list_url, {'fields': 'nope'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.history_list_url, {'cursor': 'garbage'}).status_code,
+                         status.HTTP_404_NOT_FOUND)
 
     def test_history_detail(self):
         """
@@ -130,3 +228,908 @@ class DetectionTests(APITestCase):
             'password': 'wrongpassword'
         }, format='json')
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_inference_metrics_admin_only(self):
+        """
+        Inference metrics should be forbidden for regular users and visible to admins.
+        """
+        url = reverse('inference-metrics')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('batching', response.data)
+
+    def test_health_reports_loading_until_preload_finishes(self):
+        """
+        Health should return 503 while a preloaded model is not warm yet, and 200 once it is.
+        """
+        url = reverse('health')
+        with override_settings(DETECTION_PRELOAD_MODEL=True):
+            with mock.patch.object(model_loader, '_ready', False):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            with mock.patch.object(model_loader, '_ready', True):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertTrue(response.data['model_ready'])
+
+    def test_health_reports_a_worker_whose_warm_up_failed(self):
+        """
+        Under gunicorn (per-worker warm-up, no preload), health should return 503 until the warm-up succeeded.
+        """
+        url = reverse('health')
+        with override_settings(DETECTION_PRELOAD_MODEL=False, DETECTION_WORKER_WARMUP=True):
+            with mock.patch.object(model_loader, '_ready', False):
+                self.assertEqual(self.client.get(url).status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            with mock.patch.object(model_loader, '_ready', True):
+                self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    @override_settings(DETECTION_PREDICTION_CACHE={'BACKEND': 'memory', 'MAX_ENTRIES': 16})
+    def test_repeated_upload_is_served_from_cache(self):
+        """
+        Re-uploading the same image should skip inference but still record history.
+        """
+        probs = np.zeros(len(label_list), dtype=np.float32)
+        probs[3] = 0.9
+        with mock.patch('detection.views.active_model_version', return_value='test@1'), \
+                mock.patch('detection.views.get_prediction_cache', return_value=MemoryPredictionCache(16)), \
+                mock.patch('detection.views.predict_batched', return_value=probs) as predict:
+            image_bytes = self.generate_test_image().getvalue()
+            for _ in range(2):
+                upload = BytesIO(image_bytes)
+                upload.name = 'leaf.jpg'
+                response = self.client.post(self.predict_url, {'image': upload}, format='multipart')
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.data['disease'], label_list[3])
+        self.assertEqual(predict.call_count, 1)
+        self.assertEqual(PredictionHistory.objects.filter(user=self.user).count(), 2)
+
+    def test_batch_predict_reports_per_image_results(self):
+        """
+        Batch prediction should score every valid image and report errors for invalid ones.
+        """
+        probs = np.zeros(len(label_list), dtype=np.float32)
+        probs[5] = 0.8
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zf:
+            zf.writestr('leaf_in_zip.jpg', self.generate_test_image().getvalue())
+        archive.name = 'leaves.zip'
+        archive.seek(0)
+        bad = BytesIO(b'not an image')
+        bad.name = 'bad.jpg'
+
+        with mock.patch('detection.views.predict_many', side_effect=lambda arrays: [probs] * len(arrays)):
+            response = self.client.post(reverse('predict-batch'), {
+                'images': [self.generate_test_image(), bad],
+                'archive': archive,
+            }, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(response.data['succeeded'], 2)
+        self.assertIn('error', response.data['results'][1])
+        self.assertEqual(response.data['results'][2]['disease'], label_list[5])
+        self.assertEqual(PredictionHistory.objects.filter(user=self.user).count(), 2)
+
+    @override_settings(DETECTION_JOBS_EAGER=True)
+    def test_prediction_job_reports_results(self):
+        """
+        Submitting a job should return a job id, and the status endpoint should report per-image results.
+        """
+        probs = np.zeros(len(label_list), dtype=np.float32)
+        probs[7] = 0.7
+        with mock.patch('detection.jobs.predict_many', side_effect=lambda arrays: [probs] * len(arrays)):
+            response = self.client.post(reverse('prediction-job-create'), {
+                'images': [self.generate_test_image(), self.generate_test_image()],
+            }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        response = self.client.get(reverse('prediction-job-detail', kwargs={'job_id': response.data['job_id']}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual(response.data['processed_images'], 2)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(response.data['results'][0]['prediction']['disease'], label_list[7])
+        self.assertEqual(PredictionHistory.objects.filter(user=self.user).count(), 2)
+
+    @override_settings(DETECTION_JOBS_EAGER=True, DETECTION_IMAGE_WRITER_EAGER=True)
+    def test_prediction_job_images_follow_the_storage_policy(self):
+        """
+        Job images should be stored like the prediction endpoints' images (DETECTION_IMAGE_STORAGE).
+        """
+        probs = np.zeros(len(label_list), dtype=np.float32)
+        probs[7] = 0.7
+        with mock.patch('detection.jobs.predict_many', side_effect=lambda arrays: [probs] * len(arrays)):
+            self.client.post(reverse('prediction-job-create'), {'images': [self.generate_test_image()]},
+                             format='multipart')
+            with override_settings(DETECTION_IMAGE_STORAGE='none'):
+                self.client.post(reverse('prediction-job-create'), {'images': [self.generate_test_image()]},
+                                 format='multipart')
+        thumbnail, none = PredictionHistory.objects.order_by('pk')
+        self.assertTrue(is_content_addressed(thumbnail.image.name))
+        self.assertTrue(thumbnail.image.name.endswith('.webp'))
+        self.assertEqual(none.image.name, '')
+
+    @override_settings(DETECTION_JOBS_EAGER=True, DETECTION_IMAGE_WRITER_EAGER=True)
+    def test_job_uploads_are_shared_blobs_and_deleted_once_processed(self):
+        """
+        Identical job images should share one counted blob with the other predictions, and the job uploads
+        should be deleted once processed, or with a job that was never run.
+        """
+        self.client.post(self.predict_url, {'image': self.generate_test_image()}, format='multipart')
+        job_uploads = os.path.join(TEST_MEDIA_ROOT, 'job_uploads')
+        before = set(os.listdir(job_uploads)) if os.path.isdir(job_uploads) else set()
+        probs = np.zeros(len(label_list), dtype=np.float32)
+        probs[7] = 0.7
+        with mock.patch('detection.jobs.predict_many', side_effect=lambda arrays: [probs] * len(arrays)), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('prediction-job-create'), {
+                'images': [self.generate_test_image(), self.generate_test_image()],
+            }, format='multipart')
+        names = set(PredictionHistory.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(MediaBlob.objects.get(name=names.pop()).refcount, 3)
+        self.assertFalse(PredictionJobItem.objects.exclude(image='').exists())
+        self.assertEqual(set(os.listdir(job_uploads)), before)
+
+        pending = PredictionJob.objects.create(user=self.user, total_images=1)
+        item = PredictionJobItem.objects.create(job=pending, index=0, filename='leaf.png',
+                                                image=SimpleUploadedFile('leaf.png', b'leaf bytes'))
+        path = item.image.path
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_concurrent_runners_do_not_process_a_job_twice(self):
+        """
+        A second runner should not start a job another runner holds, and should take it over once the
+        first runner's lease has expired; the first runner then discards the chunk it was classifying.
+        """
+        response = self.client.post(reverse('prediction-job-create'), {
+            'images': [self.generate_test_image(), self.generate_test_image()],
+        }, format='multipart')
+        job_id = response.data['job_id']
+        probs = np.zeros(len(label_list), dtype=np.float32)
+        probs[7] = 0.7
+        second_runner = []
+
+        def predict(arrays):
+            if not second_runner:
+                # The first runner is classifying its chunk and holds the job
+                second_runner.append(run_job(job_id))
+                self.assertEqual(resume_pending_jobs(), 0)
+                # It stalls past its lease, so the next runner takes the job over
+                PredictionJob.objects.filter(pk=job_id).update(
+                    heartbeat_at=timezone.now() - datetime.timedelta(hours=1))
+                second_runner.append(run_job(job_id))
+            return [probs] * len(arrays)
+
+        with mock.patch('detection.jobs.predict_many', side_effect=predict), \
+                self.assertLogs('detection.jobs', 'WARNING'):
+            self.assertTrue(run_job(job_id))
+        self.assertEqual(second_runner, [False, True])
+        job = PredictionJob.objects.get(pk=job_id)
+        self.assertEqual(job.status, PredictionJob.STATUS_COMPLETED)
+        self.assertEqual((job.processed_images, job.failed_images), (2, 0))
+        self.assertEqual(PredictionHistory.objects.filter(user=self.user).count(), 2)
+        self.assertFalse(run_job(job_id))
+
+    def test_reused_blob_is_not_collected_and_collected_blob_is_stored_again(self):
+        """
+        Reusing a stored upload should take its reference before garbage collection can delete it,
+        and an upload whose blob was collected should be stored again.
+        """
+        data = self.generate_test_image().getvalue()
+        name = write_image(data, 'original')
+        release_blobs([name])
+        # The reference is taken under the row lock, so the pending collection keeps the file
+        self.assertEqual(write_image(data, 'original'), name)
+        self.assertEqual(collect_garbage([name]), 0)
+        self.assertTrue(os.path.exists(os.path.join(TEST_MEDIA_ROOT, name)))
+
+        release_blobs([name])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(collect_garbage([name]), 1)
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+        self.assertFalse(os.path.exists(os.path.join(TEST_MEDIA_ROOT, name)))
+        self.assertEqual(write_image(data, 'original'), name)
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 1)
+        self.assertTrue(os.path.exists(os.path.join(TEST_MEDIA_ROOT, name)))
+
+    def test_prediction_job_is_private(self):
+        """
+        Users should not see other users' jobs.
+        """
+        other = User.objects.create_user(username='other', password='otherpass123')
+        job = PredictionJob.objects.create(user=other, total_images=0)
+        response = self.client.get(reverse('prediction-job-detail', kwargs={'job_id': job.pk}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_images_are_stored_after_the_response_and_deduplicated(self):
+        """
+        The record should be saved without its image, which the background writer stores after commit,
+        re-encoded to the bounded size; identical uploads share one file.
+        """
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(self.predict_url, {'image': self.generate_test_image()}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        record = PredictionHistory.objects.get(user=self.user)
+        self.assertFalse(record.image)
+        with mock.patch('detection.image_store._get_writer_pool') as pool:
+            pool.return_value.submit.side_effect = lambda fn, *args: fn(*args)
+            for callback in callbacks:
+                callback()
+        record.refresh_from_db()
+        self.assertTrue(record.image.name.endswith('.webp'))
+        with Image.open(record.image) as stored:
+            self.assertEqual((stored.format, stored.size), ('WEBP', (224, 224)))
+
+        with override_settings(DETECTION_IMAGE_WRITER_EAGER=True, DETECTION_IMAGE_MAX_DIMENSION=64):
+            for _ in range(2):
+                self.client.post(self.predict_url, {'image': self.generate_test_image()}, format='multipart')
+            with override_settings(DETECTION_IMAGE_STORAGE='original'):
+                self.client.post(self.predict_url, {'image': self.generate_test_image()}, format='multipart')
+            with override_settings(DETECTION_IMAGE_STORAGE='none'):
+                self.client.post(self.predict_url, {'image': self.generate_test_image()}, format='multipart')
+        names = list(PredictionHistory.objects.order_by('pk').values_list('image', flat=True))[1:]
+        self.assertEqual(names[0], names[1])
+        with Image.open(os.path.join(TEST_MEDIA_ROOT, names[0])) as stored:
+            self.assertEqual(stored.size, (64, 64))
+        with open(os.path.join(TEST_MEDIA_ROOT, names[2]), 'rb') as stored:
+            self.assertEqual(stored.read(), self.generate_test_image().getvalue())
+        self.assertEqual(names[3], '')
+
+    def test_shared_image_is_deleted_with_its_last_record(self):
+        """
+        Identical uploads should share one content-addressed file, which is deleted only when
+        the last record referencing it is deleted.
+        """
+        with override_settings(DETECTION_IMAGE_WRITER_EAGER=True):
+            for _ in range(3):
+                self.client.post(self.predict_url, {'image': self.generate_test_image()}, format='multipart')
+        first, second, third = PredictionHistory.objects.order_by('pk')
+        name = first.image.name
+        self.assertTrue(is_content_addressed(name))
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(reverse('history-delete', kwargs={'id': first.id}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 2)
+        self.assertTrue(first.image.storage.exists(name))
+
+        thumbnail = os.path.join(TEST_MEDIA_ROOT, derivatives.derivative_name(name, 'thumbnail'))
+        self.assertTrue(os.path.exists(thumbnail))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(self.clear_history_url, {'password': 'leafpass123'}, format='json')
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertFalse(first.image.storage.exists(name))
+        self.assertFalse(os.path.exists(thumbnail))
+
+    def test_history_exposes_thumbnail_and_medium_urls(self):
+        """
+        New images should get their derivatives when stored; older images fall back to the original URL
+        until the lazily scheduled (or backfilled) derivatives exist.
+        """
+        photo = BytesIO()
+        Image.new('RGB', (1000, 800), color='green').save(photo, 'jpeg')
+        photo.name = 'photo.jpg'
+        photo.seek(0)
+        with override_settings(DETECTION_IMAGE_WRITER_EAGER=True):
+            self.client.post(self.predict_url, {'image': photo}, format='multipart')
+        entry = self.client.get(self.history_list_url).data['results'][0]
+        self.assertIn('/derivatives/thumbnail/', entry['thumbnail_url'])
+        for size_name, size in (('thumbnail', (256, 205)), ('medium', (800, 640))):
+            stored = derivatives.derivative_name(PredictionHistory.objects.get().image.name, size_name)
+            with Image.open(os.path.join(TEST_MEDIA_ROOT, stored)) as img:
+                self.assertEqual(img.size, size)
+
+        legacy_name = 'predicted_images/legacy_leaf.jpg'
+        with open(os.path.join(TEST_MEDIA_ROOT, legacy_name), 'wb') as f:
+            f.write(self.generate_test_image().getvalue())
+        legacy = PredictionHistory.objects.create(user=self.user, image=legacy_name, disease='x', confidence=0.5,
+                                                  remedy='')
+        url = reverse('history-detail', kwargs={'id': legacy.id})
+        with mock.patch.object(derivatives, 'schedule_derivatives') as schedule:
+            self.assertTrue(self.client.get(url).data['thumbnail_url'].endswith(legacy_name))
+        schedule.assert_called_with(legacy_name)
+
+        call_command('generate_image_derivatives', workers=2, stdout=StringIO())
+        self.assertIn('/derivatives/medium/', self.client.get(url).data['medium_url'])
+
+    def test_convert_media_to_cas_merges_existing_duplicates(self):
+        """
+        Legacy per-upload files should be renamed in place to their content address, with duplicates merged.
+        Uploads of processed job items are taken over by the records sharing them, or deleted.
+        """
+        storage = PredictionHistory._meta.get_field('image').storage
+        job = PredictionJob.objects.create(user=self.user, total_images=2)
+        names = []
+        for filename in ('predicted_images/legacy_a.jpg', 'predicted_images/legacy_b.jpg',
+                         'job_uploads/legacy_c.jpg', 'job_uploads/failed.jpg'):
+            path = os.path.join(TEST_MEDIA_ROOT, filename)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(self.generate_test_image().getvalue())
+            names.append(filename)
+            if filename.startswith('job_uploads/'):
+                PredictionJobItem.objects.create(job=job, index=len(names), image=filename, filename=filename,
+                                                 status=PredictionJobItem.STATUS_DONE)
+            if filename != 'job_uploads/failed.jpg':
+                PredictionHistory.objects.create(user=self.user, image=filename, disease='x', confidence=0.5,
+                                                 remedy='')
+
+        call_command('convert_media_to_cas', stdout=StringIO())
+
+        converted = set(PredictionHistory.objects.values_list('image', flat=True))
+        self.assertEqual(len(converted), 1)
+        name = converted.pop()
+        self.assertTrue(is_content_addressed(name) and storage.exists(name))
+        self.assertFalse(any(storage.exists(legacy) for legacy in names))
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 3)
+        self.assertFalse(job.items.exclude(image='').exists())
+
+    def test_predictions_reference_their_disease_row(self):
+        """
+        New records should point at the shared Disease row instead of copying its texts, with the same JSON.
+        """
+        response = self.client.post(self.predict_url, {'image': self.generate_test_image()}, format='multipart')
+        record = PredictionHistory.objects.get(user=self.user)
+        self.assertEqual(record.disease_info.label, response.data['disease'])
+        self.assertIsNone(record.remedy)
+
+        detail = self.client.get(reverse('history-detail', args=[record.id]))
+        self.assertEqual(detail.data['remedy'], response.data['remedy'])
+        self.assertEqual(detail.data['preventive_measures'], response.data['preventive_measure'])
+
+    def test_history_migration_links_matching_rows_in_batches(self):
+        """
+        The data migration should link rows whose copied texts match their disease, and keep the others.
+        """
+        migration = importlib.import_module('detection.migrations.0007_link_history_diseases')
+        disease = Disease.objects.get(label='Tomato___Late_blight')
+        copied = PredictionHistory.objects.create(
+            user=self.user, disease=disease.label, confidence=0.9,
+            remedy=disease.remedy, preventive_measures=disease.preventive_measures,
+        )
+        edited = PredictionHistory.objects.create(
+            user=self.user, disease=disease.label, confidence=0.8, remedy='Custom advice', preventive_measures='',
+        )
+
+        self.assertEqual(migration.link_history(PredictionHistory, Disease, batch_size=1), 1)
+        copied.refresh_from_db()
+        edited.refresh_from_db()
+        self.assertEqual((copied.disease_info_id, copied.remedy), (disease.id, None))
+        self.assertEqual(copied.remedy_text, disease.remedy)
+        self.assertEqual((edited.disease_info_id, edited.remedy_text), (None, 'Custom advice'))
+        # Already linked rows are not visited again
+        self.assertEqual(migration.link_history(PredictionHistory, Disease), 0)
+
+        out = StringIO()
+        call_command('history_table_report', stdout=out)
+        self.assertIn('Prediction records: 2 (1 linked to a Disease row)', out.getvalue())
+
+    def test_dashboard_filters_match_the_previous_lookups(self):
+        """
+        The index-friendly date and disease filters should select the same rows as __date / __icontains.
+        """
+        for disease in ('Tomato___Late_blight', 'Corn_(maize)___Common_rust_', 'Apple___healthy', 'Banana___wilt'):
+            PredictionHistory.objects.create(user=self.user, disease=disease, confidence=0.5,
+                                             disease_info=Disease.objects.filter(label=disease).first())
+        # A label of a custom label list, with no Disease row, that contains known labels' text
+        PredictionHistory.objects.create(user=self.user, disease='Tomato___Custom_blight', confidence=0.5)
+        PredictionHistory.objects.filter(disease='Apple___healthy').update(
+            timestamp=timezone.now() - datetime.timedelta(days=2))
+        history = PredictionHistory.objects.all()
+        today = timezone.localdate()
+
+        # 'wilt' is no known label: searched as a substring
+        for text in ('BLIGHT', 'rust', 'healthy', 'wilt', 'tomato'):
+            self.assertEqual(set(filter_by_disease(history, text)), set(history.filter(disease__icontains=text)))
+        self.assertIn('Tomato___Custom_blight', filter_by_disease(history, 'blight').values_list('disease', flat=True))
+        self.assertEqual(set(filter_by_date(history, today)), set(history.filter(timestamp__date=today)))
+        self.assertEqual(filter_by_date(history, today).count(), 4)
+
+    def test_daily_disease_stats_follow_inserts_and_deletes(self):
+        """
+        The rollup should count saved, bulk-created and deleted records like a rebuild from the history does.
+        """
+        def stats():
+            return set(DailyDiseaseStat.objects.filter(count__gt=0)
+                       .values_list('date', 'disease', 'confidence_bucket', 'count'))
+
+        record = PredictionHistory.objects.create(user=self.user, disease='Tomato___Late_blight', confidence=0.95)
+        PredictionHistory.objects.create(user=self.user, disease='Tomato___Late_blight', confidence=1.0)
+        PredictionHistory.objects.create(user=self.user, disease='Apple___healthy', confidence=0.42)
+        response = self.client.post(reverse('predict-batch'), {
+            'images': [self.generate_test_image(), self.generate_test_image()],
+        }, format='multipart')
+        self.assertEqual(response.data['succeeded'], 2)
+        record.delete()
+
+        today = timezone.localdate()
+        incremental = stats()
+        self.assertIn((today, 'Tomato___Late_blight', 9, 1), incremental)
+        self.assertIn((today, 'Apple___healthy', 4, 1), incremental)
+        self.assertEqual(sum(row[3] for row in incremental), PredictionHistory.objects.count())
+
+        call_command('rebuild_disease_stats', stdout=StringIO())
+        self.assertEqual(stats(), incremental)
+
+    def test_bad_uploads_are_rejected_while_streaming(self):
+        """
+        Oversized, non-image and too-large-dimension uploads should be rejected from their first bytes,
+        without decoding them, and counted in the upload metrics.
+        """
+        before = upload_metrics()
+        not_image = BytesIO(b'%PDF-1.7 definitely not a leaf' * 100)
+        not_image.name = 'leaf.jpg'
+        with mock.patch('detection.views.preprocess_image') as preprocess:
+            with override_settings(DETECTION_UPLOAD_MAX_BYTES=512):
+                response = self.client.post(self.predict_url, {'image': self.generate_test_image()}, format='multipart')
+            self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+            response = self.client.post(self.predict_url, {'image': not_image}, format='multipart')
+            self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+            self.assertIn('Unsupported image format', response.data['error'])
+
+            with override_settings(DETECTION_UPLOAD_MAX_PIXELS=100 * 100):
+                response = self.client.post(self.predict_url, {'image': self.generate_test_image()}, format='multipart')
+            self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            self.assertIn('224x224', response.data['error'])
+        preprocess.assert_not_called()
+        self.assertFalse(PredictionHistory.objects.exists())
+
+        after = upload_metrics()
+        self.assertEqual(after['rejected'] - before['rejected'], 3)
+        self.assertGreaterEqual(after['rejected_bytes'] - before['rejected_bytes'], len(not_image.getvalue()))
+
+    def test_async_predict_matches_sync_endpoint(self):
+        """
+        The async endpoint should authenticate with the JWT, predict and save the record like predict/.
+        """
+        url = reverse('predict-async')
+        response = self.client.post(url, {'image': self.generate_test_image()}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(response.json()['disease'], label_list)
+        self.assertEqual(PredictionHistory.objects.filter(user=self.user).count(), 1)
+
+        sync_response = self.client.post(self.predict_url, {'image': self.generate_test_image()}, format='multipart')
+        self.assertEqual(response.json(), sync_response.data)
+
+        self.client.credentials()
+        response = self.client.post(url, {'image': self.generate_test_image()}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_async_batch_predict_reports_per_image_results(self):
+        """
+        The async batch endpoint should return per-image results and bulk-insert the records.
+        """
+        images = [self.generate_test_image(), BytesIO(b'not an image')]
+        images[1].name = 'broken.jpg'
+        response = self.client.post(reverse('predict-batch-async'), {'images': images}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual((data['succeeded'], data['failed']), (1, 1))
+        self.assertTrue(PredictionHistory.objects.filter(pk=data['results'][0]['id']).exists())
+
+    def start_inference_service(self):
+        """Serve one inference connection from a thread, backed by the test registry."""
+        socket_path = os.path.join(TEST_MEDIA_ROOT, 'inference.sock')
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        listener = connection.Listener(socket_path, family='AF_UNIX', authkey=inference_service.get_authkey())
+        self.addCleanup(listener.close)
+        threading.Thread(target=lambda: inference_service.handle_connection(
+            listener.accept(), inference_service.make_batcher()), daemon=True).start()
+        return socket_path
+
+    def test_predict_through_inference_service(self):
+        """
+        In remote mode the view should get its prediction from the inference service.
+        """
+        socket_path = self.start_inference_service()
+        with override_settings(DETECTION_INFERENCE_MODE='remote', DETECTION_INFERENCE_SOCKET=socket_path,
+                               DETECTION_BATCHING_ENABLED=False, DETECTION_PREDICTION_CACHE={'BACKEND': None}):
+            self.addCleanup(lambda: inference_service._local.client.close())
+            with mock.patch.object(inference_service.InferenceClient, 'predict', autospec=True,
+                                   side_effect=inference_service.InferenceClient.predict) as remote_predict:
+                response = self.client.post(self.predict_url, {'image': self.generate_test_image()},
+                                            format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertIn(response.data['disease'], label_list)
+        remote_predict.assert_called_once()
+
+    def test_inference_client_passes_tensors_through_shared_memory(self):
+        """
+        The client should return the same probabilities as the local model, growing its segment as needed.
+        """
+        client = inference_service.InferenceClient(address=self.start_inference_service())
+        self.addCleanup(client.close)
+        for size in (1, 5):
+            batch = np.random.rand(size, 16, 16, 3).astype(np.float32)
+            np.testing.assert_allclose(client.predict(batch), self.test_model.predict(batch, verbose=0),
+                                       rtol=1e-5, atol=1e-6)
+        self.assertGreaterEqual(client._segment.size, 5 * 16 * 16 * 3 * 4)
+
+
+class MicroBatcherTests(SimpleTestCase):
+    def test_concurrent_requests_share_a_batch(self):
+        """
+        Requests submitted within the window should run as one batch and get their own rows back.
+        """
+        seen_batches = []
+
+        def predict_fn(batch):
+            seen_batches.append(len(batch))
+            # Echo each image's first pixel so results can be matched to requests
+            return batch[:, 0, 0, :]
+
+        batcher = MicroBatcher(predict_fn, max_batch_size=8, window_ms=200)
+        results = {}
+
+        def worker(i):
+            results[i] = batcher.predict(np.full((4, 4, 3), i, dtype=np.float32), timeout=5)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(sum(seen_batches), 8)
+        self.assertLess(len(seen_batches), 8)
+        for i in range(8):
+            self.assertEqual(results[i][0], i)
+        metrics = batcher.metrics.snapshot()
+        self.assertEqual(metrics['total_requests'], 8)
+        self.assertGreater(metrics['max_batch_size'], 1)
+
+    def test_errors_are_propagated_to_waiting_requests(self):
+        """
+        A failing forward pass should raise in every request of the batch.
+        """
+        def predict_fn(batch):
+            raise RuntimeError("model failure")
+
+        batcher = MicroBatcher(predict_fn, max_batch_size=4, window_ms=1)
+        with self.assertRaises(RuntimeError):
+            batcher.predict(np.zeros((4, 4, 3), dtype=np.float32), timeout=5)
+
+
+class CompiledPredictTests(SimpleTestCase):
+    def test_compiled_fn_matches_keras_predict(self):
+        """
+        The traced tf.function should produce the same output as model.predict().
+        """
+        import tensorflow as tf
+        model = tf.keras.Sequential([
+            tf.keras.Input(shape=(8, 8, 3)),
+            tf.keras.layers.Conv2D(2, 3),
+            tf.keras.layers.Flatten(),
+            tf.keras.layers.Dense(4, activation='softmax'),
+        ])
+        batch = np.random.rand(3, 8, 8, 3).astype(np.float32)
+        serve = compile_predict_fn(model)
+        np.testing.assert_allclose(serve(batch).numpy(), model.predict(batch, verbose=0), rtol=1e-5, atol=1e-6)
+
+
+class ModelRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.models_dir = self.tmp.name
+        self.active_file = os.path.join(self.models_dir, 'active_model.txt')
+        for name in ('a.h5', 'b.h5'):
+            open(os.path.join(self.models_dir, name), 'wb').close()
+        self.loads = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def loader(self, path):
+        self.loads.append(os.path.basename(path))
+        return KerasBackend(path, model=make_test_model(input_size=(4, 4)))
+
+    def make_registry(self):
+        return ModelRegistry(active_file=self.active_file, models_dir=self.models_dir,
+                             default_path=os.path.join(self.models_dir, 'a.h5'),
+                             check_interval=0, loader=self.loader)
+
+    def set_active(self, name):
+        with open(self.active_file, 'w') as f:
+            f.write(name)
+        # Make sure the marker's mtime changes even on coarse filesystem clocks
+        stamp = os.path.getmtime(self.active_file) + len(self.loads) + 1
+        os.utime(self.active_file, (stamp, stamp))
+
+    def test_concurrent_first_requests_load_once(self):
+        """
+        Concurrent first requests should wait for a single load of the active model.
+        """
+        registry = self.make_registry()
+        threads = [threading.Thread(target=registry.active) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.loads, ['a.h5'])
+
+    def test_hot_swap_releases_old_model_after_in_flight_request(self):
+        """
+        Swapping the active model should keep in-flight leases valid and release the old model afterwards.
+        """
+        self.set_active('a.h5')
+        registry = self.make_registry()
+        with registry.lease() as old:
+            self.set_active('b.h5')
+            self.assertEqual(registry.active().name, 'b.h5')
+            # The old model is still usable by the in-flight request
+            self.assertIsNotNone(old.backend)
+            old.predict(np.zeros((1, 4, 4, 3), dtype=np.float32))
+        self.assertIsNone(old.backend)
+        self.assertEqual([m['name'] for m in registry.describe()['loaded']], ['b.h5'])
+
+    def test_swapping_back_to_a_model_with_in_flight_requests_keeps_it_loaded(self):
+        """
+        Swapping A -> B -> A while a request still holds A should leave A active and loaded after the lease ends.
+        """
+        self.set_active('a.h5')
+        registry = self.make_registry()
+        with registry.lease() as old:
+            self.set_active('b.h5')
+            self.assertEqual(registry.active().name, 'b.h5')
+            self.set_active('a.h5')
+            self.assertIs(registry.active(), old)
+        self.assertIsNotNone(old.backend)
+        with registry.lease() as entry:
+            self.assertIs(entry, old)
+            entry.predict(np.zeros((1, 4, 4, 3), dtype=np.float32))
+        self.assertEqual(self.loads, ['a.h5', 'b.h5'])
+
+
+class PredictionCacheTests(SimpleTestCase):
+    def test_memory_cache_evicts_least_recently_used(self):
+        """
+        The in-memory cache should stay within its bound, evicting the least recently used entry.
+        """
+        cache = MemoryPredictionCache(max_entries=2)
+        cache.set('a', ('A', 0.9))
+        cache.set('b', ('B', 0.8))
+        cache.get('a')
+        cache.set('c', ('C', 0.7))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), ('A', 0.9))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats()['hits'], 2)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+
+class PreprocessingTests(SimpleTestCase):
+    def make_jpeg(self, size, color=(30, 140, 60)):
+        file = BytesIO()
+        Image.new('RGB', size, color=color).save(file, 'jpeg')
+        file.seek(0)
+        return file
+
+    def test_large_jpeg_is_decoded_into_float32_buffer(self):
+        """
+        A large photo should be reduced to the target size as float32 values in [0, 1], written into the given buffer.
+        """
+        out = np.empty((32, 32, 3), dtype=np.float32)
+        result = preprocess_image(self.make_jpeg((1600, 1200)), ModelMetadata((32, 32, 3), label_list), out=out)
+        self.assertIs(result, out)
+        self.assertEqual(result.dtype, np.float32)
+        np.testing.assert_allclose(result[16, 16], np.array([30, 140, 60]) / 255.0, atol=0.03)
+
+    def test_batch_reports_per_image_errors(self):
+        """
+        Undecodable files should produce an error entry without affecting the other rows.
+        """
+        files = [self.make_jpeg((64, 64)), BytesIO(b'not an image'), self.make_jpeg((64, 48))]
+        batch, errors = preprocess_batch(files, ModelMetadata((16, 16, 3), label_list))
+        self.assertEqual(batch.shape, (3, 16, 16, 3))
+        self.assertIsNone(errors[0])
+        self.assertIsNotNone(errors[1])
+        self.assertIsNone(errors[2])
+
+
+class UploadHandlerTests(SimpleTestCase):
+    def test_format_and_dimensions_are_sniffed_from_the_header(self):
+        """
+        The format and size should be read from the first bytes of JPEG (with EXIF), PNG and WebP files.
+        """
+        exif = Image.Exif()
+        exif[0x010E] = 'x' * 5000
+        cases = [('jpeg', {'exif': exif}), ('png', {}), ('webp', {}), ('webp', {'lossless': True})]
+        for fmt, options in cases:
+            file = BytesIO()
+            Image.new('RGB', (640, 480), color='green').save(file, fmt, **options)
+            with self.subTest(fmt=fmt, **options):
+                self.assertEqual(sniff_image(file.getvalue()[:16 * 1024]), (fmt, (640, 480)))
+        self.assertEqual(sniff_image(b'<html>not an image</html>'), (None, None))
+
+    def test_buffers_are_returned_to_the_pool_when_the_upload_is_closed(self):
+        """
+        An accepted upload reads from a pooled buffer, which is reused once Django closes the file.
+        """
+        pool = BufferPool(max_buffers=1)
+        buffer = pool.acquire()
+        buffer[:] = b'leaf bytes and some stale data'
+        file = BufferFile(buffer, 10, pool)
+        self.assertEqual(file.read(4), b'leaf')
+        file.seek(0)
+        self.assertEqual(file.read(), b'leaf bytes')
+        file.close()
+        self.assertIs(pool.acquire(), buffer)
+
+    def test_buffers_over_the_size_cap_are_not_pooled(self):
+        """
+        A buffer grown past the pool's size cap (an archive upload) should be freed, not kept idle.
+        """
+        pool = BufferPool(max_buffers=2, max_buffer_bytes=16)
+        small, large = pool.acquire(), pool.acquire()
+        small[:] = b'x' * 16
+        large[:] = b'x' * 17
+        pool.release(large)
+        pool.release(small)
+        self.assertIs(pool.acquire(), small)
+        self.assertIsNot(pool.acquire(), large)
+
+
+class ModelMetadataTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.model_file = os.path.join(self.tmp.name, 'model.h5')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_sidecar_drives_input_size_and_normalization(self):
+        """
+        A valid sidecar should be loaded and used for preprocessing.
+        """
+        model = make_test_model(input_size=(12, 12))
+        write_metadata(self.model_file, ModelMetadata((12, 12, 3), label_list, scale=1.0, offset=-1.0))
+        metadata = load_metadata(self.model_file, model)
+        self.assertEqual(metadata.input_size, (12, 12))
+
+        image = BytesIO()
+        Image.new('RGB', (40, 40), color=(10, 10, 10)).save(image, 'png')
+        image.seek(0)
+        array = preprocess_image(image, metadata)
+        self.assertEqual(array.shape, (12, 12, 3))
+        self.assertAlmostEqual(float(array[0, 0, 0]), 9.0)
+
+    def test_mismatched_sidecar_is_rejected(self):
+        """
+        Metadata that does not match the model's input shape or outputs should fail validation.
+        """
+        model = make_test_model(input_size=(12, 12))
+        write_metadata(self.model_file, ModelMetadata((224, 224, 3), label_list))
+        with self.assertRaises(ModelMetadataError):
+            load_metadata(self.model_file, model)
+        write_metadata(self.model_file, ModelMetadata((12, 12, 3), label_list[:5]))
+        with self.assertRaises(ModelMetadataError):
+            load_metadata(self.model_file, model)
+
+    def test_missing_sidecar_is_derived_from_model(self):
+        """
+        Without a sidecar the input size should come from the model itself.
+        """
+        metadata = load_metadata(self.model_file, make_test_model(input_size=(20, 20)))
+        self.assertEqual(metadata.input_size, (20, 20))
+        self.assertEqual(metadata.labels, label_list)
+
+
+class TFLiteExportTests(SimpleTestCase):
+    def test_exported_tflite_variant_is_served_by_the_registry(self):
+        """
+        export_tflite should write a quantized variant that the TFLite backend serves with close outputs.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            model_file = os.path.join(tmp, 'model.h5')
+            model = make_test_model()
+            model.save(model_file)
+            call_command('export_tflite', model=model_file, mode='dynamic', stdout=StringIO())
+
+            with override_settings(DETECTION_INFERENCE_BACKEND='tflite', DETECTION_TFLITE_VARIANT='dynamic'):
+                registry = ModelRegistry(active_file=os.path.join(tmp, 'active_model.txt'), models_dir=tmp,
+                                         default_path=model_file, check_interval=0)
+                with registry.lease() as entry:
+                    self.assertEqual(entry.name, 'model_dynamic.tflite')
+                    batch = np.random.rand(3, 16, 16, 3).astype(np.float32)
+                    np.testing.assert_allclose(entry.predict(batch), model.predict(batch, verbose=0), atol=0.02)
+
+    def test_shared_weights_serve_the_memory_mapped_float32_variant(self):
+        """
+        DETECTION_SHARED_WEIGHTS should serve the unquantized TFLite file without the weight-copying delegate.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            model_file = os.path.join(tmp, 'model.h5')
+            model = make_test_model()
+            model.save(model_file)
+            call_command('export_tflite', model=model_file, mode='float32', stdout=StringIO())
+
+            with override_settings(DETECTION_SHARED_WEIGHTS=True):
+                registry = ModelRegistry(active_file=os.path.join(tmp, 'active_model.txt'), models_dir=tmp,
+                                         default_path=model_file, check_interval=0)
+                with registry.lease() as entry:
+                    self.assertEqual(entry.name, 'model_float32.tflite')
+                    self.assertTrue(entry.describe()['shared_weights'])
+                    batch = np.random.rand(2, 16, 16, 3).astype(np.float32)
+                    np.testing.assert_allclose(entry.predict(batch), model.predict(batch, verbose=0),
+                                               rtol=1e-4, atol=1e-6)
+
+
+class InferenceBackendConformanceTests(SimpleTestCase):
+    """
+    Every inference backend should produce the same top-1 label as the Keras model on a fixed image set.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        import tensorflow as tf
+        tf.keras.utils.set_random_seed(0)
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.model_file = os.path.join(cls.tmp.name, 'model.h5')
+        make_test_model().save(cls.model_file)
+        call_command('export_tflite', model=cls.model_file, mode='dynamic', stdout=StringIO())
+        try:
+            call_command('export_onnx', model=cls.model_file, stdout=StringIO())
+        except CommandError:
+            pass  # tf2onnx is not installed; the ONNX case is skipped
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+        super().tearDownClass()
+
+    def fixed_images(self):
+        rng = np.random.default_rng(0)
+        images = []
+        for color in [(200, 30, 30), (30, 200, 30), (30, 30, 200), (240, 240, 240), (10, 10, 10), (120, 90, 40)]:
+            pixels = np.clip(np.array(color) + rng.integers(-40, 40, size=(32, 32, 3)), 0, 255).astype(np.uint8)
+            file = BytesIO()
+            Image.fromarray(pixels).save(file, 'png')
+            file.seek(0)
+            images.append(file)
+        return images
+
+    def top1_labels(self, model_file):
+        backend = load_backend(model_file)
+        metadata = load_metadata(model_file, backend)
+        batch, errors = preprocess_batch(self.fixed_images(), metadata)
+        self.assertEqual(errors, [None] * len(errors))
+        return [decode_prediction(row, metadata.labels)[0] for row in backend.predict_batch(batch)]
+
+    def test_backends_agree_on_top1_label(self):
+        expected = self.top1_labels(self.model_file)
+        for name, extension in (('tflite', '_dynamic.tflite'), ('onnx', '.onnx')):
+            with self.subTest(backend=name):
+                model_file = self.model_file[:-len('.h5')] + extension
+                if name == 'onnx' and not os.path.exists(model_file):
+                    self.skipTest("tf2onnx is not installed")
+                self.assertEqual(backend_for_path(model_file).name, name)
+                try:
+                    labels = self.top1_labels(model_file)
+                except BackendUnavailable as e:
+                    self.skipTest(str(e))
+                self.assertEqual(labels, expected)
+
+    def test_backend_setting_selects_exported_artifact(self):
+        """
+        DETECTION_INFERENCE_BACKEND should make the registry serve the artifact exported for that backend.
+        """
+        if not os.path.exists(self.model_file[:-len('.h5')] + '.onnx'):
+            self.skipTest("tf2onnx is not installed")
+        with override_settings(DETECTION_INFERENCE_BACKEND='onnx'):
+            registry = ModelRegistry(active_file=os.path.join(self.tmp.name, 'active_model.txt'),
+                                     models_dir=self.tmp.name, default_path=self.model_file, check_interval=0)
+            with registry.lease() as entry:
+                self.assertEqual(entry.name, 'model.onnx')
+                self.assertEqual(entry.describe()['backend'], 'onnx')
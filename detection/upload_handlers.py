@@ -0,0 +1,366 @@
+# This file validates uploads to the prediction endpoints while the multipart body streams in.
+# The format is sniffed from the first bytes and the image dimensions from the header, so oversized,
+# non-image or decompression-bomb uploads are dropped before they are buffered or handed to PIL.
+# Accepted images are kept in memory, in byte buffers that are reused across requests, instead of
+# Django's default handlers spilling every upload over 2.5 MB to a temporary file on disk.
+import io
+import threading
+
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from rest_framework import status
+
+# Fields carrying a zip archive of images rather than an image (see views._collect_uploads)
+ARCHIVE_FIELDS = ('archive',)
+
+# Bytes needed to recognise every supported format, and the most header bytes searched for the
+# dimensions (JPEG EXIF/thumbnail segments can push the frame header far into the file)
+MIN_SNIFF_BYTES = 16
+MAX_SNIFF_BYTES = 256 * 1024
+
+REJECT_TOO_LARGE = 'too_large'
+REJECT_TOO_MANY_PIXELS = 'too_many_pixels'
+REJECT_UNSUPPORTED = 'unsupported_format'
+
+# JPEG start-of-frame markers (baseline, progressive, lossless, ...), which carry the image size
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _jpeg_size(data):
+    offset = 2
+    while offset + 4 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            offset += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # Markers without a length field
+            offset += 2
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            if offset + 9 > len(data):
+                return None
+            height = int.from_bytes(data[offset + 5:offset + 7], 'big')
+            width = int.from_bytes(data[offset + 7:offset + 9], 'big')
+            return width, height
+        offset += 2 + int.from_bytes(data[offset + 2:offset + 4], 'big')
+    return None
+
+
+def _webp_size(data):
+    chunk = data[12:16]
+    if chunk == b'VP8 ' and len(data) >= 30:
+        return (int.from_bytes(data[26:28], 'little') & 0x3FFF,
+                int.from_bytes(data[28:30], 'little') & 0x3FFF)
+    if chunk == b'VP8L' and len(data) >= 25:
+        bits = int.from_bytes(data[21:25], 'little')
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X' and len(data) >= 30:
+        return int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1
+    return None
+
+
+def sniff_image(data):
+    """
+    Identify an image from the first bytes of the file.
+
+    Returns (format, (width, height)) where format is 'jpeg', 'png', 'webp', 'gif' or 'bmp'
+    (None if unrecognised) and the size is None if it is not within the given bytes.
+    """
+    if data[:3] == b'\xff\xd8\xff':
+        return 'jpeg', _jpeg_size(data)
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        if len(data) >= 24 and data[12:16] == b'IHDR':
+            return 'png', (int.from_bytes(data[16:20], 'big'), int.from_bytes(data[20:24], 'big'))
+        return 'png', None
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp', _webp_size(data)
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        if len(data) >= 10:
+            return 'gif', (int.from_bytes(data[6:8], 'little'), int.from_bytes(data[8:10], 'little'))
+        return 'gif', None
+    if data[:2] == b'BM':
+        if len(data) >= 26:
+            return 'bmp', (int.from_bytes(data[18:22], 'little', signed=True),
+                           abs(int.from_bytes(data[22:26], 'little', signed=True)))
+        return 'bmp', None
+    return None, None
+
+
+class UploadMetrics:
+    """Thread-safe counters of accepted and rejected uploads, in files and bytes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.accepted = 0
+        self.accepted_bytes = 0
+        self.rejected = {}
+        self.rejected_bytes = 0
+
+    def record_accepted(self, size):
+        with self._lock:
+            self.accepted += 1
+            self.accepted_bytes += size
+
+    def record_rejected(self, reason, size):
+        with self._lock:
+            self.rejected[reason] = self.rejected.get(reason, 0) + 1
+            self.rejected_bytes += size
+
+    def snapshot(self):
+        """Return the counters as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                "accepted": self.accepted,
+                "accepted_bytes": self.accepted_bytes,
+                "rejected": sum(self.rejected.values()),
+                "rejected_by_reason": dict(self.rejected),
+                # Bytes received for rejected uploads, which were never buffered or decoded
+                "rejected_bytes": self.rejected_bytes,
+            }
+
+
+_metrics = UploadMetrics()
+
+
+def upload_metrics():
+    """Return the upload counters of this process."""
+    return _metrics.snapshot()
+
+
+class BufferPool:
+    """
+    Pool of reusable bytearrays for spooling accepted uploads.
+    Buffers keep their capacity, so steady traffic stops allocating new upload memory. Buffers grown
+    past max_buffer_bytes (e.g. by an archive upload) are dropped instead of being kept for good.
+    """
+
+    def __init__(self, max_buffers, max_buffer_bytes=None):
+        self.max_buffers = max_buffers
+        self.max_buffer_bytes = max_buffer_bytes
+        self._lock = threading.Lock()
+        self._free = []
+
+    def acquire(self):
+        with self._lock:
+            if self._free:
+                return self._free.pop()
+        return bytearray()
+
+    def release(self, buffer):
+        if self.max_buffer_bytes is not None and len(buffer) > self.max_buffer_bytes:
+            return
+        with self._lock:
+            if len(self._free) < self.max_buffers:
+                self._free.append(buffer)
+
+
+_buffer_pool = None
+_buffer_pool_lock = threading.Lock()
+
+
+def get_buffer_pool():
+    global _buffer_pool
+    if _buffer_pool is None:
+        with _buffer_pool_lock:
+            if _buffer_pool is None:
+                # Buffers up to the single-image limit are pooled; larger ones are freed after the request
+                _buffer_pool = BufferPool(getattr(settings, 'DETECTION_UPLOAD_BUFFER_POOL', 8),
+                                          getattr(settings, 'DETECTION_UPLOAD_MAX_BYTES', 20 * 1024 * 1024))
+    return _buffer_pool
+
+
+class BufferFile(io.RawIOBase):
+    """
+    Read-only, seekable file over the first `size` bytes of a pooled buffer.
+    Closing it (Django closes uploaded files at the end of the request) returns the buffer to the pool.
+    """
+
+    def __init__(self, buffer, size, pool):
+        super().__init__()
+        self._buffer = buffer
+        self._view = memoryview(buffer)[:size]
+        self._size = size
+        self._pos = 0
+        self._pool = pool
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        count = max(0, min(len(b), self._size - self._pos))
+        b[:count] = self._view[self._pos:self._pos + count]
+        self._pos += count
+        return count
+
+    def read(self, size=-1):
+        end = self._size if size is None or size < 0 else min(self._size, self._pos + size)
+        data = bytes(self._view[self._pos:end])
+        self._pos = max(self._pos, end)
+        return data
+
+    def readall(self):
+        return self.read()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._pos = offset
+        return offset
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            self._view.release()
+            self._pool.release(self._buffer)
+            self._buffer = None
+        super().close()
+
+
+class RejectedUpload(UploadedFile):
+    """
+    Empty placeholder left in request.FILES for an upload rejected while streaming, so the views
+    can report why (and batch results keep their order). `rejection` holds the error message.
+    """
+
+    def __init__(self, name, field_name, reason, rejection, status_code):
+        super().__init__(file=io.BytesIO(), name=name, size=0)
+        self.field_name = field_name
+        self.reason = reason
+        self.rejection = rejection
+        self.status_code = status_code
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """
+    Upload handler for the prediction endpoints: checks size, format and dimensions of each file
+    as its chunks arrive, spools accepted images to pooled memory buffers, and turns rejected ones
+    into RejectedUpload placeholders without keeping or decoding their bytes.
+    """
+    chunk_size = 64 * 2 ** 10
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_bytes = getattr(settings, 'DETECTION_UPLOAD_MAX_BYTES', 20 * 1024 * 1024)
+        self.max_pixels = getattr(settings, 'DETECTION_UPLOAD_MAX_PIXELS', 50_000_000)
+        self.formats = tuple(getattr(settings, 'DETECTION_UPLOAD_FORMATS', ('jpeg', 'png', 'webp')))
+        self.max_archive_bytes = getattr(settings, 'DETECTION_BATCH_MAX_ARCHIVE_BYTES', 200 * 1024 * 1024)
+        self.max_request_bytes = getattr(settings, 'DETECTION_UPLOAD_MAX_REQUEST_BYTES', 200 * 1024 * 1024)
+        self.pool = get_buffer_pool()
+        # Bytes held by the files accepted so far in this request
+        self.request_bytes = 0
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.is_archive = field_name in ARCHIVE_FIELDS
+        self.file_max_bytes = self.max_archive_bytes if self.is_archive else self.max_bytes
+        self.buffer = self.pool.acquire()
+        self.size = 0
+        self.received = 0
+        self.format = None
+        self.checked = False
+        self.rejection = None
+        if content_length is not None and content_length > self.file_max_bytes:
+            self._reject_too_large()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.rejection is not None:
+            return None
+        if self.size + len(raw_data) > self.file_max_bytes:
+            self._reject_too_large()
+            return None
+        if self.request_bytes + self.size + len(raw_data) > self.max_request_bytes:
+            self._reject(REJECT_TOO_LARGE, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                         f"The uploads of this request exceed {self.max_request_bytes // (1024 * 1024)} MB in total.")
+            return None
+        # Write in place: a reused buffer only grows when this upload is larger than any before it
+        self.buffer[self.size:self.size + len(raw_data)] = raw_data
+        self.size += len(raw_data)
+        if not self.checked:
+            self._check_header()
+        # Consume the chunk: no other handler needs to see it
+        return None
+
+    def file_complete(self, file_size):
+        if self.rejection is None and self.format is None:
+            # The file ended before its format could be identified (e.g. an empty or tiny upload)
+            self._reject_unsupported()
+        if self.rejection is not None:
+            reason, status_code, message = self.rejection
+            _metrics.record_rejected(reason, self.received)
+            return RejectedUpload(self.file_name, self.field_name, reason, message, status_code)
+
+        _metrics.record_accepted(self.size)
+        self.request_bytes += self.size
+        return InMemoryUploadedFile(
+            file=BufferFile(self.buffer, self.size, self.pool),
+            field_name=self.field_name,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=self.size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+        )
+
+    def _check_header(self):
+        if self.is_archive:
+            if self.size >= 4:
+                self.checked = True
+                self.format = 'zip'
+                if bytes(self.buffer[:2]) != b'PK':
+                    self._reject(REJECT_UNSUPPORTED, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                                 "The uploaded archive is not a zip file.")
+            return
+
+        fmt, dimensions = sniff_image(bytes(self.buffer[:min(self.size, MAX_SNIFF_BYTES)]))
+        if fmt is None:
+            if self.size >= MIN_SNIFF_BYTES:
+                self._reject_unsupported()
+            return
+        self.format = fmt
+        if fmt not in self.formats:
+            self._reject_unsupported()
+            return
+        if dimensions is None:
+            # Leave oddly laid out files to the decoder once the header window is exhausted
+            self.checked = self.size >= MAX_SNIFF_BYTES
+            return
+        self.checked = True
+        width, height = dimensions
+        if width * height > self.max_pixels:
+            self._reject(REJECT_TOO_MANY_PIXELS, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                         f"Image is {width}x{height} pixels; at most {self.max_pixels} pixels are allowed.")
+
+    def _reject_too_large(self):
+        self._reject(REJECT_TOO_LARGE, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                     f"File exceeds the {self.file_max_bytes // (1024 * 1024)} MB upload limit.")
+
+    def _reject_unsupported(self):
+        self._reject(REJECT_UNSUPPORTED, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                     f"Unsupported image format; allowed formats: {', '.join(f.upper() for f in self.formats)}.")
+
+    def _reject(self, reason, status_code, message):
+        """Drop the upload: free its buffer now and ignore the rest of its bytes."""
+        if self.rejection is None:
+            self.rejection = (reason, status_code, message)
+            self.pool.release(self.buffer)
+            self.buffer = None
+
+
+def install_upload_handlers(request):
+    """Use ImageUploadHandler for this request's uploads (before request.FILES is first accessed)."""
+    request.upload_handlers = [ImageUploadHandler(request)]
@@ -1,17 +1,33 @@
 from django.urls import path
 from .views import (
     PlantDiseaseDetectAPIView,  # Prediction endpoint
+    BatchPredictView,  # Prediction endpoint for many images
+    PredictionJobCreateView,  # Submit an asynchronous prediction job
+    PredictionJobDetailView,  # Status and results of a prediction job
     HistoryListView,  # List all prediction history for user
     HistoryDetailView,  # Retrieve detail of a single history record
     HistoryDeleteView,  # Delete a single history record
     ClearHistoryView,  # Delete all history records for the user
+    InferenceMetricsView,  # Inference metrics for admins
+    HealthView,  # Readiness probe
+)
+from .async_views import (
+    AsyncPlantDiseaseDetectView,  # Prediction endpoint for ASGI servers
+    AsyncBatchPredictView,  # Prediction endpoint for many images, for ASGI servers
 )
 
 urlpatterns = [
     path('predict/', PlantDiseaseDetectAPIView.as_view(), name='predict'),  # Predict disease from image
+    path('predict/batch/', BatchPredictView.as_view(), name='predict-batch'),  # Predict diseases for many images
+    path('async/predict/', AsyncPlantDiseaseDetectView.as_view(), name='predict-async'),  # Async version of predict/
+    path('async/predict/batch/', AsyncBatchPredictView.as_view(), name='predict-batch-async'),  # Async predict/batch/
+    path('jobs/', PredictionJobCreateView.as_view(), name='prediction-job-create'),  # Submit images as an async job
+    path('jobs/<uuid:job_id>/', PredictionJobDetailView.as_view(), name='prediction-job-detail'),  # Job progress/results
     path('history/', HistoryListView.as_view(), name='history-list'),  # List user's prediction history
     path('history/<int:id>/', HistoryDetailView.as_view(), name='history-detail'),  # Get detail of one prediction
     path('history/<int:id>/delete/', HistoryDeleteView.as_view(), name='history-delete'),  # Delete one prediction record
     path('history/clear/', ClearHistoryView.as_view(), name='history-clear'),  # Delete all prediction history for user
+    path('health/', HealthView.as_view(), name='health'),  # Readiness probe for load balancers
+    path('metrics/', InferenceMetricsView.as_view(), name='inference-metrics'),  # Batching/inference metrics (admin only)
 ]
 # This file defines the URL patterns for the detection app, linking views to specific endpoints.
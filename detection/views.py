@@ -1,16 +1,45 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import generics, status, permissions
-from PIL import Image
-import numpy as np
-from .models import PredictionHistory
-from .serializers import PredictionHistorySerializer
-from .disease_info import label_list, remedies, default_remedy, preventive_measures
-from .model_loader import get_model
+import hashlib
+import os
+import time
+import zipfile
+from .models import PredictionHistory, PredictionJob, PredictionJobItem
+from .serializers import PredictionHistorySerializer, PredictionJobSerializer, requested_fields
+from .pagination import KeysetPagination
+from .batching import predict_batched, predict_many, batching_metrics
+from .inference import decode_prediction, disease_details, history_fields
+from .preprocessing import preprocess_image, preprocess_batch
+from .model_loader import is_ready, describe_models, active_model_version, get_active_metadata
+from .prediction_cache import get_prediction_cache, make_cache_key, cache_stats
+from .jobs import enqueue_job
+from .image_store import persist_image
+from .stats import count_predictions
+from .upload_handlers import RejectedUpload, install_upload_handlers, upload_metrics
+from rest_framework.reverse import reverse
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.conf import settings
 from django.contrib.auth.hashers import check_password
+from django.core.files.base import ContentFile
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework.renderers import JSONRenderer
 
 
-class PlantDiseaseDetectAPIView(APIView):
+class ImageUploadMixin:
+    """
+    Parse uploads with ImageUploadHandler, which rejects oversized or non-image files
+    while they stream in instead of after they were buffered and decoded.
+    """
+
+    def initialize_request(self, request, *args, **kwargs):
+        install_upload_handlers(request)
+        return super().initialize_request(request, *args, **kwargs)
+
+
+class PlantDiseaseDetectAPIView(ImageUploadMixin, APIView):
     """
     API endpoint for predicting plant disease from an uploaded leaf image.
     Only accessible to authenticated users.
@@ -29,35 +58,39 @@ class PlantDiseaseDetectAPIView(APIView):
             )
 
         image_file = request.FILES['image']
+        if isinstance(image_file, RejectedUpload):
+            return Response({"error": image_file.rejection}, status=image_file.status_code)
 
         try:
-            # Load and preprocess image for model input
-            img = Image.open(image_file).convert('RGB')
-            img = img.resize((224, 224))  # Resize image to model expected input size
-            img_array = np.array(img) / 255.0  # Normalize pixel values
-            img_array = np.expand_dims(img_array, axis=0)  # Add batch dimension
-
-            # Load ML model and get prediction
-            model = get_model()
-            preds = model.predict(img_array)
-            pred_class = int(np.argmax(preds))
-            pred_label = label_list[pred_class]
-            confidence = float(np.max(preds))
+            # Reuse the prediction for byte-identical uploads scored by the same model
+            cache = get_prediction_cache()
+            cache_key = make_cache_key(image_file, active_model_version()) if cache is not None else None
+            cached = cache.get(cache_key) if cache is not None else None
+
+            if cached is not None:
+                pred_label, confidence = cached
+            else:
+                # Load and preprocess image as described by the active model's metadata
+                metadata = get_active_metadata()
+                img_array = preprocess_image(image_file, metadata)
+
+                # Run prediction through the shared micro-batcher
+                preds = predict_batched(img_array)
+                pred_label, confidence = decode_prediction(preds, metadata.labels)
+                if cache is not None:
+                    cache.set(cache_key, (pred_label, confidence))
 
             # Retrieve remedy and prevention info for predicted disease
-            remedy = remedies.get(pred_label, default_remedy)
-            prevention = preventive_measures.get(pred_label, "No specific prevention measures available.")
+            remedy, prevention = disease_details(pred_label)
 
-            # Save prediction record if user is authenticated
+            # Save prediction record if user is authenticated; the image is stored after the response
             if request.user.is_authenticated:
-                PredictionHistory.objects.create(
+                record = PredictionHistory.objects.create(
                     user=request.user,
-                    image=image_file,
-                    disease=pred_label,
                     confidence=confidence,
-                    remedy=remedy,
-                    preventive_measures=prevention,
+                    **history_fields(pred_label),
                 )
+                persist_image(record, image_file)
 
             # Return prediction response
             return Response({
@@ -72,16 +105,259 @@ class PlantDiseaseDetectAPIView(APIView):
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class HistoryListView(generics.ListAPIView):
+def _read_archive(archive):
+    """
+    Extract image files from an uploaded zip archive as in-memory files.
+    Raises ValueError if the archive is invalid or exceeds the configured limits.
+    """
+    max_files = getattr(settings, 'DETECTION_BATCH_MAX_FILES', 200)
+    max_bytes = getattr(settings, 'DETECTION_BATCH_MAX_ARCHIVE_BYTES', 200 * 1024 * 1024)
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            members = [info for info in zf.infolist()
+                       if not info.is_dir() and not os.path.basename(info.filename).startswith('.')]
+            if len(members) > max_files:
+                raise ValueError(f"Archive contains more than {max_files} files.")
+            # Guard against zip bombs before decompressing anything
+            if sum(info.file_size for info in members) > max_bytes:
+                raise ValueError("Archive is too large once extracted.")
+            return [ContentFile(zf.read(info), name=os.path.basename(info.filename)) for info in members]
+    except zipfile.BadZipFile:
+        raise ValueError("Invalid zip archive.")
+
+
+def _collect_uploads(request):
+    """
+    Return the image files of a multi-image upload ('images' files and/or a zip 'archive').
+    Raises ValueError if nothing usable was uploaded or the limits are exceeded.
+    """
+    files = request.FILES.getlist('images')
+    if 'archive' in request.FILES:
+        archive = request.FILES['archive']
+        if isinstance(archive, RejectedUpload):
+            raise ValueError(archive.rejection)
+        files += _read_archive(archive)
+    if not files:
+        raise ValueError("No leaf images found. Please provide 'images' files or a zip 'archive'.")
+    max_files = getattr(settings, 'DETECTION_BATCH_MAX_FILES', 200)
+    if len(files) > max_files:
+        raise ValueError(f"At most {max_files} images are allowed per request.")
+    return files
+
+
+def build_batch_results(user, files, errors, predictions, labels):
+    """
+    Build the per-image results of a batch prediction and the (unsaved) history records, without images.
+    predictions maps the index of each successfully decoded image to its probability row.
+    """
+    results = []
+    records = []
+    for index, image_file in enumerate(files):
+        if index not in predictions:
+            results.append({"index": index, "filename": image_file.name, "error": errors[index]})
+            continue
+        pred_label, confidence = decode_prediction(predictions[index], labels)
+        remedy, prevention = disease_details(pred_label)
+        records.append(PredictionHistory(
+            user=user,
+            confidence=confidence,
+            **history_fields(pred_label),
+        ))
+        results.append({
+            "index": index,
+            "filename": image_file.name,
+            "disease": pred_label,
+            "confidence": round(confidence, 4),
+            "remedy": remedy,
+            "preventive_measure": prevention,
+        })
+    return results, records
+
+
+def finish_batch_records(results, records, files):
+    """
+    Insert the history records in one query and count them in the daily statistics in the same
+    transaction (bulk_create sends no post_save signal), then add the id of each record to its
+    successful result and schedule storing its image.
+    """
+    with transaction.atomic():
+        created = PredictionHistory.objects.bulk_create(records)
+        count_predictions(created)
+        created = iter(created)
+        for result in results:
+            if "error" not in result:
+                record = next(created)
+                result["id"] = record.pk
+                persist_image(record, files[result["index"]])
+
+
+class BatchPredictView(ImageUploadMixin, APIView):
     """
-    API endpoint to list all past prediction histories of the authenticated user.
+    API endpoint for predicting plant diseases for many leaf images in one request.
+    Accepts several 'images' files (multipart) or a zip 'archive'. Each image gets its own
+    result or error, so one bad file does not fail the whole request.
+    Only accessible to authenticated users.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        """
+        Decode the uploaded images in parallel, run them through the model in batches,
+        bulk-insert the prediction records and return per-image results.
+        """
+        try:
+            files = _collect_uploads(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # Decode every image in parallel into one preallocated batch, keeping per-image errors
+            metadata = get_active_metadata()
+            batch, errors = preprocess_batch(files, metadata)
+
+            # Run all decodable images through the model in batches
+            valid = [i for i, error in enumerate(errors) if error is None]
+            predictions = dict(zip(valid, predict_many([batch[i] for i in valid])))
+
+            results, records = build_batch_results(request.user, files, errors, predictions, metadata.labels)
+
+            # Insert all prediction records in one query
+            finish_batch_records(results, records, files)
+
+            return Response({
+                "count": len(results),
+                "succeeded": len(records),
+                "failed": len(results) - len(records),
+                "results": results,
+            })
+
+        except Exception as e:
+            # Return error response on failure
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class PredictionJobCreateView(ImageUploadMixin, APIView):
+    """
+    API endpoint to submit many leaf images as an asynchronous prediction job.
+    Accepts the same uploads as the batch endpoint and returns a job id immediately;
+    results are fetched from the job status endpoint.
+    Only accessible to authenticated users.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        """
+        Store the uploaded images, create the job and schedule it on the local job pool.
+        """
+        try:
+            files = _collect_uploads(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        rejected = sum(isinstance(image_file, RejectedUpload) for image_file in files)
+        with transaction.atomic():
+            job = PredictionJob.objects.create(user=request.user, total_images=len(files),
+                                               processed_images=rejected, failed_images=rejected)
+            PredictionJobItem.objects.bulk_create([
+                # Uploads rejected while streaming are stored as failed items, without an image
+                PredictionJobItem(job=job, index=index, filename=image_file.name,
+                                  status=PredictionJobItem.STATUS_FAILED, error=image_file.rejection)
+                if isinstance(image_file, RejectedUpload) else
+                PredictionJobItem(job=job, index=index, image=image_file, filename=image_file.name)
+                for index, image_file in enumerate(files)
+            ])
+            enqueue_job(job.pk)
+
+        return Response({
+            "job_id": str(job.pk),
+            "status": job.status,
+            "total_images": job.total_images,
+            "status_url": reverse('prediction-job-detail', kwargs={'job_id': job.pk}, request=request),
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class PredictionJobDetailView(APIView):
+    """
+    API endpoint to check the progress and results of a prediction job.
+    Pass ?wait=<seconds> to long-poll: the response is held until the job makes
+    progress or finishes, or the wait (capped by DETECTION_JOB_MAX_WAIT_SECONDS) expires.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, job_id):
+        """
+        Return the job status, progress counters and per-image results.
+        """
+        jobs = PredictionJob.objects.filter(user=request.user)
+        job = get_object_or_404(jobs, pk=job_id)
+
+        try:
+            wait = float(request.query_params.get('wait', 0))
+        except ValueError:
+            return Response({"error": "wait must be a number of seconds."}, status=status.HTTP_400_BAD_REQUEST)
+        deadline = time.monotonic() + min(max(wait, 0), getattr(settings, 'DETECTION_JOB_MAX_WAIT_SECONDS', 30))
+        progress = job.processed_images
+        while not job.is_finished and job.processed_images == progress and time.monotonic() < deadline:
+            time.sleep(0.5)
+            job.refresh_from_db()
+
+        job = jobs.prefetch_related('items__prediction__disease_info').get(pk=job.pk)
+        return Response(PredictionJobSerializer(job, context={'request': request}).data)
+
+
+class HistoryListMixin:
+    """
+    Listing behaviour shared by the history list endpoints: keyset pagination (newest first by default),
+    `fields=` to select the returned fields (only their columns are loaded), and an ETag so that
+    an unchanged page is answered with 304 Not Modified to `If-None-Match`.
+    """
+    pagination_class = KeysetPagination
+    # Model columns behind the serializer fields that are not model fields themselves
+    field_columns = {
+        'thumbnail_url': ('image',),
+        'medium_url': ('image',),
+        'remedy': ('remedy', 'disease_info'),
+        'preventive_measures': ('preventive_measures', 'disease_info'),
+    }
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        requested = requested_fields(self.request)
+        if requested is None:
+            return queryset.select_related('disease_info')
+        # The keyset columns are always needed to build the next cursor
+        columns = {'id', 'timestamp', 'confidence'}
+        for name in requested:
+            columns.update(self.field_columns.get(name, (name,)))
+        model_fields = {field.name for field in queryset.model._meta.concrete_fields}
+        queryset = queryset.only(*(columns & model_fields))
+        if 'disease_info' in columns:
+            queryset = queryset.select_related('disease_info')
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+        etag = quote_etag(hashlib.sha256(JSONRenderer().render(response.data)).hexdigest()[:32])
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+        response['ETag'] = etag
+        return response
+
+
+class HistoryListView(HistoryListMixin, generics.ListAPIView):
+    """
+    API endpoint to list the past prediction histories of the authenticated user, a page at a time.
     """
     serializer_class = PredictionHistorySerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        # Return user's predictions ordered by newest first
-        return PredictionHistory.objects.filter(user=self.request.user).order_by('-timestamp')
+        # Restrict to the user's own predictions (ordered by the paginator)
+        return PredictionHistory.objects.filter(user=self.request.user)
 
 
 class HistoryDetailView(generics.RetrieveAPIView):
@@ -94,7 +370,7 @@ class HistoryDetailView(generics.RetrieveAPIView):
 
     def get_queryset(self):
         # Ensure user can only access their own prediction history
-        return PredictionHistory.objects.filter(user=self.request.user)
+        return PredictionHistory.objects.filter(user=self.request.user).select_related('disease_info')
 
 
 class HistoryDeleteView(generics.DestroyAPIView):
@@ -136,5 +412,44 @@ class ClearHistoryView(APIView):
 
         # Respond with number of deleted records
         return Response({"message": f"{deleted_count} records deleted."}, status=status.HTTP_204_NO_CONTENT)
+
+
+class InferenceMetricsView(APIView):
+    """
+    API endpoint exposing inference metrics (batch sizes, queue wait times, rejected uploads) for tuning.
+    Only accessible to admin users.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        """
+        Return a snapshot of the current inference metrics.
+        """
+        return Response({
+            "batching": batching_metrics(),
+            "models": describe_models(),
+            "prediction_cache": cache_stats(),
+            "uploads": upload_metrics(),
+        })
+
+
+class HealthView(APIView):
+    """
+    Readiness probe for load balancers.
+    Returns 503 while the model is still being preloaded or warmed up (or if that failed), 200 once the worker is hot.
+    """
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        """
+        Report whether this worker is ready to serve predictions.
+        """
+        warm_up_expected = (getattr(settings, 'DETECTION_PRELOAD_MODEL', False)
+                            or getattr(settings, 'DETECTION_WORKER_WARMUP', False))
+        model_ready = is_ready()
+        if warm_up_expected and not model_ready:
+            return Response({"status": "loading", "model_ready": False}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({"status": "ready", "model_ready": model_ready})
 # This file defines the views for the detection app, handling plant disease prediction and history management.
 # It includes endpoints for disease detection, listing history, viewing details, deleting entries, and clearing history.
@@ -0,0 +1,25 @@
+# Gunicorn configuration for serving plantguard with hot workers.
+# Usage: gunicorn -c gunicorn.conf.py
+import os
+
+wsgi_app = 'plantguard.wsgi:application'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', '2'))
+
+# Import the application (Django, DRF and the app code) once in the master process.
+preload_app = True
+# TensorFlow does not survive a fork once it is initialized (graph functions deadlock in the child),
+# so the master never loads the model: each worker loads it and runs a warm-up forward pass right
+# after forking, before it accepts requests. To share one copy of the weights between workers,
+# serve the memory-mapped TFLite variant (DETECTION_SHARED_WEIGHTS).
+os.environ.setdefault('PLANTGUARD_PRELOAD_MODEL', '0')
+# Workers answer the health probe with 503 until their warm-up has succeeded
+os.environ.setdefault('PLANTGUARD_WORKER_WARMUP', '1')
+
+
+def post_fork(server, worker):
+    from detection import model_loader
+    try:
+        model_loader.warm_up()
+    except Exception:
+        server.log.exception("Model warm-up failed in worker %s", worker.pid)
@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/5.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
+import os
 from datetime import timedelta
 from pathlib import Path
 
@@ -44,6 +45,7 @@ EXTERNAL_APPS = [
     'rest_framework_simplejwt.token_blacklist',
     'account',
     'detection',
+    'analytics',
     'corsheaders',
     'drf_spectacular'
 ]
@@ -63,6 +65,90 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 
+# Plant disease inference settings
+# Concurrent predictions are grouped by a micro-batcher: a batch is dispatched once
+# DETECTION_BATCH_MAX_SIZE requests are waiting or DETECTION_BATCH_WINDOW_MS has elapsed.
+DETECTION_BATCHING_ENABLED = True
+DETECTION_BATCH_MAX_SIZE = 32
+DETECTION_BATCH_WINDOW_MS = 10
+# Serve predictions through the traced tf.function; set True to fall back to model.predict() for debugging
+DETECTION_USE_KERAS_PREDICT = False
+# Load the model at startup (AppConfig.ready) rather than on the first request, and optionally
+# run the warm-up forward pass too (without it, only the weights are loaded and nothing is run).
+# gunicorn.conf.py leaves this off and warms up each worker after it forks instead.
+DETECTION_PRELOAD_MODEL = os.environ.get('PLANTGUARD_PRELOAD_MODEL', '0') == '1'
+DETECTION_PRELOAD_WARMUP = os.environ.get('PLANTGUARD_PRELOAD_WARMUP', '1') == '1'
+# Set by gunicorn.conf.py, whose workers warm up in post_fork: the health endpoint then reports a worker
+# as not ready until its warm-up has succeeded, like with DETECTION_PRELOAD_MODEL.
+DETECTION_WORKER_WARMUP = os.environ.get('PLANTGUARD_WORKER_WARMUP', '0') == '1'
+# Runtime used to serve the active model (see detection/backends.py). None picks the backend from the
+# active model's file extension (.h5/.keras -> 'keras', .tflite -> 'tflite', .onnx -> 'onnx').
+# 'tflite' / 'onnx' serve the artifact exported next to a Keras model by `manage.py export_tflite`
+# (<model>_<DETECTION_TFLITE_VARIANT>.tflite) or `manage.py export_onnx` (<model>.onnx).
+# DETECTION_TFLITE_VARIANT=None serves 'float32' with DETECTION_SHARED_WEIGHTS and 'dynamic' otherwise.
+# DETECTION_INFERENCE_THREADS=None lets the TFLite / ONNX Runtime choose the number of threads.
+DETECTION_INFERENCE_BACKEND = None
+DETECTION_TFLITE_VARIANT = None
+DETECTION_INFERENCE_THREADS = None
+# Share one copy of the model weights between all worker processes: the TFLite variant is memory-mapped
+# read-only and served without the XNNPACK delegate (which would copy the weights into every process).
+# It serves the unquantized <model>_float32.tflite (`manage.py export_tflite --mode float32`) by default.
+DETECTION_SHARED_WEIGHTS = os.environ.get('PLANTGUARD_SHARED_WEIGHTS', '0') == '1'
+# 'local' runs the model inside every Django worker. 'remote' sends preprocessed batches to the inference
+# service started with `manage.py run_inference_server` (DETECTION_INFERENCE_WORKERS processes sharing the
+# Unix socket DETECTION_INFERENCE_SOCKET); image tensors are passed through shared memory.
+DETECTION_INFERENCE_MODE = os.environ.get('PLANTGUARD_INFERENCE_MODE', 'local')
+DETECTION_INFERENCE_SOCKET = os.environ.get('PLANTGUARD_INFERENCE_SOCKET', str(BASE_DIR / 'inference.sock'))
+DETECTION_INFERENCE_WORKERS = int(os.environ.get('PLANTGUARD_INFERENCE_WORKERS', '2'))
+DETECTION_INFERENCE_TIMEOUT_SECONDS = 30
+# How often (seconds) workers check streamlit_dashboard/models/active_model.txt for a model swap
+DETECTION_ACTIVE_MODEL_CHECK_SECONDS = 2
+# Limits for the batch prediction endpoint (number of images, and extracted size of a zip archive)
+DETECTION_BATCH_MAX_FILES = 200
+DETECTION_BATCH_MAX_ARCHIVE_BYTES = 200 * 1024 * 1024
+# Django's default limit of 100 files per request would reject large multipart batch uploads
+DATA_UPLOAD_MAX_NUMBER_FILES = DETECTION_BATCH_MAX_FILES
+# Uploads to the prediction endpoints are checked while they stream in (detection/upload_handlers.py):
+# files over DETECTION_UPLOAD_MAX_BYTES, images over DETECTION_UPLOAD_MAX_PIXELS (read from the header) and
+# formats outside DETECTION_UPLOAD_FORMATS are dropped before they are buffered or decoded.
+# Accepted images are kept in memory (at most DETECTION_UPLOAD_MAX_REQUEST_BYTES per request), in byte
+# buffers reused across requests; up to DETECTION_UPLOAD_BUFFER_POOL idle buffers of at most
+# DETECTION_UPLOAD_MAX_BYTES each are kept per process (larger archive buffers are freed).
+DETECTION_UPLOAD_MAX_BYTES = 20 * 1024 * 1024
+DETECTION_UPLOAD_MAX_PIXELS = 50_000_000
+DETECTION_UPLOAD_FORMATS = ('jpeg', 'png', 'webp')
+DETECTION_UPLOAD_MAX_REQUEST_BYTES = 200 * 1024 * 1024
+DETECTION_UPLOAD_BUFFER_POOL = 8
+# Asynchronous prediction jobs run on a local thread pool of DETECTION_JOB_WORKERS threads.
+# DETECTION_JOBS_EAGER runs them inline instead (useful for tests and debugging).
+DETECTION_JOB_WORKERS = 2
+DETECTION_JOBS_EAGER = False
+# A runner renews its claim on a job after every chunk; a running job whose claim is older than
+# DETECTION_JOB_LEASE_SECONDS is taken over by the next runner (keep it well above the time of one chunk).
+DETECTION_JOB_LEASE_SECONDS = 300
+# Longest a job status request may be held open with ?wait=<seconds>
+DETECTION_JOB_MAX_WAIT_SECONDS = 30
+# Images of prediction records are stored by a background writer after the response (detection/image_store.py).
+# DETECTION_IMAGE_STORAGE: 'original' keeps the upload as sent, 'thumbnail' keeps a copy re-encoded to at most
+# DETECTION_IMAGE_MAX_DIMENSION pixels per side in DETECTION_IMAGE_FORMAT, 'none' keeps no image.
+# Files are named by the upload's SHA-256, so identical uploads share one file.
+# DETECTION_IMAGE_WRITER_EAGER writes the image inside the request instead (useful for tests and debugging).
+DETECTION_IMAGE_STORAGE = 'thumbnail'
+DETECTION_IMAGE_MAX_DIMENSION = 1024
+DETECTION_IMAGE_FORMAT = 'WEBP'
+DETECTION_IMAGE_QUALITY = 80
+DETECTION_IMAGE_WRITER_WORKERS = 1
+# Smaller WebP versions of each stored image (name: maximum width/height), exposed by the history endpoints
+# as <name>_url. Backfill them for existing records with `manage.py generate_image_derivatives`.
+DETECTION_IMAGE_DERIVATIVES = {'thumbnail': 256, 'medium': 800}
+DETECTION_IMAGE_WRITER_EAGER = False
+# Cache of predictions keyed by upload content hash + model version.
+# BACKEND: 'memory' (per-process LRU of MAX_ENTRIES), 'django' (the cache named ALIAS, TIMEOUT seconds) or None.
+DETECTION_PREDICTION_CACHE = {
+    'BACKEND': 'memory',
+    'MAX_ENTRIES': 1024,
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
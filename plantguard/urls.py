@@ -46,6 +46,9 @@ urlpatterns = [
     # URLs under 'api/detection/' are handled by the 'detection' app
     path('api/detection/', include('detection.urls')),
 
+    # URLs under 'api/analytics/' serve the admin dashboard's aggregated data
+    path('api/analytics/', include('analytics.urls')),
+
     # URL to get the OpenAPI schema in JSON or YAML format
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
 
@@ -0,0 +1,130 @@
+# This file is the dashboard's data cache. Streamlit reruns the whole script on every widget interaction;
+# the data functions decorated with @cached keep their results for a few seconds to minutes (st.cache_data)
+# instead of calling the API again on each rerun. Results are kept per logged-in user, results fetched
+# while an API call failed are not kept, and the dashboard's own changes (user edits, history deletes,
+# model activation) clear the functions of the affected groups. Hits, misses and the time saved are counted
+# per page and shown in the sidebar.
+import functools
+import threading
+import time
+from collections import defaultdict
+
+import streamlit as st
+import jwt_auth
+
+# Cache lifetime in seconds per kind of data
+TTL_METRICS = 60
+TTL_SERIES = 300
+TTL_USERS = 120
+TTL_PREDICTIONS = 60
+TTL_MODELS = 600
+
+_groups = defaultdict(list)
+_lock = threading.Lock()
+# page -> function name -> counters
+_stats = defaultdict(lambda: defaultdict(lambda: {"hits": 0, "misses": 0, "saved": 0.0, "spent": 0.0}))
+# function name -> (number of loads, total load time), to estimate what a hit saved
+_load_times = defaultdict(lambda: [0, 0.0])
+_run = threading.local()
+
+
+class _Uncached(Exception):
+    """Raised out of a cached function so that st.cache_data does not store a result fetched with errors."""
+
+    def __init__(self, result):
+        super().__init__()
+        self.result = result
+
+
+def set_page(page):
+    """Name of the page being rendered, to which the following cache lookups are counted."""
+    _run.page = page
+
+
+def cached(ttl, groups=()):
+    """Cache a data function for `ttl` seconds; invalidate(group) clears it for any of its `groups`."""
+    def decorate(fn):
+        name = fn.__name__
+
+        def load(scope, *args, **kwargs):
+            _run.loaded = True
+            errors = jwt_auth.error_count()
+            started = time.perf_counter()
+            result = fn(*args, **kwargs)
+            elapsed = time.perf_counter() - started
+            with _lock:
+                _load_times[name][0] += 1
+                _load_times[name][1] += elapsed
+            if jwt_auth.error_count() != errors:
+                raise _Uncached(result)
+            return result
+
+        # st.cache_data tells functions apart by module and qualified name
+        load.__module__ = fn.__module__
+        load.__name__ = load.__qualname__ = f"{fn.__qualname__}_cached"
+        load = st.cache_data(ttl=ttl, show_spinner=False)(load)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            _run.loaded = False
+            started = time.perf_counter()
+            try:
+                # Scoped to the logged-in user: results are never shared with another account
+                result = load(st.session_state.get('username'), *args, **kwargs)
+            except _Uncached as e:
+                result = e.result
+            _record(name, hit=not _run.loaded, elapsed=time.perf_counter() - started)
+            return result
+
+        wrapper.clear = load.clear
+        for group in groups:
+            _groups[group].append(wrapper)
+        return wrapper
+    return decorate
+
+
+def _record(name, hit, elapsed):
+    with _lock:
+        counters = _stats[getattr(_run, 'page', None) or "Other"][name]
+        if hit:
+            loads, load_time = _load_times[name]
+            counters["hits"] += 1
+            counters["saved"] += max(load_time / loads - elapsed, 0.0) if loads else 0.0
+        else:
+            counters["misses"] += 1
+        counters["spent"] += elapsed
+
+
+def invalidate(*groups):
+    """Clear the cached results of every function in the groups (after the dashboard changed their data)."""
+    for group in groups:
+        for fn in _groups[group]:
+            fn.clear()
+
+
+def page_stats(page):
+    """Hit rate, time saved and per-function counters of a page."""
+    with _lock:
+        functions = {name: dict(counters) for name, counters in _stats[page].items()}
+    hits = sum(c["hits"] for c in functions.values())
+    lookups = hits + sum(c["misses"] for c in functions.values())
+    return {
+        "hit_rate": hits / lookups if lookups else 0.0,
+        "saved": sum(c["saved"] for c in functions.values()),
+        "lookups": lookups,
+        "functions": functions,
+    }
+
+
+def render_stats(page):
+    """Show the page's cache statistics in the sidebar."""
+    stats = page_stats(page)
+    with st.sidebar.expander("Data cache"):
+        st.metric("Hit rate", f"{stats['hit_rate']:.0%}", help=f"{stats['lookups']} lookups on this page")
+        st.metric("Time saved", f"{stats['saved']:.2f}s")
+        for name, counters in sorted(stats["functions"].items()):
+            st.caption(f"{name}: {counters['hits']} hits / {counters['misses']} misses, "
+                       f"{counters['saved']:.2f}s saved")
+        if st.button("Refresh data"):
+            invalidate(*list(_groups))
+            st.rerun()
@@ -1,21 +1,9 @@
-import sys
-import os
-
-# Add project root to sys.path so Django and other packages can be found
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-if BASE_DIR not in sys.path:
-    sys.path.insert(0, BASE_DIR)
-
-import django
-
-# Set Django settings module
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'plantguard.settings')
-
-# Setup Django
-django.setup()
+# The dashboard reads everything from the Django API (PLANTGUARD_API_URL, see jwt_auth.py),
+# so it runs without Django or TensorFlow.
 
 # Relative imports inside the streamlit_dashboard package
 import jwt_auth
+import cache
 
 import utils
 import users
@@ -226,6 +214,9 @@ with st.sidebar:
     )
 
 # --- Main Content ---
+# Data cache lookups below are counted for the selected page
+cache.set_page(selected)
+
 if selected == "Dashboard":
     st.title("\U0001F4CA Dashboard")
     metrics = utils.get_user_metrics()
@@ -275,6 +266,21 @@ if selected == "Dashboard":
     else:
         st.info("No daily prediction data available.")
 
+    st.subheader("Prediction Confidence")
+    df_confidence = utils.get_confidence_histogram()
+    if not df_confidence.empty:
+        fig4 = px.bar(
+            df_confidence,
+            x="confidence",
+            y="count",
+            title="Predictions by Confidence",
+            color_discrete_sequence=["#2e7d32"],
+        )
+        fig4.update_layout(plot_bgcolor="#111", paper_bgcolor="#111", font_color="#43a047")
+        st.plotly_chart(fig4, use_container_width=True)
+    else:
+        st.info("No prediction data available.")
+
 elif selected == "Users":
     users.render()
 
@@ -309,3 +315,6 @@ elif selected == "Logout":
                 logout()
                 st.session_state["confirm_logout"] = False
                 st.experimental_rerun()
+
+# --- Data cache statistics of the page just rendered ---
+cache.render_stats(selected)
@@ -1,14 +1,36 @@
+import os
+import threading
 import streamlit as st
 import requests
 import time
 
-API_BASE = "http://127.0.0.1:8000/api/account"
-TOKEN_URL = "http://127.0.0.1:8000/api/account/login/"
-REFRESH_URL = "http://127.0.0.1:8000/api/account/refresh/"
+# Root of the Django API (the dashboard only talks to it over HTTP)
+API_ROOT = os.environ.get("PLANTGUARD_API_URL", "http://127.0.0.1:8000/api").rstrip("/")
+# The API as reached from the admins' browsers (download links), when it differs from PLANTGUARD_API_URL
+PUBLIC_API_ROOT = os.environ.get("PLANTGUARD_PUBLIC_API_URL", API_ROOT).rstrip("/")
+API_BASE = f"{API_ROOT}/account"
+TOKEN_URL = f"{API_BASE}/login/"
+REFRESH_URL = f"{API_BASE}/refresh/"
+
+# One connection pool for all API calls of this Streamlit process (requests asks for gzip by default)
+session = requests.Session()
+
+# Failed API calls of the current script run (each Streamlit session runs in its own thread);
+# the data cache does not keep results fetched while a call failed
+_errors = threading.local()
+
+
+def report_error(message):
+    _errors.count = error_count() + 1
+    st.error(message)
+
+
+def error_count():
+    return getattr(_errors, "count", 0)
 
 
 def login_and_store_tokens(username, password):
-    resp = requests.post(TOKEN_URL, data={"username": username, "password": password})
+    resp = session.post(TOKEN_URL, data={"username": username, "password": password})
     if resp.status_code == 200:
         tokens = resp.json()
         st.session_state['access_token'] = tokens['access']
@@ -27,56 +49,64 @@ def get_access_token():
     if not access or not refresh or (time.time() - token_time > 240):
         if not refresh:
             return None
-        resp = requests.post(REFRESH_URL, data={"refresh": refresh})
+        resp = session.post(REFRESH_URL, data={"refresh": refresh})
         if resp.status_code == 200:
             access = resp.json()['access']
             st.session_state['access_token'] = access
             st.session_state['token_time'] = time.time()
         else:
-            st.error("Session expired. Please log in again.")
+            report_error("Session expired. Please log in again.")
             st.session_state['access_token'] = None
             st.session_state['refresh_token'] = None
             return None
     return st.session_state['access_token']
 
 
-def authorized_get(url, params=None):
+def authorized_request(method, url, **kwargs):
+    """Send an authenticated request, refreshing the access token once if it was rejected."""
     token = get_access_token()
     if not token:
-        st.error("Not authenticated.")
+        report_error("Not authenticated.")
         return None
-    headers = {"Authorization": f"Bearer {token}"}
-    resp = requests.get(url, headers=headers, params=params)
+    headers = {"Authorization": f"Bearer {token}", **kwargs.pop("headers", {})}
+    resp = session.request(method, url, headers=headers, **kwargs)
     if resp.status_code == 401:
         st.session_state['access_token'] = None
         token = get_access_token()
         if not token:
-            st.error("Session expired. Please log in again.")
+            report_error("Session expired. Please log in again.")
             return None
-        headers = {"Authorization": f"Bearer {token}"}
-        resp = requests.get(url, headers=headers, params=params)
+        headers["Authorization"] = f"Bearer {token}"
+        resp = session.request(method, url, headers=headers, **kwargs)
+    return resp
+
+
+def authorized_get(url, params=None):
+    resp = authorized_request("GET", url, params=params)
+    if resp is None:
+        return None
     if resp.status_code == 200:
         return resp.json()
     else:
-        st.error(f"API error: {resp.status_code} {resp.text}")
+        report_error(f"API error: {resp.status_code} {resp.text}")
         return None
 
 
 def authorized_post(url, data=None, json=None):
     token = get_access_token()
     if not token:
-        st.error("Not authenticated.")
+        report_error("Not authenticated.")
         return None
     headers = {"Authorization": f"Bearer {token}"}
-    resp = requests.post(url, headers=headers, data=data, json=json)
+    resp = session.post(url, headers=headers, data=data, json=json)
     return resp
 
 
 def authorized_delete(url):
     token = get_access_token()
     if not token:
-        st.error("Not authenticated.")
+        report_error("Not authenticated.")
         return None
     headers = {"Authorization": f"Bearer {token}"}
-    resp = requests.delete(url, headers=headers)
+    resp = session.delete(url, headers=headers)
     return resp
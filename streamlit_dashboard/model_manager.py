@@ -9,7 +9,7 @@ def render():
 
     # --- Upload Model ---
     with st.form("upload_model_form"):
-        uploaded_file = st.file_uploader("Upload Model (.pkl, .h5)", type=["pkl", "h5"])
+        uploaded_file = st.file_uploader("Upload Model (.pkl, .h5) or metadata sidecar (.json)", type=["pkl", "h5", "json"])
         submit = st.form_submit_button("Upload")
         if submit and uploaded_file:
             utils.save_model_file(uploaded_file)
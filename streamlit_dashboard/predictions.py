@@ -2,65 +2,72 @@ import streamlit as st
 import pandas as pd
 import utils
 
-def render_predictions():
-    st.title("\U0001F489 Predictions Management")
-    st.markdown("View, filter, and export predictions.")
+PAGE_SIZE = 50
 
-    search = st.text_input("Search by ID")
-    user = st.text_input("Filter by Username")
-    disease = st.text_input("Filter by Disease")
-    date = st.date_input("Filter by Date", value=None)
+COLUMNS = {
+    "id": "ID",
+    "first_name": "User First Name",
+    "last_name": "User Last Name",
+    "username": "Username",
+    "disease": "Disease",
+    "confidence": "Confidence",
+    "timestamp": "Timestamp",
+}
 
-    preds_qs = utils.get_predictions(search=search, user=user, disease=disease, date=date if date else None)
-    preds_list = []
-    for p in preds_qs:
-        preds_list.append({
-            "ID": p.id,
-            "User First Name": p.user.first_name,
-            "User Last Name": p.user.last_name,
-            "Username": p.user.username,
-            "Disease": p.disease,
-            "Confidence": p.confidence,
-            "Timestamp": p.timestamp,
-        })
-    df = pd.DataFrame(preds_list)
-    st.dataframe(df, use_container_width=True)
 
-    st.download_button("Export as CSV", df.to_csv(index=False), "predictions.csv")
+def render_predictions():
+    st.title("\U0001F489 Predictions Management")
+    st.markdown("View, filter, and export predictions.")
+    render_prediction_table("predictions", "Prediction")
 
-    st.markdown("### Prediction Details")
-    for idx, row in df.iterrows():
-        with st.expander(f"Prediction ID: {row['ID']}"):
-            st.json(row.to_dict())
 
 def render_history():
     st.title("\U0001F4DC History Management")
     st.markdown("View, filter, and export history.")
+    render_prediction_table("history", "History")
+
+
+def render_prediction_table(key, label):
+    """
+    Filters, one page of rows fetched from the server, the details of the selected row only,
+    and the streamed CSV export. `key` keeps the pages' widgets and paging state apart.
+    """
+    filters = {
+        "search": st.text_input("Search by ID", key=f"{key}_search"),
+        "user": st.text_input("Filter by Username", key=f"{key}_user"),
+        "disease": st.text_input("Filter by Disease", key=f"{key}_disease"),
+        "date": st.date_input("Filter by Date", value=None, key=f"{key}_date"),
+    }
+
+    # Cursors of the pages seen so far, to go back; cleared when the filters change
+    state = st.session_state.setdefault(f"{key}_paging", {"filters": None, "cursors": [None]})
+    if state["filters"] != filters:
+        state.update(filters=filters, cursors=[None])
+    cursors = state["cursors"]
 
-    search = st.text_input("Search by ID")
-    user = st.text_input("Filter by Username")
-    disease = st.text_input("Filter by Disease")
-    date = st.date_input("Filter by Date", value=None)
+    rows, next_cursor = utils.get_predictions_page(**filters, cursor=cursors[-1], page_size=PAGE_SIZE)
+    df = pd.DataFrame(rows, columns=list(COLUMNS)).rename(columns=COLUMNS)
+    st.dataframe(df, use_container_width=True, hide_index=True)
 
-    hist_qs = utils.get_history(search=search, user=user, disease=disease, date=date if date else None)
-    hist_list = []
-    for h in hist_qs:
-        hist_list.append({
-            "ID": h.id,
-            "User First Name": h.user.first_name,
-            "User Last Name": h.user.last_name,
-            "Username": h.user.username,
-            "Disease": h.disease,
-            "Confidence": h.confidence,
-            "Remedy": h.remedy,
-            "Timestamp": h.timestamp,
-        })
-    df = pd.DataFrame(hist_list)
-    st.dataframe(df, use_container_width=True)
+    previous, page, following = st.columns([1, 2, 1])
+    if previous.button("Previous", key=f"{key}_previous", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    page.caption(f"Page {len(cursors)}")
+    if following.button("Next", key=f"{key}_next", disabled=next_cursor is None):
+        cursors.append(next_cursor)
+        st.rerun()
 
-    st.download_button("Export as CSV", df.to_csv(index=False), "history.csv")
+    if st.button("Prepare CSV export", key=f"{key}_export"):
+        # The browser downloads the streamed export from the API; no rows pass through the dashboard
+        url = utils.export_link(**filters)
+        if url is not None:
+            st.link_button("Download CSV", url)
+            st.caption("The link expires in a few minutes.")
 
-    st.markdown("### History Details")
-    for idx, row in df.iterrows():
-        with st.expander(f"History ID: {row['ID']}"):
-            st.json(row.to_dict()) 
\ No newline at end of file
+    st.markdown(f"### {label} Details")
+    if rows:
+        selected = st.selectbox(f"{label} ID", [row["id"] for row in rows], key=f"{key}_selected")
+        details = utils.get_prediction(selected)
+        if details:
+            st.json(details)
@@ -2,9 +2,11 @@ import streamlit as st
 import requests
 import pandas as pd
 from datetime import datetime
+from urllib.parse import parse_qs, urlparse
 import jwt_auth
+from cache import TTL_PREDICTIONS, TTL_USERS, cached, invalidate
 
-API_BASE = "http://127.0.0.1:8000/api/account"  # Change if needed
+API_BASE = jwt_auth.API_BASE
 
 # --- Minimal CSS ---
 def inject_css():
@@ -23,6 +25,7 @@ def inject_css():
 
 
 # --- Helper functions ---
+@cached(TTL_USERS, groups=("users",))
 def fetch_users(search=None, start_date=None, end_date=None, page=1, page_size=20):
     params = {"page": page, "page_size": page_size}
     if search:
@@ -34,18 +37,27 @@ def fetch_users(search=None, start_date=None, end_date=None, page=1, page_size=2
     return jwt_auth.authorized_get(f"{API_BASE}/users/", params=params)
 
 
-def fetch_user_history(user_id, page=1, page_size=20, sort_by="-timestamp"):
-    params = {"page": page, "page_size": page_size, "ordering": sort_by}
+# Only the fields shown in the table (leaves out the long remedy / prevention texts)
+HISTORY_FIELDS = "id,disease,confidence,timestamp,thumbnail_url"
+
+
+@cached(TTL_PREDICTIONS, groups=("predictions",))
+def fetch_user_history(user_id, cursor=None, page_size=20, sort_by="-timestamp"):
+    params = {"page_size": page_size, "ordering": sort_by, "fields": HISTORY_FIELDS}
+    if cursor:
+        params["cursor"] = cursor
     return jwt_auth.authorized_get(f"{API_BASE}/users/{user_id}/history/", params=params)
 
 
 def delete_prediction(user_id, prediction_id):
     resp = jwt_auth.authorized_delete(f"{API_BASE}/users/{user_id}/history/{prediction_id}/delete/")
+    invalidate("predictions")
     return resp and resp.status_code == 204
 
 
 def clear_user_history(user_id):
     resp = jwt_auth.authorized_delete(f"{API_BASE}/users/{user_id}/history/clear/")
+    invalidate("predictions")
     return resp and resp.status_code == 204
 
 
@@ -68,6 +80,8 @@ def init_state():
         'user_page': 1,
         'user_page_size': 20,
         'user_history_sort': '-timestamp',
+        # Cursors of the history pages visited so far (the first page has none)
+        'user_history_cursors': [None],
     }.items():
         if k not in st.session_state:
             st.session_state[k] = v
@@ -141,6 +155,7 @@ def render():
                                      format_func=lambda x: "Select a user" if x is None else f"User ID {x}")
         if selected_user:
             st.session_state['selected_user'] = selected_user
+            st.session_state['user_history_cursors'] = [None]
             st.rerun()
 
     else:
@@ -149,15 +164,20 @@ def render():
         st.subheader(f"Prediction History for User ID {user_id}")
         if st.button("Back to User List"):
             st.session_state['selected_user'] = None
+            st.session_state['user_history_cursors'] = [None]
             st.rerun()
 
         sort_choice = st.selectbox("Sort by", options=["Newest", "Oldest", "Highest Confidence", "Lowest Confidence"])
         sort_mapping = {"Newest": "-timestamp", "Oldest": "timestamp",
                         "Highest Confidence": "-confidence", "Lowest Confidence": "confidence"}
-        st.session_state['user_history_sort'] = sort_mapping[sort_choice]
+        if st.session_state['user_history_sort'] != sort_mapping[sort_choice]:
+            # Cursors are only valid for the ordering they were issued for
+            st.session_state['user_history_sort'] = sort_mapping[sort_choice]
+            st.session_state['user_history_cursors'] = [None]
 
+        cursors = st.session_state['user_history_cursors']
         with st.spinner("Loading prediction history..."):
-            history_resp = fetch_user_history(user_id, sort_by=st.session_state['user_history_sort'])
+            history_resp = fetch_user_history(user_id, cursor=cursors[-1], sort_by=st.session_state['user_history_sort'])
 
         if history_resp is None or (hasattr(history_resp, "status_code") and history_resp.status_code != 200):
             st.error("Failed to fetch prediction history.")
@@ -174,8 +194,8 @@ def render():
             history_data = history_resp
 
         history = history_data.get('results', history_data) if isinstance(history_data, dict) else history_data
-        total_preds = history_data.get('count', len(history)) if isinstance(history_data, dict) else len(history)
-        if total_preds == 0:
+        next_url = history_data.get('next') if isinstance(history_data, dict) else None
+        if not history and len(cursors) == 1:
             st.info("No predictions to delete.")
             if st.button("Back to User List"):
                 st.session_state['selected_user'] = None
@@ -183,25 +203,37 @@ def render():
             return
 
         st.markdown(
-            f'<div class="user-history-summary">Total Predictions: <b>{total_preds}</b></div>',
+            f'<div class="user-history-summary">Page {len(cursors)}: <b>{len(history)}</b> predictions</div>',
             unsafe_allow_html=True)
 
         st.download_button("Download as CSV", download_history_csv(history), file_name=f"user_{user_id}_history.csv")
 
-        # Table with one-click delete
+        # Table with one-click delete; rows show the small thumbnail, not the full-size upload
         for p in history:
-            cols = st.columns([2, 3, 2, 3, 2])
-            cols[0].write(p['id'])
-            cols[1].write(p['disease'])
-            cols[2].write(f"{p['confidence'] * 100:.1f}")
-            cols[3].write(p['timestamp'])
-            if cols[4].button(f"Delete {p['id']}", key=f"del_{p['id']}"):
+            cols = st.columns([2, 2, 3, 2, 3, 2])
+            if p.get('thumbnail_url'):
+                cols[0].image(p['thumbnail_url'], width=64)
+            cols[1].write(p['id'])
+            cols[2].write(p['disease'])
+            cols[3].write(f"{p['confidence'] * 100:.1f}")
+            cols[4].write(p['timestamp'])
+            if cols[5].button(f"Delete {p['id']}", key=f"del_{p['id']}"):
                 if delete_prediction(user_id, p['id']):
                     st.success(f"Deleted prediction {p['id']}")
                     st.rerun()
                 else:
                     st.error("Failed to delete prediction.")
 
+        col_prev, col_next = st.columns(2)
+        with col_prev:
+            if st.button("Previous page", disabled=len(cursors) <= 1):
+                cursors.pop()
+                st.rerun()
+        with col_next:
+            if st.button("Next page", disabled=not next_url):
+                cursors.append(parse_qs(urlparse(next_url).query)['cursor'][0])
+                st.rerun()
+
         # Clear all history
         if st.checkbox("I confirm I want to delete ALL history for this user"):
             if st.button("Clear All History for this User"):
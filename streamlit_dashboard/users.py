@@ -1,6 +1,5 @@
 import streamlit as st
 import pandas as pd
-from django.contrib.auth.models import User
 import utils
 
 def render():
@@ -41,8 +40,11 @@ def render():
     staff_val = None if is_staff == "All" else (is_staff == "Staff")
     superuser_val = None if is_superuser == "All" else (is_superuser == "Superuser")
 
-    users_qs = utils.get_users(search=search, is_staff=staff_val, is_superuser=superuser_val)
-    users_list = list(users_qs.values('id', 'username', 'email', 'is_staff', 'is_superuser', 'date_joined'))
+    users = utils.get_users(search=search, is_staff=staff_val, is_superuser=superuser_val)
+    users_list = [
+        {key: u[key] for key in ('id', 'username', 'email', 'is_staff', 'is_superuser', 'date_joined')}
+        for u in users
+    ]
 
     # --- Wider table container ---
     st.markdown('<div class="user-table-container">', unsafe_allow_html=True)
@@ -63,13 +65,11 @@ def render():
             is_superuser = st.checkbox("Is Superuser")
             submit = st.form_submit_button("Add User")
             if submit:
-                if User.objects.filter(username=username).exists():
-                    st.error("Username already exists.")
+                error = utils.create_user(username=username, email=email, password=password,
+                                          is_staff=is_staff, is_superuser=is_superuser)
+                if error:
+                    st.error(f"Could not add user: {error}")
                 else:
-                    user = User.objects.create_user(username=username, email=email, password=password)
-                    user.is_staff = is_staff
-                    user.is_superuser = is_superuser
-                    user.save()
                     st.success("User added successfully.")
                     st.rerun()
 
@@ -85,17 +85,20 @@ def render():
                 update = st.form_submit_button("Update")
                 delete = st.form_submit_button("Delete", type="primary")
                 if update:
-                    user = User.objects.get(id=row['id'])
-                    user.email = new_email
-                    user.is_staff = new_is_staff
-                    user.is_superuser = new_is_superuser
+                    fields = {"email": new_email, "is_staff": new_is_staff, "is_superuser": new_is_superuser}
                     if new_password:
-                        user.set_password(new_password)
-                    user.save()
-                    st.success("User updated.")
-                    st.rerun()
+                        fields["password"] = new_password
+                    error = utils.update_user(row['id'], **fields)
+                    if error:
+                        st.error(f"Could not update user: {error}")
+                    else:
+                        st.success("User updated.")
+                        st.rerun()
                 if delete:
                     if st.warning("Are you sure you want to delete this user? This action cannot be undone.", icon="\u26a0\ufe0f"):
-                        User.objects.get(id=row['id']).delete()
-                        st.success("User deleted.")
-                        st.rerun()
\ No newline at end of file
+                        error = utils.delete_user(row['id'])
+                        if error:
+                            st.error(f"Could not delete user: {error}")
+                        else:
+                            st.success("User deleted.")
+                            st.rerun()
\ No newline at end of file
@@ -1,92 +1,176 @@
+import io
 import os
-import django
-import pandas as pd
-from django.conf import settings
-from django.contrib.auth import authenticate
-from django.contrib.auth.models import User
-from django.db.models import Count
-from django.core.paginator import Paginator
-
-# Setup Django
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'plantguard.settings')
-django.setup()
-
-from detection.models import PredictionHistory
-
-
-def is_superuser(username, password):
-    user = authenticate(username=username, password=password)
-    return user and user.is_superuser
-
+from urllib.parse import parse_qs, urlencode, urlparse
 
+import pandas as pd
+import jwt_auth
+from cache import TTL_METRICS, TTL_MODELS, TTL_PREDICTIONS, TTL_SERIES, TTL_USERS, cached, invalidate
+
+# Data comes from the admin-only API of the Django backend; the dashboard process does not load Django.
+ANALYTICS_BASE = f"{jwt_auth.API_ROOT}/analytics"
+ADMIN_USERS_URL = f"{jwt_auth.API_BASE}/admin/users/"
+
+try:
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+
+def fetch_series(endpoint, params=None):
+    """
+    Read every page of a pre-aggregated series as a DataFrame: Arrow when pyarrow is
+    available (as it is with Streamlit), gzip-compressed JSON otherwise.
+    """
+    params = dict(params or {})
+    frames = []
+    url = f"{ANALYTICS_BASE}/{endpoint}/"
+    while url:
+        if pyarrow is not None:
+            params["format"] = "arrow"
+            resp = jwt_auth.authorized_request("GET", url, params=params)
+            if resp is None or resp.status_code != 200:
+                break
+            table = pyarrow.ipc.open_stream(io.BytesIO(resp.content)).read_all()
+            frames.append(table.to_pandas())
+            url = (table.schema.metadata or {}).get(b"next", b"").decode() or None
+        else:
+            page = jwt_auth.authorized_get(url, params=params)
+            if page is None:
+                break
+            frames.append(pd.DataFrame(page["results"]))
+            url = page["next"]
+        # The next link carries the query parameters
+        params = {}
+    frames = [frame for frame in frames if not frame.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+@cached(TTL_METRICS, groups=("users", "predictions"))
 def get_user_metrics():
-    total_users = User.objects.count()
-    total_predictions = PredictionHistory.objects.count()
-    most_predicted = (
-        PredictionHistory.objects.values('disease')
-        .annotate(count=Count('disease'))
-        .order_by('-count')
-        .first()
-    )
+    metrics = jwt_auth.authorized_get(f"{ANALYTICS_BASE}/metrics/") or {}
     return {
-        "total_users": total_users,
-        "total_predictions": total_predictions,
-        "most_predicted": most_predicted['disease'] if most_predicted else "N/A"
+        "total_users": metrics.get("total_users", 0),
+        "total_predictions": metrics.get("total_predictions", 0),
+        "most_predicted": metrics.get("most_predicted") or "N/A"
     }
 
 
+@cached(TTL_SERIES, groups=("users",))
 def get_user_growth():
-    users = User.objects.extra({'date': "date(date_joined)"}).values('date').annotate(count=Count('id')).order_by(
-        'date')
-    df = pd.DataFrame(users)
-    return df
+    return fetch_series("user-growth")
 
 
+@cached(TTL_SERIES, groups=("predictions",))
 def get_predictions_by_disease():
-    preds = PredictionHistory.objects.values('disease').annotate(count=Count('id')).order_by('-count')
-    df = pd.DataFrame(preds)
-    return df
+    return fetch_series("predictions-by-disease")
 
 
+@cached(TTL_SERIES, groups=("predictions",))
 def get_predictions_per_day():
-    preds = PredictionHistory.objects.extra({'date': "date(timestamp)"}).values('date').annotate(
-        count=Count('id')).order_by('date')
-    df = pd.DataFrame(preds)
-    return df
+    return fetch_series("predictions-per-day")
 
 
-def get_users(search=None, is_staff=None, is_superuser=None):
-    qs = User.objects.all()
+@cached(TTL_SERIES, groups=("predictions",))
+def get_confidence_histogram():
+    df = fetch_series("confidence-histogram")
+    if df.empty:
+        return df
+    buckets = 10
+    df["confidence"] = [f"{b / buckets:.1f}-{(b + 1) / buckets:.1f}" for b in df.pop("confidence_bucket")]
+    return df[["confidence", "count"]]
+
+
+@cached(TTL_USERS, groups=("users",))
+def get_users(search=None, is_staff=None, is_superuser=None, page_size=1000):
+    params = {"page_size": page_size}
     if search:
-        qs = qs.filter(username__icontains=search)
+        params["search"] = search
     if is_staff is not None:
-        qs = qs.filter(is_staff=is_staff)
+        params["is_staff"] = str(is_staff).lower()
     if is_superuser is not None:
-        qs = qs.filter(is_superuser=is_superuser)
-    return qs
-
-
-def paginate_queryset(qs, page, per_page):
-    paginator = Paginator(qs, per_page)
-    return paginator.get_page(page)
+        params["is_superuser"] = str(is_superuser).lower()
+    users = []
+    page = 1
+    while True:
+        rows = jwt_auth.authorized_get(ADMIN_USERS_URL, params={**params, "page": page}) or []
+        users.extend(rows)
+        if len(rows) < page_size:
+            return users
+        page += 1
+
+
+def create_user(**fields):
+    """Create a user; returns the error message, or None on success."""
+    resp = jwt_auth.authorized_post(ADMIN_USERS_URL, json=fields)
+    invalidate("users")
+    return _error(resp, 201)
+
+
+def update_user(user_id, **fields):
+    resp = jwt_auth.authorized_request("PATCH", f"{ADMIN_USERS_URL}{user_id}/", json=fields)
+    invalidate("users")
+    return _error(resp, 200)
+
+
+def delete_user(user_id):
+    resp = jwt_auth.authorized_request("DELETE", f"{ADMIN_USERS_URL}{user_id}/")
+    # The user's predictions are deleted with them
+    invalidate("users", "predictions")
+    return _error(resp, 204)
+
+
+def _error(resp, expected_status):
+    if resp is None:
+        return "Not authenticated."
+    if resp.status_code != expected_status:
+        return f"{resp.status_code} {resp.text}"
+    return None
 
 
-def get_predictions(search=None, user=None, disease=None, date=None):
-    qs = PredictionHistory.objects.all()
+def _prediction_params(search=None, user=None, disease=None, date=None):
+    params = {}
     if search:
-        qs = qs.filter(id__icontains=search)
+        params["search"] = search
     if user:
-        qs = qs.filter(user__username__icontains=user)
+        params["user"] = user
     if disease:
-        qs = qs.filter(disease__icontains=disease)
+        params["disease"] = disease
     if date:
-        qs = qs.filter(timestamp__date=date)
-    return qs
-
-
-def get_history(search=None, user=None, disease=None, date=None):
-    # For this project, history is the same as predictions
-    return get_predictions(search, user, disease, date)
+        params["date"] = date.isoformat()
+    return params
+
+
+@cached(TTL_PREDICTIONS, groups=("predictions", "users"))
+def get_predictions_page(search=None, user=None, disease=None, date=None, cursor=None, page_size=50):
+    """
+    One page of the predictions matching the filters, newest first: (rows, next cursor).
+    Rows hold the list columns only; get_prediction returns a row's remedy and preventive measures.
+    """
+    params = {**_prediction_params(search, user, disease, date), "page_size": page_size}
+    if cursor:
+        params["cursor"] = cursor
+    page = jwt_auth.authorized_get(f"{ANALYTICS_BASE}/predictions/", params=params)
+    if page is None:
+        return [], None
+    next_cursor = parse_qs(urlparse(page["next"]).query).get("cursor", [None])[0] if page["next"] else None
+    return page["results"], next_cursor
+
+
+@cached(TTL_PREDICTIONS, groups=("predictions", "users"))
+def get_prediction(prediction_id):
+    return jwt_auth.authorized_get(f"{ANALYTICS_BASE}/predictions/{prediction_id}/")
+
+
+def export_link(search=None, user=None, disease=None, date=None):
+    """
+    Link for the browser to download the CSV export of the predictions matching the filters straight
+    from the API, which streams it; the link expires after a few minutes. Returns None on error.
+    """
+    link = jwt_auth.authorized_get(f"{ANALYTICS_BASE}/predictions/export/link/")
+    if link is None:
+        return None
+    params = {**_prediction_params(search, user, disease, date), "token": link["token"]}
+    return f"{jwt_auth.PUBLIC_API_ROOT}/analytics/predictions/export/?{urlencode(params)}"
 
 
 def save_model_file(uploaded_file):
@@ -95,9 +179,11 @@ def save_model_file(uploaded_file):
     file_path = os.path.join(models_dir, uploaded_file.name)
     with open(file_path, 'wb') as f:
         f.write(uploaded_file.getbuffer())
+    invalidate("models")
     return file_path
 
 
+@cached(TTL_MODELS, groups=("models",))
 def list_models():
     models_dir = os.path.join(os.path.dirname(__file__), 'models')
     if not os.path.exists(models_dir):
@@ -120,8 +206,10 @@ def set_active_model(model_name):
     active_path = os.path.join(models_dir, 'active_model.txt')
     with open(active_path, 'w') as f:
         f.write(model_name)
+    invalidate("models")
 
 
+@cached(TTL_MODELS, groups=("models",))
 def get_active_model():
     models_dir = os.path.join(os.path.dirname(__file__), 'models')
     active_path = os.path.join(models_dir, 'active_model.txt')